@@ -0,0 +1,158 @@
+"""
+Actions d'administration groupées (tableau de bord admin et admin Django)
+
+Une action reçoit un lot d'ids et le traite en requêtes ensemblistes : un UPDATE
+ou un DELETE ... WHERE id IN (...) par lot, notifications créées en un
+bulk_create. lancer() exécute tout de suite une sélection qui tient en un lot
+(ACTIONS_GROUPEES_LOT) ; au-delà, une ActionGroupee est enregistrée et traitée
+par un thread d'arrière-plan, progression sur /admin-dashboard/actions/.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DatabaseError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from comautis.arriere_plan import Travailleur
+from comautis.base_sqlite import ecriture_exclusive
+from forum.models import Post, Topic
+
+from .models import ActionGroupee, Notification
+from .suppressions import demander_suppressions, en_suppression, get_reprise
+
+logger = logging.getLogger(__name__)
+
+
+def get_lot():
+    return getattr(settings, 'ACTIONS_GROUPEES_LOT', 500)
+
+
+def get_pause():
+    return getattr(settings, 'ACTIONS_GROUPEES_PAUSE', 0.05)
+
+
+# ========== ACTIONS ==========
+# nom -> (libellé, fonction(ids, par) -> nombre d'objets modifiés)
+
+ACTIONS = {}
+
+
+def action(nom, libelle):
+    def enregistrer(fonction):
+        ACTIONS[nom] = (libelle, fonction)
+        return fonction
+    return enregistrer
+
+
+def comptes(ids):
+    return User.objects.filter(pk__in=ids).exclude(pk__in=en_suppression(User))
+
+
+@action('approuver_educateurs', "✅ Approuver les éducateurs")
+def approuver_educateurs(ids, par):
+    approuves = list(comptes(ids).filter(is_active=False, profile__user_type='educator').values_list('pk', flat=True))
+    User.objects.filter(pk__in=approuves).update(is_active=True)
+    Notification.objects.bulk_create(
+        Notification(
+            user_id=user_id,
+            notification_type='badge',
+            message="✅ Votre compte éducateur a été approuvé ! Bienvenue sur ComAutiste.",
+            link='/dashboard/',
+        )
+        for user_id in approuves
+    )
+    return len(approuves)
+
+
+@action('activer_utilisateurs', "✅ Activer les utilisateurs")
+def activer_utilisateurs(ids, par):
+    return comptes(ids).filter(is_active=False).update(is_active=True)
+
+
+@action('desactiver_utilisateurs', "❌ Désactiver les utilisateurs")
+def desactiver_utilisateurs(ids, par):
+    # Jamais son propre compte
+    return comptes(ids).filter(is_active=True).exclude(pk=getattr(par, 'pk', None)).update(is_active=False)
+
+
+@action('supprimer_messages', "🗑️ Supprimer les commentaires")
+def supprimer_messages(ids, par):
+    # Aucun objet dépendant : un seul DELETE ... WHERE id IN (...)
+    supprimes, _ = Post.objects.filter(pk__in=ids).delete()
+    return supprimes
+
+
+@action('supprimer_sujets', "🗑️ Supprimer les topics")
+def supprimer_sujets(ids, par):
+    # Sujets masqués, messages et réactions effacés par les suppressions différées
+    return demander_suppressions(Topic, ids, demandee_par=par)
+
+
+# ========== EXÉCUTION ==========
+
+def executer_lot(nom, ids, par):
+    with ecriture_exclusive(), transaction.atomic():
+        return ACTIONS[nom][1](ids, par)
+
+
+def lancer(nom, ids, par=None):
+    """
+    Applique l'action à la sélection : (objets modifiés, None) si elle tient en un lot,
+    sinon (None, ActionGroupee) exécutée en arrière-plan
+    """
+    if nom not in ACTIONS:
+        raise ValueError(f"Action inconnue : {nom}")
+    ids = sorted({int(i) for i in ids})
+    if len(ids) <= get_lot():
+        return executer_lot(nom, ids, par), None
+
+    tache = ActionGroupee.objects.create(
+        action=nom, libelle=f"{ACTIONS[nom][0]} ({len(ids)})", ids=ids, total=len(ids), demandee_par=par,
+    )
+    transaction.on_commit(travailleur.reveiller)
+    return None, tache
+
+
+def executer(tache):
+    """Traite les lots restants d'une tâche prise en charge (reprend après ids[:traitees])"""
+    lot = get_lot()
+    while tache.traitees < len(tache.ids):
+        ids = tache.ids[tache.traitees:tache.traitees + lot]
+        with ecriture_exclusive(), transaction.atomic():
+            tache.modifiees += ACTIONS[tache.action][1](ids, tache.demandee_par)
+            tache.traitees += len(ids)
+            tache.save(update_fields=['traitees', 'modifiees', 'mis_a_jour'])
+        time.sleep(get_pause())
+
+    tache.etat = 'terminee'
+    tache.termine_le = timezone.now()
+    tache.save(update_fields=['etat', 'termine_le', 'mis_a_jour'])
+
+
+def executer_en_attente():
+    """Exécute les actions groupées en attente ou abandonnées ; renvoie le nombre terminé"""
+    terminees = 0
+    while True:
+        abandon = timezone.now() - timedelta(seconds=get_reprise())
+        etats = Q(etat='attente') | Q(etat='en_cours', mis_a_jour__lt=abandon)
+        pk = ActionGroupee.objects.filter(etats).order_by('id').values_list('pk', flat=True).first()
+        if pk is None:
+            return terminees
+        with ecriture_exclusive():
+            # UPDATE conditionnel : un seul worker gagne
+            if not ActionGroupee.objects.filter(etats, pk=pk).update(etat='en_cours', mis_a_jour=timezone.now()):
+                continue
+        tache = ActionGroupee.objects.select_related('demandee_par').get(pk=pk)
+        try:
+            executer(tache)
+            terminees += 1
+        except (DatabaseError, KeyError) as e:
+            logger.exception("Action groupée %s interrompue", tache)
+            ActionGroupee.objects.filter(pk=pk).update(etat='erreur', erreur=str(e)[:1000], mis_a_jour=timezone.now())
+
+
+travailleur = Travailleur('actions-groupees', executer_en_attente, intervalle=get_reprise)
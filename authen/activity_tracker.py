@@ -1,8 +1,14 @@
 from .models import Activite
+from .archives_activites import par_jour_archive, resumes_archives
 from django.utils import timezone
 from datetime import timedelta
-from django.db.models import Sum, Count, Avg, Q
-from django.db.models.functions import TruncDate
+from collections import Counter, defaultdict
+from django.db.models import Sum, Count, Q, F, Window
+from django.db.models.functions import RowNumber, TruncDate
+from comautis.replique import lecture_replique
+
+# Streak plafonné à un an
+STREAK_MAX_JOURS = 365
 
 def start_activity(enfant, jeu_name):
     """
@@ -30,137 +36,219 @@ def end_activity(activite_id, score=None, reussi=True):
     except Activite.DoesNotExist:
         return False
 
+@lecture_replique
 def get_enfant_stats(enfant):
     """
     Récupère les statistiques complètes d'un enfant
     """
-    # Toutes les activités de l'enfant
-    activites = Activite.objects.filter(enfant=enfant)
+    return get_stats_enfants([enfant])[enfant.id]
+
+@lecture_replique
+def get_stats_enfants(enfants):
+    """
+    Statistiques complètes de plusieurs enfants : {enfant_id: stats}
+    Nombre de requêtes fixe, quel que soit le nombre d'enfants ou d'activités
+    Les mois archivés (archiver_activites) sont ajoutés depuis leurs résumés
+    """
+    ids = [enfant.id for enfant in enfants]
+    activites = Activite.objects.filter(enfant_id__in=ids)
     
-    # Aujourd'hui
     today = timezone.now().date()
-    activites_today = activites.filter(date_debut__date=today)
-    
-    # Cette semaine (7 derniers jours)
-    week_ago = timezone.now() - timedelta(days=7)
-    activites_week = activites.filter(date_debut__gte=week_ago)
-    
-    # Ce mois
-    month_ago = timezone.now() - timedelta(days=30)
-    activites_month = activites.filter(date_debut__gte=month_ago)
-    
-    # Calculer le total d'activités
-    total_count = activites.count()
-    
-    # Stats globales
-    stats = {
-        # Nombres d'activités
-        'total_activites': total_count,
-        'activites_today': activites_today.count(),
-        'activites_week': activites_week.count(),
-        'activites_month': activites_month.count(),
-        
-        # Temps passé
-        'temps_total_minutes': activites.aggregate(Sum('duree_minutes'))['duree_minutes__sum'] or 0,
-        'temps_semaine_minutes': activites_week.aggregate(Sum('duree_minutes'))['duree_minutes__sum'] or 0,
-        'temps_aujourd_hui_minutes': activites_today.aggregate(Sum('duree_minutes'))['duree_minutes__sum'] or 0,
-        'temps_mois_minutes': activites_month.aggregate(Sum('duree_minutes'))['duree_minutes__sum'] or 0,
-        
-        # Temps moyen par session
-        'temps_moyen_minutes': activites.aggregate(Avg('duree_minutes'))['duree_minutes__avg'] or 0,
-        
-        # Jeux favoris (top 3)
-        'jeux_favoris': list(activites.values('jeu').annotate(
-            count=Count('jeu'),
-            nom_jeu=Count('jeu')
-        ).order_by('-count')[:3]),
-        
-        # Taux de réussite
-        'taux_reussite': round((activites.filter(reussi=True).count() * 100 / max(total_count, 1)), 1),
-        
-        # Score moyen (si applicable)
-        'score_moyen': activites.filter(score__isnull=False).aggregate(Avg('score'))['score__avg'] or 0,
-        
-        # Activité récente (dernier jeu joué)
-        'derniere_activite': activites.order_by('-date_debut').first(),
-        
-        # Streak (jours consécutifs)
-        'streak_jours': calculer_streak(enfant),
+    aujourd_hui = Q(date_debut__date=today)
+    semaine = Q(date_debut__gte=timezone.now() - timedelta(days=7))
+    mois = Q(date_debut__gte=timezone.now() - timedelta(days=30))
+    
+    # 1. Compteurs et temps : une ligne par enfant
+    agregats = {
+        ligne['enfant_id']: ligne
+        for ligne in activites.values('enfant_id').annotate(
+            total_activites=Count('id'),
+            activites_today=Count('id', filter=aujourd_hui),
+            activites_week=Count('id', filter=semaine),
+            activites_month=Count('id', filter=mois),
+            temps_total_minutes=Sum('duree_minutes'),
+            temps_semaine_minutes=Sum('duree_minutes', filter=semaine),
+            temps_aujourd_hui_minutes=Sum('duree_minutes', filter=aujourd_hui),
+            temps_mois_minutes=Sum('duree_minutes', filter=mois),
+            reussies=Count('id', filter=Q(reussi=True)),
+            scores=Count('score'),
+            score_total=Sum('score'),
+        ).order_by()
+    }
+    archives = resumes_archives(ids)
+    
+    # 2. Jeux favoris (top 3 par enfant, mois archivés compris)
+    sessions_par_jeu = defaultdict(Counter)
+    for ligne in activites.values('enfant_id', 'jeu').annotate(count=Count('id')).order_by():
+        sessions_par_jeu[ligne['enfant_id']][ligne['jeu']] += ligne['count']
+    jeux_favoris = defaultdict(list)
+    for enfant_id in ids:
+        sessions = sessions_par_jeu[enfant_id] + archives.get(enfant_id, {}).get('jeux', Counter())
+        for jeu, count in sorted(sessions.items(), key=lambda item: (-item[1], item[0]))[:3]:
+            jeux_favoris[enfant_id].append({'jeu': jeu, 'count': count, 'nom_jeu': count})
+    
+    # 3. Dernière activité de chaque enfant
+    dernieres = {
+        activite.enfant_id: activite
+        for activite in activites.annotate(
+            rang=Window(RowNumber(), partition_by=F('enfant_id'), order_by=F('date_debut').desc())
+        ).filter(rang=1)
     }
     
+    # 4. Jours joués sur un an (streak)
+    jours_joues = get_jours_joues(ids, archives)
+    
+    stats = {}
+    for enfant_id in ids:
+        ligne = agregats.get(enfant_id, {})
+        archive = archives.get(enfant_id, {})
+        total_count = ligne.get('total_activites', 0) + archive.get('nombre', 0)
+        temps_total = (ligne.get('temps_total_minutes') or 0) + archive.get('minutes', 0)
+        scores = ligne.get('scores', 0) + archive.get('scores', 0)
+        score_total = (ligne.get('score_total') or 0) + archive.get('score_total', 0)
+        reussies = ligne.get('reussies', 0) + archive.get('reussies', 0)
+        stats[enfant_id] = {
+            # Nombres d'activités
+            'total_activites': total_count,
+            'activites_today': ligne.get('activites_today', 0),
+            'activites_week': ligne.get('activites_week', 0),
+            'activites_month': ligne.get('activites_month', 0),
+            
+            # Temps passé
+            'temps_total_minutes': temps_total,
+            'temps_semaine_minutes': ligne.get('temps_semaine_minutes') or 0,
+            'temps_aujourd_hui_minutes': ligne.get('temps_aujourd_hui_minutes') or 0,
+            'temps_mois_minutes': ligne.get('temps_mois_minutes') or 0,
+            
+            # Temps moyen par session
+            'temps_moyen_minutes': temps_total / total_count if total_count else 0,
+            
+            # Jeux favoris (top 3)
+            'jeux_favoris': jeux_favoris[enfant_id],
+            
+            # Taux de réussite
+            'taux_reussite': round((reussies * 100 / max(total_count, 1)), 1),
+            
+            # Score moyen (si applicable)
+            'score_moyen': score_total / scores if scores else 0,
+            
+            # Activité récente (dernier jeu joué)
+            'derniere_activite': dernieres.get(enfant_id),
+            
+            # Streak (jours consécutifs)
+            'streak_jours': streak_depuis_jours(jours_joues[enfant_id]),
+        }
+    
     return stats
 
+@lecture_replique
 def get_activites_par_jour(enfant, jours=7):
     """
     Retourne le nombre d'activités par jour sur les X derniers jours
     Format : [{'jour': '2025-01-10', 'count': 5}, ...]
     """
+    return get_activites_par_jour_enfants([enfant], jours)[enfant.id]
+
+@lecture_replique
+def get_activites_par_jour_enfants(enfants, jours=7):
+    """
+    get_activites_par_jour pour plusieurs enfants en une requête : {enfant_id: [...]}
+    (segments archivés lus seulement si la période en recoupe un)
+    """
     debut = timezone.now() - timedelta(days=jours)
+    ids = [enfant.id for enfant in enfants]
     
     activites_par_jour = Activite.objects.filter(
-        enfant=enfant,
+        enfant_id__in=ids,
         date_debut__gte=debut
     ).annotate(
         jour=TruncDate('date_debut')
-    ).values('jour').annotate(
+    ).values('enfant_id', 'jour').annotate(
         count=Count('id')
-    ).order_by('jour')
+    ).order_by('enfant_id', 'jour')
     
-    # Convertir en liste avec dates formatées
-    result = []
+    compte = par_jour_archive(ids, debut)
     for item in activites_par_jour:
-        result.append({
-            'jour': item['jour'].strftime('%d/%m'),
-            'date': item['jour'],
-            'count': item['count']
-        })
+        compte.setdefault(item['enfant_id'], Counter())[item['jour']] += item['count']
+    
+    # Convertir en liste avec dates formatées
+    result = {enfant.id: [] for enfant in enfants}
+    for enfant_id, par_jour in compte.items():
+        result[enfant_id] = [
+            {'jour': jour.strftime('%d/%m'), 'date': jour, 'count': count}
+            for jour, count in sorted(par_jour.items())
+        ]
     
     return result
 
+@lecture_replique
 def get_temps_par_jeu(enfant, limit=5):
     """
     Retourne le temps passé par jeu (top X jeux)
     """
-    temps_par_jeu = Activite.objects.filter(enfant=enfant).values('jeu').annotate(
+    temps = Counter()
+    sessions = Counter()
+    for ligne in Activite.objects.filter(enfant=enfant).values('jeu').annotate(
         temps_total=Sum('duree_minutes'),
         nb_sessions=Count('id')
-    ).order_by('-temps_total')[:limit]
+    ).order_by():
+        temps[ligne['jeu']] += ligne['temps_total']
+        sessions[ligne['jeu']] += ligne['nb_sessions']
+    archive = resumes_archives([enfant.id]).get(enfant.id)
+    if archive:
+        temps.update(archive['minutes_par_jeu'])
+        sessions.update(archive['jeux'])
     
-    return list(temps_par_jeu)
+    return [
+        {'jeu': jeu, 'temps_total': temps_total, 'nb_sessions': sessions[jeu]}
+        for jeu, temps_total in temps.most_common(limit)
+    ]
 
+@lecture_replique
 def calculer_streak(enfant):
     """
     Calcule le nombre de jours consécutifs où l'enfant a joué
     """
-    activites = Activite.objects.filter(enfant=enfant).order_by('-date_debut')
-    
-    if not activites.exists():
-        return 0
-    
-    streak = 0
+    return streak_depuis_jours(get_jours_joues([enfant.id])[enfant.id])
+
+def get_jours_joues(enfant_ids, archives=None):
+    """
+    {enfant_id: ensemble des dates jouées sur la dernière année} en une requête
+    archives : résumés déjà lus par resumes_archives(), sinon la table seule
+    """
+    jours_joues = defaultdict(set)
+    debut = timezone.now() - timedelta(days=STREAK_MAX_JOURS + 2)
+    for enfant_id, archive in (archives or {}).items():
+        jours_joues[enfant_id].update(jour for jour in archive['jours'] if jour >= timezone.localtime(debut).date())
+    lignes = Activite.objects.filter(
+        enfant_id__in=enfant_ids,
+        date_debut__gte=debut
+    ).annotate(
+        jour=TruncDate('date_debut')
+    ).values_list('enfant_id', 'jour').order_by().distinct()
+    for enfant_id, jour in lignes:
+        jours_joues[enfant_id].add(jour)
+    return jours_joues
+
+def streak_depuis_jours(jours_joues):
+    """
+    Jours consécutifs joués jusqu'à aujourd'hui (ou hier si pas encore joué aujourd'hui)
+    """
     date_actuelle = timezone.now().date()
     
-    # Vérifier si joué aujourd'hui
-    if activites.filter(date_debut__date=date_actuelle).exists():
-        streak = 1
-    else:
-        # Vérifier si joué hier
-        hier = date_actuelle - timedelta(days=1)
-        if not activites.filter(date_debut__date=hier).exists():
-            return 0
-        date_actuelle = hier
-        streak = 1
+    # Vérifier si joué aujourd'hui, sinon hier
+    if date_actuelle not in jours_joues:
+        date_actuelle -= timedelta(days=1)
     
     # Compter les jours consécutifs
-    for i in range(1, 365):  # Maximum 1 an
-        jour_precedent = date_actuelle - timedelta(days=i)
-        if activites.filter(date_debut__date=jour_precedent).exists():
-            streak += 1
-        else:
-            break
+    streak = 0
+    while date_actuelle in jours_joues and streak < STREAK_MAX_JOURS:
+        streak += 1
+        date_actuelle -= timedelta(days=1)
     
     return streak
 
+@lecture_replique
 def get_progression_mensuelle(enfant):
     """
     Retourne la progression sur les 30 derniers jours
@@ -179,6 +267,7 @@ def get_progression_mensuelle(enfant):
     
     return list(activites)
 
+@lecture_replique
 def get_jeux_recents(enfant, limit=5):
     """
     Retourne les X derniers jeux joués
@@ -1,6 +1,22 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils.html import format_html
 from .models import UserProfile
+from . import actions_groupees
+
+
+def action_groupee(modeladmin, request, nom, ids):
+    """Lance une action groupée depuis l'admin Django (arrière-plan au-delà d'un lot)"""
+    modifies, tache = actions_groupees.lancer(nom, ids, par=request.user)
+    if tache is not None:
+        modeladmin.message_user(request, format_html(
+            '⏳ {} : exécution en arrière-plan, <a href="{}">suivre la progression</a>.',
+            tache.libelle, reverse('admin_actions_groupees'),
+        ), messages.INFO)
+    else:
+        modeladmin.message_user(request, f"{actions_groupees.ACTIONS[nom][0]} : {modifies} élément(s) modifié(s).")
+
 
 # Personnaliser l'affichage des profils utilisateurs
 class UserProfileAdmin(admin.ModelAdmin):
@@ -16,15 +32,8 @@ class UserProfileAdmin(admin.ModelAdmin):
     actions = ['approve_educators']
     
     def approve_educators(self, request, queryset):
-        """Action pour approuver les éducateurs en attente"""
-        count = 0
-        for profile in queryset:
-            if profile.user_type == 'educator' and not profile.user.is_active:
-                profile.user.is_active = True
-                profile.user.save()
-                count += 1
-        
-        self.message_user(request, f"{count} éducateur(s) approuvé(s) avec succès !")
+        """Action pour approuver les éducateurs en attente (un UPDATE par lot, notifications comprises)"""
+        action_groupee(self, request, 'approuver_educateurs', queryset.values_list('user_id', flat=True))
     approve_educators.short_description = "✅ Approuver les éducateurs sélectionnés"
 
 # Enregistrer le modèle UserProfile
@@ -40,13 +49,11 @@ class UserAdmin(admin.ModelAdmin):
     actions = ['activate_users', 'deactivate_users']
     
     def activate_users(self, request, queryset):
-        queryset.update(is_active=True)
-        self.message_user(request, "Utilisateurs activés avec succès !")
+        action_groupee(self, request, 'activer_utilisateurs', queryset.values_list('pk', flat=True))
     activate_users.short_description = "✅ Activer les utilisateurs sélectionnés"
     
     def deactivate_users(self, request, queryset):
-        queryset.update(is_active=False)
-        self.message_user(request, "Utilisateurs désactivés avec succès !")
+        action_groupee(self, request, 'desactiver_utilisateurs', queryset.values_list('pk', flat=True))
     deactivate_users.short_description = "❌ Désactiver les utilisateurs sélectionnés"
 
 # Désenregistrer le modèle User par défaut et enregistrer notre version personnalisée
@@ -1,13 +1,20 @@
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import FileResponse, Http404
+from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.models import User
 from django.contrib import messages
 from django.db.models import Count, Q
 from django.utils import timezone
 from datetime import timedelta
-from .models import UserProfile, Enfant, Badge, UserBadge, Notification
+from .models import UserProfile, Enfant, Badge, UserBadge, SuppressionDifferee, ActionGroupee
+from . import actions_groupees
+from .suppressions import demander_suppression, en_suppression
 from forum.models import Topic, Post
 from paiement.models import Subscription
+from comautis.replique import lecture_replique
+from comautis import memoire, profilage, requetes_lentes
 import json
 
 # Fonction pour vérifier si l'utilisateur est admin
@@ -22,14 +29,25 @@ def admin_required(view_func):
 
 # ========== DASHBOARD PRINCIPAL ==========
 @admin_required
+@lecture_replique
 def admin_dashboard(request):
     """Dashboard principal avec statistiques"""
     
-    # Statistiques utilisateurs
-    total_users = User.objects.count()
-    total_parents = UserProfile.objects.filter(user_type='parent').count()
-    total_educators = UserProfile.objects.filter(user_type='educator').count()
-    pending_educators = UserProfile.objects.filter(user_type='educator', user__is_active=False).count()
+    # Statistiques utilisateurs (une requête par table, compteurs filtrés)
+    week_ago = timezone.now() - timedelta(days=7)
+    stats_users = User.objects.aggregate(
+        total_users=Count('id'),
+        new_users_week=Count('id', filter=Q(date_joined__gte=week_ago)),
+    )
+    total_users = stats_users['total_users']
+    stats_profiles = UserProfile.objects.aggregate(
+        total_parents=Count('id', filter=Q(user_type='parent')),
+        total_educators=Count('id', filter=Q(user_type='educator')),
+        pending_educators=Count('id', filter=Q(user_type='educator', user__is_active=False) & ~Q(user__in=en_suppression(User))),
+    )
+    total_parents = stats_profiles['total_parents']
+    total_educators = stats_profiles['total_educators']
+    pending_educators = stats_profiles['pending_educators']
     
     # Statistiques enfants
     total_enfants = Enfant.objects.count()
@@ -42,33 +60,39 @@ def admin_dashboard(request):
     active_subscriptions = Subscription.objects.filter(active=True).count()
     
     # Utilisateurs récents (derniers 7 jours)
-    week_ago = timezone.now() - timedelta(days=7)
-    new_users_week = User.objects.filter(date_joined__gte=week_ago).count()
+    new_users_week = stats_users['new_users_week']
     
     # Badges attribués
     total_badges = UserBadge.objects.count()
     
     # Derniers utilisateurs inscrits
-    recent_users = User.objects.order_by('-date_joined')[:5]
+    recent_users = User.objects.exclude(pk__in=en_suppression(User)).order_by('-date_joined')[:5]
     
     # Éducateurs en attente
     pending_educator_profiles = UserProfile.objects.filter(
         user_type='educator', 
         user__is_active=False
-    ).select_related('user')[:5]
+    ).exclude(user__in=en_suppression(User)).select_related('user')[:5]
     
     # Topics récents
-    recent_topics = Topic.objects.order_by('-created_at')[:5]
+    recent_topics = Topic.objects.select_related('created_by').order_by('-created_at')[:5]
     
-    # Données pour les graphiques
-    users_by_month = []
+    # Données pour les graphiques (les 7 périodes de 30 jours en une requête)
+    now = timezone.now()
+    periodes = []
     for i in range(6, -1, -1):
-        month_start = timezone.now() - timedelta(days=30*i)
-        month_end = timezone.now() - timedelta(days=30*(i-1)) if i > 0 else timezone.now()
-        count = User.objects.filter(date_joined__gte=month_start, date_joined__lt=month_end).count()
+        month_start = now - timedelta(days=30*i)
+        month_end = now - timedelta(days=30*(i-1)) if i > 0 else now
+        periodes.append((f'm{i}', month_start, month_end))
+    counts = User.objects.aggregate(**{
+        cle: Count('id', filter=Q(date_joined__gte=month_start, date_joined__lt=month_end))
+        for cle, month_start, month_end in periodes
+    })
+    users_by_month = []
+    for cle, month_start, month_end in periodes:
         users_by_month.append({
             'month': month_start.strftime('%b'),
-            'count': count
+            'count': counts[cle]
         })
     
     context = {
@@ -96,40 +120,45 @@ def admin_dashboard(request):
 def admin_users_list(request):
     """Liste de tous les utilisateurs"""
     
-    # Filtres
-    user_type = request.GET.get('type', 'all')
-    status = request.GET.get('status', 'all')
-    search = request.GET.get('search', '')
+    users, filtres = filtrer_utilisateurs(request.GET)
     
-    # Query de base
-    users = User.objects.select_related('profile').all()
+    context = {
+        'users': users.select_related('profile').order_by('-date_joined'),
+        **filtres,
+    }
+    
+    return render(request, 'authen/admin/users_list.html', context)
+
+
+def filtrer_utilisateurs(parametres):
+    """Utilisateurs correspondant aux filtres de la liste (aussi utilisé par les actions groupées)"""
+    
+    filtres = {
+        'user_type': parametres.get('type', 'all'),
+        'status': parametres.get('status', 'all'),
+        'search': parametres.get('search', ''),
+    }
+    
+    # Query de base (comptes en cours de suppression masqués)
+    users = User.objects.exclude(pk__in=en_suppression(User))
     
     # Appliquer les filtres
-    if user_type != 'all':
-        users = users.filter(profile__user_type=user_type)
+    if filtres['user_type'] != 'all':
+        users = users.filter(profile__user_type=filtres['user_type'])
     
-    if status == 'active':
+    if filtres['status'] == 'active':
         users = users.filter(is_active=True)
-    elif status == 'inactive':
+    elif filtres['status'] == 'inactive':
         users = users.filter(is_active=False)
     
-    if search:
+    if filtres['search']:
         users = users.filter(
-            Q(username__icontains=search) |
-            Q(email__icontains=search) |
-            Q(first_name__icontains=search)
+            Q(username__icontains=filtres['search']) |
+            Q(email__icontains=filtres['search']) |
+            Q(first_name__icontains=filtres['search'])
         )
     
-    users = users.order_by('-date_joined')
-    
-    context = {
-        'users': users,
-        'user_type': user_type,
-        'status': status,
-        'search': search,
-    }
-    
-    return render(request, 'authen/admin/users_list.html', context)
+    return users, filtres
 
 
 @admin_required
@@ -143,11 +172,11 @@ def admin_user_detail(request, user_id):
         profile = None
     
     # Enfants si parent
-    enfants = Enfant.objects.filter(parent=user) if profile and profile.user_type == 'parent' else []
+    enfants = Enfant.objects.filter(parent=user).pour_liste() if profile and profile.user_type == 'parent' else []
     
     # Activité forum
     topics = Topic.objects.filter(created_by=user).order_by('-created_at')[:5]
-    posts = Post.objects.filter(created_by=user).order_by('-created_at')[:5]
+    posts = Post.objects.filter(created_by=user).select_related('topic').pour_liste().order_by('-created_at')[:5]
     
     # Badges
     user_badges = UserBadge.objects.filter(user=user).select_related('badge')
@@ -167,19 +196,10 @@ def admin_user_detail(request, user_id):
 @admin_required
 def admin_approve_educator(request, user_id):
     """Approuver un éducateur"""
-    user = get_object_or_404(User, id=user_id)
+    user = get_object_or_404(User.objects.exclude(pk__in=en_suppression(User)), id=user_id)
     
-    # Accepter GET et POST pour plus de flexibilité
-    user.is_active = True
-    user.save()
-    
-    # Créer une notification
-    Notification.objects.create(
-        user=user,
-        notification_type='badge',
-        message=f"✅ Votre compte éducateur a été approuvé ! Bienvenue sur ComAutiste.",
-        link='/dashboard/'
-    )
+    # Accepter GET et POST pour plus de flexibilité (même action que la sélection groupée)
+    actions_groupees.lancer('approuver_educateurs', [user.id], par=request.user)
     
     messages.success(request, f"✅ L'éducateur {user.username} a été approuvé !")
     return redirect('admin_dashboard')
@@ -190,8 +210,7 @@ def admin_deactivate_user(request, user_id):
     """Désactiver un utilisateur"""
     user = get_object_or_404(User, id=user_id)
     
-    user.is_active = False
-    user.save()
+    actions_groupees.lancer('desactiver_utilisateurs', [user.id], par=request.user)
     messages.warning(request, f"⚠️ L'utilisateur {user.username} a été désactivé.")
     return redirect('admin_users_list')
 
@@ -199,11 +218,11 @@ def admin_deactivate_user(request, user_id):
 @admin_required
 def admin_delete_user(request, user_id):
     """Supprimer un utilisateur"""
-    user = get_object_or_404(User, id=user_id)
+    user = get_object_or_404(User.objects.exclude(pk__in=en_suppression(User)), id=user_id)
     
     username = user.username
-    user.delete()
-    messages.error(request, f"🗑️ L'utilisateur {username} a été supprimé définitivement.")
+    demander_suppression(user, demandee_par=request.user)
+    messages.error(request, f"🗑️ L'utilisateur {username} a été supprimé définitivement (données effacées en arrière-plan).")
     return redirect('admin_users_list')
 
 
@@ -214,7 +233,7 @@ def admin_enfants_list(request):
     
     search = request.GET.get('search', '')
     
-    enfants = Enfant.objects.select_related('parent').all()
+    enfants = Enfant.objects.select_related('parent').pour_liste()
     
     if search:
         enfants = enfants.filter(
@@ -239,7 +258,11 @@ def admin_forum_moderation(request):
     """Modération du forum"""
     
     topics = Topic.objects.select_related('created_by').order_by('-created_at')
-    posts = Post.objects.select_related('created_by', 'topic').order_by('-created_at')[:20]
+    # Aperçu des messages (post.apercu) : jamais le texte complet de chaque message
+    posts = (
+        Post.objects.filter(topic__suppression_demandee=False).select_related('created_by', 'topic')
+        .pour_liste().order_by('-created_at')[:20]
+    )
     
     context = {
         'topics': topics,
@@ -255,7 +278,7 @@ def admin_delete_topic(request, topic_id):
     topic = get_object_or_404(Topic, id=topic_id)
     
     topic_title = topic.title
-    topic.delete()
+    demander_suppression(topic, demandee_par=request.user)
     messages.success(request, f"🗑️ Le topic '{topic_title}' a été supprimé.")
     return redirect('admin_forum_moderation')
 
@@ -276,10 +299,14 @@ def admin_subscriptions(request):
     """Gestion des abonnements"""
     
     try:
-        subscriptions = Subscription.objects.select_related('parent').order_by('-start_date')
+        subscriptions = Subscription.objects.select_related('parent', 'level').pour_liste('level').order_by('-start_date')
         
-        active_subs = subscriptions.filter(active=True).count()
-        expired_subs = subscriptions.filter(active=False).count()
+        counts = Subscription.objects.aggregate(
+            active_subs=Count('id', filter=Q(active=True)),
+            expired_subs=Count('id', filter=Q(active=False)),
+        )
+        active_subs = counts['active_subs']
+        expired_subs = counts['expired_subs']
     except Exception as e:
         # Si erreur, retourner des valeurs vides
         subscriptions = []
@@ -297,6 +324,7 @@ def admin_subscriptions(request):
 
 # ========== STATISTIQUES AVANCÉES ==========
 @admin_required
+@lecture_replique
 def admin_statistics(request):
     """Page de statistiques détaillées"""
     
@@ -315,4 +343,117 @@ def admin_statistics(request):
         'topics_by_category': list(topics_by_category),
     }
     
-    return render(request, 'authen/admin/statistics.html', context)
\ No newline at end of file
+    return render(request, 'authen/admin/statistics.html', context)
+
+
+# ========== PROFILS DE REQUÊTES ==========
+@admin_required
+def admin_profils(request):
+    """Profils récents déclenchés avec ?_profil=1 et pics mémoire par vue"""
+    
+    context = {
+        'profils': profilage.lister_profils(),
+        'parametre': profilage.PARAMETRE,
+        'memoire_active': settings.MEMOIRE_ACTIF,
+        'memoire_par_vue': memoire.statistiques(),
+    }
+    
+    return render(request, 'authen/admin/profils.html', context)
+
+
+@admin_required
+def admin_profil_piles(request, profil_id):
+    """Piles repliées d'un profil (flamegraph.pl, speedscope.app)"""
+    chemin = profilage.chemin_piles(profil_id)
+    if chemin is None:
+        raise Http404("Profil introuvable")
+    
+    return FileResponse(open(chemin, 'rb'), as_attachment=True, filename=f'{profil_id}.collapsed', content_type='text/plain')
+
+
+# ========== REQUÊTES SQL LENTES ==========
+TOP_MAX = 500
+
+
+def lire_top(request, defaut=20):
+    """Paramètre ?top= borné entre 1 et TOP_MAX ; une valeur illisible donne le défaut"""
+    try:
+        top = int(request.GET.get('top', defaut))
+    except (TypeError, ValueError):
+        return defaut
+    return min(max(top, 1), TOP_MAX)
+
+
+@admin_required
+def admin_requetes_lentes(request):
+    """Requêtes lentes regroupées par empreinte, triées par temps cumulé"""
+    
+    context = {
+        'groupes': requetes_lentes.agreger(limite=lire_top(request)),
+        'seuil_ms': requetes_lentes.get_seuil_ms(),
+    }
+    
+    return render(request, 'authen/admin/requetes_lentes.html', context)
+
+
+# ========== SUPPRESSIONS DIFFÉRÉES ==========
+@admin_required
+def admin_suppressions(request):
+    """Suppressions de comptes, enfants et sujets exécutées en arrière-plan, avec leur progression"""
+    
+    suppressions = list(SuppressionDifferee.objects.select_related('demandee_par')[:50])
+    
+    context = {
+        'suppressions': suppressions,
+        'actives': any(suppression.etat in ('attente', 'en_cours') for suppression in suppressions),
+    }
+    
+    return render(request, 'authen/admin/suppressions.html', context)
+
+
+# ========== ACTIONS GROUPÉES ==========
+# Pages depuis lesquelles une action groupée peut être lancée
+RETOURS_ACTIONS = ('admin_users_list', 'admin_forum_moderation')
+
+
+@admin_required
+@require_POST
+def admin_action_groupee(request):
+    """Action sur les cases cochées, ou sur tous les utilisateurs du filtre courant (tout=1)"""
+    
+    nom = request.POST.get('action', '')
+    retour = request.POST.get('retour')
+    if retour not in RETOURS_ACTIONS:
+        retour = 'admin_dashboard'
+    
+    if request.POST.get('tout') and retour == 'admin_users_list':
+        ids = filtrer_utilisateurs(request.POST)[0].values_list('pk', flat=True)
+    else:
+        ids = [i for i in request.POST.getlist('ids') if i.isdigit()]
+    
+    if nom not in actions_groupees.ACTIONS or not ids:
+        messages.warning(request, "⚠️ Choisissez une action et au moins un élément.")
+        return redirect(retour)
+    
+    libelle = actions_groupees.ACTIONS[nom][0]
+    modifies, tache = actions_groupees.lancer(nom, ids, par=request.user)
+    if tache is not None:
+        messages.info(request, f"⏳ {tache.libelle} : exécution en arrière-plan.")
+        return redirect('admin_actions_groupees')
+    
+    messages.success(request, f"{libelle} : {modifies} élément(s) modifié(s).")
+    return redirect(retour)
+
+
+@admin_required
+def admin_actions_groupees(request):
+    """Actions groupées exécutées en arrière-plan, avec leur progression"""
+    
+    taches = list(ActionGroupee.objects.defer('ids').select_related('demandee_par')[:50])
+    
+    context = {
+        'taches': taches,
+        'actives': any(tache.etat in ('attente', 'en_cours') for tache in taches),
+    }
+    
+    return render(request, 'authen/admin/actions_groupees.html', context)
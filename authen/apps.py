@@ -3,3 +3,14 @@ from django.apps import AppConfig
 
 class AuthenConfig(AppConfig):
     name = 'authen'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from comautis.base_sqlite import configurer_connexion
+        from comautis.requetes_lentes import installer_journal
+
+        # PRAGMA SQLite (WAL, busy_timeout...) à chaque nouvelle connexion
+        connection_created.connect(configurer_connexion, dispatch_uid='comautis_pragmas_sqlite')
+        # Journal des requêtes lentes sur chaque connexion
+        connection_created.connect(installer_journal, dispatch_uid='comautis_requetes_lentes')
@@ -0,0 +1,319 @@
+"""
+Archives froides des activités
+
+Les mois plus anciens que ACTIVITES_MOIS_CHAUDS quittent la table Activite
+(commande archiver_activites) et sont écrits dans ACTIVITES_ARCHIVES_DOSSIER :
+- segments AAAA-MM.NNNN.jsonl.gz : une activité par ligne (un mois archivé une
+  seconde fois reçoit un nouveau segment), réécrits seulement pour retirer les
+  activités d'un enfant ou d'un compte supprimé (retirer_enfants) ;
+- index.json : pour chaque segment, lignes et min/max de date_debut, enfant_id
+  et id, pour n'ouvrir que les segments utiles ;
+- ResumeActivitesMois : totaux par enfant et par mois, lus par les statistiques
+  sans décompresser aucun segment.
+
+activity_tracker fusionne ces archives avec la table : mêmes fonctions, mêmes
+résultats avant et après archivage.
+"""
+import gzip
+import json
+import os
+import threading
+from collections import Counter, defaultdict
+from datetime import date, datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from comautis.base_sqlite import verrou_fichier
+
+from .models import ResumeActivitesMois
+
+CHAMPS = [
+    'id', 'enfant_id', 'jeu', 'date_debut', 'date_fin', 'duree_minutes', 'score', 'reussi', 'created_at', 'session',
+]
+DATES = ('date_debut', 'date_fin', 'created_at')
+
+_index_cache = {'cle': None, 'index': None}
+_index_lock = threading.Lock()
+
+
+def get_dossier():
+    return Path(getattr(settings, 'ACTIVITES_ARCHIVES_DOSSIER', settings.BASE_DIR / 'archives' / 'activites'))
+
+
+def get_mois_chauds():
+    return getattr(settings, 'ACTIVITES_MOIS_CHAUDS', 13)
+
+
+def debut_mois(jour):
+    return jour.replace(day=1)
+
+
+def mois_suivant(mois):
+    return date(mois.year + mois.month // 12, mois.month % 12 + 1, 1)
+
+
+def debut_aware(jour):
+    """Minuit (fuseau courant) du jour donné"""
+    return timezone.make_aware(datetime.combine(jour, datetime.min.time()))
+
+
+# ========== INDEX ==========
+
+def lire_index():
+    """{'segments': [...]} ; relu seulement si index.json a changé"""
+    chemin = get_dossier() / 'index.json'
+    try:
+        cle = (chemin, chemin.stat().st_mtime_ns)
+    except FileNotFoundError:
+        return {'segments': []}
+    with _index_lock:
+        if _index_cache['cle'] != cle:
+            with open(chemin, encoding='utf-8') as f:
+                _index_cache['index'] = json.load(f)
+            _index_cache['cle'] = cle
+        return _index_cache['index']
+
+
+def ecrire_atomique(chemin, ecrire, mode='w'):
+    """Écrit dans un fichier temporaire, fsync, puis renomme : jamais de fichier à moitié écrit"""
+    temporaire = chemin.with_name(f'.{chemin.name}.tmp')
+    ouvrir = gzip.open if chemin.suffix == '.gz' else open
+    kwargs = {} if 'b' in mode else {'encoding': 'utf-8'}
+    with ouvrir(temporaire, mode, **kwargs) as f:
+        ecrire(f)
+    with open(temporaire, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(temporaire, chemin)
+
+
+def verrou_archives():
+    """Un seul écrivain des segments et de l'index (archivage ou suppression)"""
+    dossier = get_dossier()
+    dossier.mkdir(parents=True, exist_ok=True)
+    return verrou_fichier(str(dossier / '.verrou'))
+
+
+def ecrire_index(index):
+    ecrire_atomique(get_dossier() / 'index.json', lambda f: json.dump(index, f, ensure_ascii=False, indent=1))
+
+
+def ajouter_segment(entree):
+    index = dict(lire_index())
+    index['segments'] = [*index['segments'], entree]
+    ecrire_index(index)
+
+
+def segments(mois=None, debut=None, fin=None, enfant_ids=None):
+    """Segments de l'index dont les min/max recoupent les critères"""
+    for entree in lire_index()['segments']:
+        if mois is not None and entree['mois'] != mois.strftime('%Y-%m'):
+            continue
+        if debut is not None and datetime.fromisoformat(entree['date_max']) < debut:
+            continue
+        if fin is not None and datetime.fromisoformat(entree['date_min']) >= fin:
+            continue
+        if enfant_ids is not None and not any(entree['enfant_min'] <= i <= entree['enfant_max'] for i in enfant_ids):
+            continue
+        yield entree
+
+
+# ========== SEGMENTS ==========
+
+def vers_json(activite):
+    ligne = {champ: activite[champ] for champ in CHAMPS}
+    for champ in DATES:
+        if ligne[champ] is not None:
+            ligne[champ] = ligne[champ].isoformat()
+    if ligne['session'] is not None:
+        ligne['session'] = str(ligne['session'])
+    return ligne
+
+
+def depuis_json(ligne):
+    for champ in DATES:
+        if ligne[champ] is not None:
+            ligne[champ] = datetime.fromisoformat(ligne[champ])
+    return ligne
+
+
+def ecrire_lignes(chemin, activites):
+    """Écrit un segment à partir d'un itérable de dicts (CHAMPS) ; renvoie ses bornes ({} si vide)"""
+    bornes = {}
+
+    def ecrire(f):
+        for activite in activites:
+            f.write((json.dumps(vers_json(activite), ensure_ascii=False) + '\n').encode('utf-8'))
+            for champ, cle in (('date_debut', 'date'), ('enfant_id', 'enfant'), ('id', 'id')):
+                valeur = activite[champ]
+                bornes[f'{cle}_min'] = min(bornes.get(f'{cle}_min', valeur), valeur)
+                bornes[f'{cle}_max'] = max(bornes.get(f'{cle}_max', valeur), valeur)
+            bornes['lignes'] = bornes.get('lignes', 0) + 1
+
+    ecrire_atomique(chemin, ecrire, mode='wb')
+    return bornes
+
+
+def entree_index(chemin, mois, bornes):
+    return {
+        'fichier': chemin.name,
+        'mois': mois,
+        **bornes,
+        'date_min': bornes['date_min'].isoformat(),
+        'date_max': bornes['date_max'].isoformat(),
+        'cree_le': timezone.now().isoformat(),
+    }
+
+
+def ecrire_segment(mois, activites):
+    """
+    Nouveau segment du mois à partir d'un itérable de dicts (CHAMPS), lu une seule fois
+    Renvoie l'entrée ajoutée à l'index (None si aucune activité)
+    """
+    prefixe = mois.strftime('%Y-%m')
+    with verrou_archives():
+        # Numéro suivant le plus grand : des segments vidés par retirer_enfants ont pu disparaître
+        numero = 1 + max((int(entree['fichier'].split('.')[1]) for entree in segments(mois=mois)), default=0)
+        chemin = get_dossier() / f'{prefixe}.{numero:04d}.jsonl.gz'
+        bornes = ecrire_lignes(chemin, activites)
+        if not bornes:
+            chemin.unlink()
+            return None
+        entree = entree_index(chemin, prefixe, bornes)
+        ajouter_segment(entree)
+    return entree
+
+
+def lire_segment(entree):
+    with gzip.open(get_dossier() / entree['fichier'], 'rt', encoding='utf-8') as f:
+        for ligne in f:
+            yield depuis_json(json.loads(ligne))
+
+
+def activites_archivees(enfant_ids, debut=None, fin=None):
+    """Activités archivées des enfants, date_debut dans [debut, fin[ (dicts de CHAMPS)"""
+    ids = set(enfant_ids)
+    for entree in segments(debut=debut, fin=fin, enfant_ids=ids):
+        for activite in lire_segment(entree):
+            if activite['enfant_id'] not in ids:
+                continue
+            if debut is not None and activite['date_debut'] < debut:
+                continue
+            if fin is not None and activite['date_debut'] >= fin:
+                continue
+            yield activite
+
+
+def retirer_enfants(enfant_ids):
+    """
+    Retire des archives les activités de ces enfants (suppression d'un enfant ou d'un compte)
+    Seuls les segments qui en contiennent sont réécrits ; renvoie le nombre d'activités retirées
+    """
+    ids = set(enfant_ids)
+    if not ids or not lire_index()['segments']:
+        return 0
+    retirees = 0
+    with verrou_archives():
+        index = dict(lire_index())
+        entrees = []
+        for entree in index['segments']:
+            concernees = sum(
+                activite['enfant_id'] in ids for activite in lire_segment(entree)
+            ) if any(entree['enfant_min'] <= i <= entree['enfant_max'] for i in ids) else 0
+            if not concernees:
+                entrees.append(entree)
+                continue
+            chemin = get_dossier() / entree['fichier']
+            bornes = ecrire_lignes(chemin, (a for a in lire_segment(entree) if a['enfant_id'] not in ids))
+            retirees += concernees
+            if bornes:
+                entrees.append({**entree_index(chemin, entree['mois'], bornes), 'cree_le': entree['cree_le']})
+            else:
+                chemin.unlink()
+        if retirees:
+            ecrire_index({**index, 'segments': entrees})
+    return retirees
+
+
+def ids_archives(mois):
+    """Ids déjà présents dans les segments du mois (reprise après un archivage interrompu)"""
+    return {activite['id'] for entree in segments(mois=mois) for activite in lire_segment(entree)}
+
+
+# ========== RÉSUMÉS ==========
+
+def nouveaux_resumes():
+    """{(enfant_id, mois): totaux} à remplir avec ajouter_au_resume()"""
+    return defaultdict(lambda: {
+        'nombre': 0, 'minutes': 0, 'reussies': 0, 'scores': 0, 'score_total': 0, 'jeux': {}, 'jours': set(),
+    })
+
+
+def ajouter_au_resume(resumes, activite):
+    jour = timezone.localtime(activite['date_debut']).date()
+    resume = resumes[(activite['enfant_id'], debut_mois(jour))]
+    resume['nombre'] += 1
+    resume['minutes'] += activite['duree_minutes']
+    resume['reussies'] += bool(activite['reussi'])
+    if activite['score'] is not None:
+        resume['scores'] += 1
+        resume['score_total'] += activite['score']
+    jeu = resume['jeux'].setdefault(activite['jeu'], [0, 0])
+    jeu[0] += 1
+    jeu[1] += activite['duree_minutes']
+    resume['jours'].add(jour.day)
+
+
+def enregistrer_resumes(resumes):
+    """Ajoute les totaux aux résumés existants (un mois peut être archivé en plusieurs fois)"""
+    existants = {
+        (resume.enfant_id, resume.mois): resume
+        for resume in ResumeActivitesMois.objects.filter(
+            enfant_id__in={enfant_id for enfant_id, _ in resumes}, mois__in={mois for _, mois in resumes},
+        )
+    }
+    nouveaux = []
+    for (enfant_id, mois), totaux in resumes.items():
+        resume = existants.get((enfant_id, mois))
+        if resume is None:
+            resume = ResumeActivitesMois(enfant_id=enfant_id, mois=mois, jours=[], jeux={})
+            nouveaux.append(resume)
+        for champ in ('nombre', 'minutes', 'reussies', 'scores', 'score_total'):
+            setattr(resume, champ, getattr(resume, champ) + totaux[champ])
+        for jeu, (sessions, minutes) in totaux['jeux'].items():
+            cumul = resume.jeux.get(jeu, [0, 0])
+            resume.jeux[jeu] = [cumul[0] + sessions, cumul[1] + minutes]
+        resume.jours = sorted(set(resume.jours) | totaux['jours'])
+    ResumeActivitesMois.objects.bulk_create(nouveaux)
+    ResumeActivitesMois.objects.bulk_update(
+        [resume for resume in existants.values()],
+        ['nombre', 'minutes', 'reussies', 'scores', 'score_total', 'jeux', 'jours'],
+    )
+
+
+def resumes_archives(enfant_ids):
+    """{enfant_id: totaux de tous ses mois archivés} en une requête ('jours' : dates jouées)"""
+    totaux = defaultdict(lambda: {
+        'nombre': 0, 'minutes': 0, 'reussies': 0, 'scores': 0, 'score_total': 0, 'jeux': Counter(),
+        'minutes_par_jeu': Counter(), 'jours': set(),
+    })
+    for resume in ResumeActivitesMois.objects.filter(enfant_id__in=enfant_ids):
+        total = totaux[resume.enfant_id]
+        for champ in ('nombre', 'minutes', 'reussies', 'scores', 'score_total'):
+            total[champ] += getattr(resume, champ)
+        for jeu, (sessions, minutes) in resume.jeux.items():
+            total['jeux'][jeu] += sessions
+            total['minutes_par_jeu'][jeu] += minutes
+        total['jours'].update(resume.mois.replace(day=jour) for jour in resume.jours)
+    return totaux
+
+
+def par_jour_archive(enfant_ids, debut):
+    """{enfant_id: Counter(jour: activités)} des activités archivées depuis debut"""
+    if not lire_index()['segments']:
+        return {}
+    compte = defaultdict(Counter)
+    for activite in activites_archivees(enfant_ids, debut=debut):
+        compte[activite['enfant_id']][timezone.localtime(activite['date_debut']).date()] += 1
+    return compte
@@ -0,0 +1,159 @@
+"""
+Jeux hors ligne sur les tablettes (service worker /service-worker.js).
+
+python manage.py generer_precache (après collectstatic) rend chaque page de
+PRECACHE_PAGES comme pour un enfant aux préférences par défaut, relève les
+statiques qu'elle charge (moteur, images, sons, packs des jeux) et écrit
+PRECACHE_MANIFEST :
+
+    {"version": "...", "entrees": [{"url": "/static/js/jeux/moteur.3f2a1c9b8e7d.js", "revision": null}, ...]}
+
+revision null : l'URL change avec le contenu (nom haché, pack ?v=) ;
+sinon empreinte du contenu (pages, statiques non hachés). Le service worker
+embarque le manifest : un nouveau déploiement change son script, et
+l'installation ne télécharge que les entrées absentes de son cache.
+"""
+import hashlib
+import json
+import logging
+import re
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from .jeux_packs import charger_pack
+from .models import UserPreferences
+
+logger = logging.getLogger(__name__)
+
+# Packs de contenu des jeux, avec leur version
+MOTIF_PACK = re.compile(r'/api/jeux/(?P<jeu>[\w-]+)/pack\.json\?v=\w+')
+
+
+def get_pages():
+    return getattr(settings, 'PRECACHE_PAGES', [])
+
+
+def get_chemin_manifest():
+    return Path(getattr(settings, 'PRECACHE_MANIFEST', Path(settings.STATIC_ROOT) / 'precache.json'))
+
+
+def empreinte(contenu):
+    return hashlib.sha1(contenu).hexdigest()[:12]
+
+
+def motif_statiques():
+    return re.compile(re.escape(settings.STATIC_URL) + r'''[^"'\s<>()\\?#]+''')
+
+
+# ========== GÉNÉRATION ==========
+
+def rendre_page(nom):
+    """HTML de la page pour un enfant aux préférences par défaut (sans base ni session)"""
+    url = reverse(nom)
+    request = RequestFactory().get(url)
+    request.user = User(username='precache')  # non enregistré : connecté, sans requête
+    request.preferences = UserPreferences()
+    request.META['CSRF_COOKIE'] = 'p' * 32  # jeton fixe : même page, même révision
+    response = resolve(url).func(request)
+    if response.status_code != 200:
+        logger.warning("Page %s non mise en cache hors ligne (statut %s)", nom, response.status_code)
+        return url, None
+    return url, response.content
+
+
+def revision_statique(nom):
+    """None si le nom est haché par le stockage, sinon empreinte du fichier ('' s'il est introuvable)"""
+    if nom in getattr(staticfiles_storage, 'hashed_files', {}).values():
+        return None
+    chemin = finders.find(nom)
+    if chemin is None or not Path(chemin).is_file():
+        return ''
+    return empreinte(Path(chemin).read_bytes())
+
+
+def generer_manifest():
+    """Manifest de précache des pages de PRECACHE_PAGES et de tout ce qu'elles chargent"""
+    statiques = motif_statiques()
+    entrees = {}
+    absents = set()
+    textes = []
+
+    for nom in get_pages():
+        url, contenu = rendre_page(nom)
+        if contenu is None:
+            continue
+        entrees[url] = empreinte(contenu)
+        textes.append(contenu.decode('utf-8'))
+
+    # Packs référencés par les pages : leur URL versionnée, puis les images qu'ils citent
+    for texte in list(textes):
+        for correspondance in MOTIF_PACK.finditer(texte):
+            pack = charger_pack(correspondance['jeu'])
+            if pack is not None:
+                entrees[correspondance.group(0)] = None
+                textes.append(pack['variantes']['identite'].decode('utf-8'))
+
+    for texte in textes:
+        for url in statiques.findall(texte):
+            # Dossier complété en JavaScript ('/static/sons/' + nom) : pas un fichier
+            if url in entrees or url in absents or url.endswith('/'):
+                continue
+            revision = revision_statique(url[len(settings.STATIC_URL):])
+            if revision == '':
+                logger.warning("Statique introuvable, non mis en cache hors ligne : %s", url)
+                absents.add(url)
+                continue
+            entrees[url] = revision
+
+    liste = [{'url': url, 'revision': revision} for url, revision in sorted(entrees.items())]
+    return {
+        'version': empreinte(json.dumps(liste, sort_keys=True).encode()),
+        'entrees': liste,
+    }
+
+
+def ecrire_manifest(manifest):
+    chemin = get_chemin_manifest()
+    chemin.parent.mkdir(parents=True, exist_ok=True)
+    tmp = chemin.with_suffix('.tmp')
+    tmp.write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding='utf-8')
+    tmp.replace(chemin)
+
+
+# ========== SERVICE WORKER ==========
+
+@lru_cache(maxsize=1)
+def _lire_manifest(chemin, date):
+    if date is None:
+        # Pas encore généré (développement) : calculé une fois par process
+        return generer_manifest()
+    return json.loads(Path(chemin).read_text(encoding='utf-8'))
+
+
+def charger_manifest():
+    chemin = get_chemin_manifest()
+    return _lire_manifest(str(chemin), chemin.stat().st_mtime_ns if chemin.exists() else None)
+
+
+def reponse_service_worker(request):
+    """Script du service worker, manifest de précache compris"""
+    manifest = charger_manifest()
+    script = render_to_string('authen/service-worker.js', {
+        'version': manifest['version'],
+        'manifest': json.dumps(manifest['entrees'], ensure_ascii=False),
+        'page_repli': json.dumps(reverse('liste_jeux')),
+    })
+    response = HttpResponse(script, content_type='application/javascript; charset=utf-8')
+    # Vérifié à chaque navigation : un nouveau manifest installe un nouveau worker
+    response['Cache-Control'] = 'no-cache'
+    response['Service-Worker-Allowed'] = '/'
+    return response
@@ -0,0 +1,138 @@
+import hashlib
+import io
+from pathlib import Path
+
+from django.conf import settings
+from django.templatetags.static import static
+
+from . import manifests
+from .manifests import hash_fichier
+
+# Dossier des images originales et dossier des variantes WebP générées
+IMAGES_DIR = Path(settings.BASE_DIR) / 'authen' / 'static' / 'images'
+IMAGES_OPTIMISEES_DIR = Path(settings.BASE_DIR) / 'authen' / 'static' / 'images_optimisees'
+MANIFEST_PATH = IMAGES_OPTIMISEES_DIR / 'manifest.json'
+
+EXTENSIONS_SOURCES = ('.jpg', '.jpeg', '.png')
+
+LARGEURS_PAR_DEFAUT = [160, 320, 640, 1024]
+QUALITE_PAR_DEFAUT = 80
+
+
+def get_largeurs():
+    """Largeurs des variantes, surchargeables via settings.IMAGES_LARGEURS"""
+    return sorted(getattr(settings, 'IMAGES_LARGEURS', LARGEURS_PAR_DEFAUT))
+
+
+def get_qualite():
+    return getattr(settings, 'IMAGES_QUALITE_WEBP', QUALITE_PAR_DEFAUT)
+
+
+def lister_sources():
+    """Liste les images originales sous la forme {'images/jeux/fruits/apple.png': Path(...)}"""
+    sources = {}
+    for chemin in sorted(IMAGES_DIR.rglob('*')):
+        if chemin.suffix.lower() in EXTENSIONS_SOURCES:
+            cle = chemin.relative_to(IMAGES_DIR.parent).as_posix()
+            sources[cle] = chemin
+    return sources
+
+
+def charger_manifest():
+    return manifests.charger_manifest(MANIFEST_PATH)
+
+
+def ecrire_manifest(manifest):
+    manifests.ecrire_manifest(MANIFEST_PATH, manifest)
+
+
+def get_manifest():
+    """Manifest (dimensions + variantes) mis en cache pour la durée du process"""
+    return manifests.get_manifest(MANIFEST_PATH)
+
+
+def est_a_jour(entree, source_hash, largeurs, qualite):
+    """Vérifie qu'une entrée du manifest correspond à la source et aux réglages"""
+    if not entree:
+        return False
+    if entree.get('source_hash') != source_hash or entree.get('qualite') != qualite:
+        return False
+    if entree.get('largeurs_demandees') != largeurs:
+        return False
+    return all(
+        (IMAGES_OPTIMISEES_DIR.parent / v['chemin']).exists()
+        for v in entree['variantes']
+    )
+
+
+def traiter_image(cle, source, largeurs, qualite):
+    """
+    Génère les variantes WebP d'une image (exécuté dans un process du pool)
+    Retourne l'entrée du manifest
+    """
+    from PIL import Image, ImageOps
+
+    source = Path(source)
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        largeur, hauteur = image.size
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+        # Les largeurs plus grandes que l'original sont remplacées par l'original
+        largeurs_cibles = sorted({min(l, largeur) for l in largeurs})
+
+        variantes = []
+        base = Path(cle).relative_to('images').with_suffix('')
+        for largeur_cible in largeurs_cibles:
+            hauteur_cible = max(1, round(hauteur * largeur_cible / largeur))
+            redim = image if largeur_cible == largeur else image.resize(
+                (largeur_cible, hauteur_cible), Image.LANCZOS
+            )
+            tampon = io.BytesIO()
+            redim.save(tampon, 'WEBP', quality=qualite)
+            contenu = tampon.getvalue()
+
+            contenu_hash = hashlib.sha256(contenu).hexdigest()[:12]
+            destination = IMAGES_OPTIMISEES_DIR / f'{base}.{largeur_cible}.{contenu_hash}.webp'
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            destination.write_bytes(contenu)
+
+            variantes.append({
+                'largeur': largeur_cible,
+                'hauteur': hauteur_cible,
+                'chemin': destination.relative_to(IMAGES_OPTIMISEES_DIR.parent).as_posix(),
+                'taille': len(contenu),
+            })
+
+    return {
+        'source_hash': hash_fichier(source),
+        'source_taille': source.stat().st_size,
+        'largeur': largeur,
+        'hauteur': hauteur,
+        'qualite': qualite,
+        'largeurs_demandees': largeurs,
+        'variantes': variantes,
+    }
+
+
+def get_image(cle):
+    """Entrée du manifest pour une image ('images/...'), ou None"""
+    return get_manifest().get(cle)
+
+
+def url_image(cle, largeur=None):
+    """
+    URL de la plus petite variante WebP couvrant la largeur demandée
+    Retourne l'URL de l'original si l'image n'a pas été optimisée
+    """
+    entree = get_image(cle)
+    if not entree or not entree['variantes']:
+        return static(cle)
+
+    variantes = entree['variantes']
+    if largeur:
+        for variante in variantes:
+            if variante['largeur'] >= largeur:
+                return static(variante['chemin'])
+    return static(variantes[-1]['chemin'])
@@ -0,0 +1,114 @@
+"""
+Packs de contenu des jeux à moteur partagé (memory, compter, quiz).
+
+Un jeu = une coquille HTML commune (authen/jeux/moteur.html), le moteur
+static/js/jeux/moteur.js (nom haché, mis en cache une seule fois pour tous les
+jeux) et un pack JSON authen/packs_jeux/<jeu>.json : textes, couleurs, cartes,
+questions. Passer d'un jeu à l'autre ne télécharge plus que le pack.
+
+Les images du pack sont résolues ici (variante WebP de images_manager), puis le
+pack est sérialisé et compressé une fois par process. Sa version est l'empreinte
+du contenu servi : /api/jeux/<jeu>/pack.json?v=<version> est immuable, un pack
+modifié (ou une image réoptimisée) change d'URL.
+"""
+import hashlib
+import json
+from functools import lru_cache
+from pathlib import Path
+
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.urls import reverse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+
+from comautis.pages_precalculees import choisir_encodage, compresser, version_deploiement
+from .images_manager import url_image
+
+PACKS_DIR = Path(__file__).resolve().parent / 'packs_jeux'
+
+# Largeur d'affichage des cartes (variante WebP servie)
+LARGEUR_IMAGES = 320
+
+# Pack versionné : gardé un an par le navigateur, sans revalidation
+DUREE_IMMUABLE = 365 * 24 * 3600
+
+
+def lister_packs():
+    return sorted(chemin.stem for chemin in PACKS_DIR.glob('*.json'))
+
+
+def resoudre_images(valeur):
+    """Remplace chaque clé 'image' (chemin sous static/) par l'URL de sa variante optimisée"""
+    if isinstance(valeur, dict):
+        return {
+            cle: url_image(v, LARGEUR_IMAGES) if cle == 'image' else resoudre_images(v)
+            for cle, v in valeur.items()
+        }
+    if isinstance(valeur, list):
+        return [resoudre_images(v) for v in valeur]
+    return valeur
+
+
+@lru_cache(maxsize=32)
+def _compiler(chemin, date, deploiement):
+    """Pack résolu, sérialisé et compressé (clé : fichier, date de modification, déploiement)"""
+    with open(chemin, encoding='utf-8') as f:
+        donnees = resoudre_images(json.load(f))
+    contenu = json.dumps(donnees, ensure_ascii=False, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    return {
+        'donnees': donnees,
+        'version': hashlib.sha1(contenu).hexdigest()[:12],
+        'variantes': compresser(contenu),
+    }
+
+
+def charger_pack(jeu):
+    """Pack compilé du jeu, None s'il n'existe pas"""
+    chemin = PACKS_DIR / f'{jeu}.json'
+    if not chemin.is_file():
+        return None
+    return _compiler(str(chemin), chemin.stat().st_mtime_ns, version_deploiement())
+
+
+def url_pack(jeu, pack=None):
+    pack = pack or charger_pack(jeu)
+    return f"{reverse('pack_jeu', kwargs={'jeu': jeu})}?v={pack['version']}"
+
+
+def contexte_jeu(jeu):
+    """Contexte de la coquille authen/jeux/moteur.html"""
+    pack = charger_pack(jeu)
+    if pack is None:
+        raise Http404("Jeu introuvable")
+    return {
+        'jeu': jeu,
+        'activite': jeu.replace('-', '_'),  # nom du jeu dans Activite.JEUX_CHOICES (auto_tracker.js)
+        'moteur': pack['donnees']['moteur'],
+        'page': pack['donnees']['page'],
+        'url_pack': url_pack(jeu, pack),
+    }
+
+
+def reponse_pack(request, jeu):
+    """JSON du pack, précompressé, avec ETag (304) et cache immuable si ?v= est la version courante"""
+    pack = charger_pack(jeu)
+    if pack is None:
+        raise Http404("Pack introuvable")
+
+    encodage = choisir_encodage(request)
+    etag = f'"{pack["version"]}-{encodage}"'
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(pack['variantes'][encodage], content_type='application/json; charset=utf-8')
+        if encodage != 'identite':
+            response['Content-Encoding'] = encodage
+
+    response['ETag'] = etag
+    if request.GET.get('v') == pack['version']:
+        patch_cache_control(response, public=True, max_age=DUREE_IMMUABLE, immutable=True)
+    else:
+        # Ancienne version ou URL sans version : contenu courant, revalidé par ETag
+        patch_cache_control(response, public=True, no_cache=True)
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
@@ -0,0 +1,83 @@
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from authen import archives_activites as archives
+from authen.models import Activite, Enfant
+from authen.suppressions import en_suppression
+from comautis.base_sqlite import ecriture_exclusive
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive les mois d'activités plus anciens que ACTIVITES_MOIS_CHAUDS : segments gzip JSONL "
+        "+ résumés mensuels, puis suppression de la table (à lancer une fois par mois)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mois-chauds', type=int, default=None,
+                            help="Mois gardés dans la table, mois en cours compris (défaut : ACTIVITES_MOIS_CHAUDS)")
+        parser.add_argument('--lot', type=int, default=2000, help="Activités lues / supprimées par requête")
+        parser.add_argument('--simulation', action='store_true', help="Affiche ce qui serait archivé sans rien modifier")
+
+    def handle(self, *args, **options):
+        mois_chauds = options['mois_chauds'] or archives.get_mois_chauds()
+        if mois_chauds < 2:
+            # Séries, progression sur 30 jours, jeux récents : lus dans la table uniquement
+            raise CommandError("--mois-chauds doit valoir au moins 2")
+        lot = max(1, options['lot'])
+
+        rang = timezone.localdate().year * 12 + timezone.localdate().month - 1 - (mois_chauds - 1)
+        limite = date(rang // 12, rang % 12 + 1, 1)
+        mois_froids = list(Activite.objects.filter(date_debut__lt=archives.debut_aware(limite)).dates('date_debut', 'month'))
+        if not mois_froids:
+            self.stdout.write(f"Rien à archiver avant {limite:%m/%Y}")
+            return
+
+        total = 0
+        for mois in mois_froids:
+            activites = Activite.objects.filter(
+                date_debut__gte=archives.debut_aware(mois),
+                date_debut__lt=archives.debut_aware(archives.mois_suivant(mois)),
+            ).exclude(
+                # En cours de suppression : supprimées de la table, jamais archivées
+                Q(enfant_id__in=en_suppression(Enfant)) | Q(enfant__parent_id__in=en_suppression(User)),
+            )
+            if options['simulation']:
+                self.stdout.write(f"  {mois:%Y-%m} : {activites.count()} activités")
+                continue
+            total += self.archiver_mois(mois, activites, lot)
+
+        if not options['simulation']:
+            self.stdout.write(self.style.SUCCESS(
+                f"🧊 {total} activités archivées ({len(mois_froids)} mois) dans {archives.get_dossier()}"
+            ))
+
+    def archiver_mois(self, mois, activites, lot):
+        # Archivage interrompu après l'écriture du segment : ces lignes ne sont pas réécrites
+        deja_archivees = archives.ids_archives(mois)
+        ids = []
+        resumes = archives.nouveaux_resumes()
+
+        def flux():
+            for activite in activites.order_by('id').values(*archives.CHAMPS).iterator(chunk_size=lot):
+                ids.append(activite['id'])
+                archives.ajouter_au_resume(resumes, activite)
+                if activite['id'] not in deja_archivees:
+                    yield activite
+
+        # Segment écrit (fsync) avant toute suppression
+        entree = archives.ecrire_segment(mois, flux())
+
+        with ecriture_exclusive(), transaction.atomic():
+            archives.enregistrer_resumes(resumes)
+            for i in range(0, len(ids), lot):
+                Activite.objects.filter(id__in=ids[i:i + lot]).delete()
+
+        fichier = entree['fichier'] if entree else 'segment existant'
+        self.stdout.write(f"  {mois:%Y-%m} : {len(ids)} activités → {fichier}")
+        return len(ids)
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from authen import actions_groupees
+from authen.models import SuppressionDifferee
+from authen.suppressions import executer_en_attente
+
+
+class Command(BaseCommand):
+    help = (
+        "Exécute les suppressions différées et actions groupées en attente ou abandonnées "
+        "(worker redémarré) sans attendre le thread d'arrière-plan (ex : cron toutes les 10 minutes)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--erreurs', action='store_true', help="Relance aussi les suppressions en erreur")
+
+    def handle(self, *args, **options):
+        terminees = executer_en_attente(erreurs=options['erreurs'])
+        erreurs = SuppressionDifferee.objects.filter(etat='erreur').count()
+        self.stdout.write(self.style.SUCCESS(f"🗑️ {terminees} suppressions terminées ({erreurs} en erreur)"))
+        actions = actions_groupees.executer_en_attente()
+        self.stdout.write(self.style.SUCCESS(f"⚙️ {actions} actions groupées terminées"))
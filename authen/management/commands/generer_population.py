@@ -0,0 +1,237 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from authen.models import Activite, Enfant, Notification, UserProfile
+from forum.models import ICON_CHOICES, Post, Reaction, Topic
+from paiement.models import Level, Subscription
+
+PRENOMS = ['Léo', 'Emma', 'Noah', 'Jade', 'Louis', 'Alice', 'Adam', 'Lina', 'Hugo', 'Rose', 'Nathan', 'Inès']
+NOMS = ['Martin', 'Bernard', 'Dubois', 'Thomas', 'Robert', 'Petit', 'Durand', 'Leroy', 'Moreau', 'Simon']
+NIVEAUX_PAR_DEFAUT = [('Découverte', Decimal('0')), ('Essentiel', Decimal('4.99')), ('Premium', Decimal('9.99'))]
+
+
+def par_lots(objets, taille):
+    """Découpe un itérable (même infini ou très long) en listes de `taille` éléments"""
+    objets = iter(objets)
+    while lot := list(islice(objets, taille)):
+        yield lot
+
+
+@contextmanager
+def dates_imposees(*modeles):
+    """Désactive auto_now / auto_now_add pendant l'insertion : les dates générées sont conservées"""
+    champs = [
+        champ for modele in modeles for champ in modele._meta.concrete_fields
+        if getattr(champ, 'auto_now', False) or getattr(champ, 'auto_now_add', False)
+    ]
+    etats = [(champ, champ.auto_now, champ.auto_now_add) for champ in champs]
+    for champ in champs:
+        champ.auto_now = champ.auto_now_add = False
+    try:
+        yield
+    finally:
+        for champ, auto_now, auto_now_add in etats:
+            champ.auto_now, champ.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère une population réaliste (parents, enfants, activités, forum, notifications, "
+        "abonnements) avec bulk_create par lots"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--parents', type=int, default=200)
+        parser.add_argument('--educateurs', type=int, default=10)
+        parser.add_argument('--enfants-max', type=int, default=3, help="Enfants par parent (1 à N)")
+        parser.add_argument('--activites', type=int, default=100_000, help="Activités au total")
+        parser.add_argument('--jours', type=int, default=365, help="Période couverte par les activités")
+        parser.add_argument('--topics', type=int, default=500)
+        parser.add_argument('--posts', type=int, default=10, help="Réponses par sujet (moyenne)")
+        parser.add_argument('--reactions', type=int, default=5, help="Réactions par sujet (moyenne)")
+        parser.add_argument('--notifications', type=int, default=20, help="Notifications par utilisateur (moyenne)")
+        parser.add_argument('--abonnes', type=float, default=0.3, help="Part des parents abonnés")
+        parser.add_argument('--prefixe', default='pop', help="Préfixe des noms d'utilisateur générés")
+        parser.add_argument('--mot-de-passe', default='comautis', help="Mot de passe de tous les comptes générés")
+        parser.add_argument('--lot', type=int, default=5000, help="Lignes par bulk_create")
+        parser.add_argument('--graine', type=int, default=42, help="Graine aléatoire (population reproductible)")
+
+    def inserer(self, modele, objets, **kwargs):
+        """bulk_create par lots, une transaction par lot"""
+        debut = time.perf_counter()
+        total = 0
+        for lot in par_lots(objets, self.lot):
+            with transaction.atomic():
+                modele.objects.bulk_create(lot, batch_size=self.lot, **kwargs)
+            total += len(lot)
+        if self.verbosity:
+            self.stdout.write(
+                f"  {modele._meta.verbose_name_plural:<24} {total:>10} lignes  "
+                f"({time.perf_counter() - debut:.1f} s)"
+            )
+        return total
+
+    def date_aleatoire(self, jours):
+        return self.maintenant - timedelta(seconds=self.random.randint(0, jours * 86400))
+
+    # ========== UTILISATEURS ==========
+
+    def generer_utilisateurs(self, nombre, type_utilisateur, options):
+        prefixe = f"{options['prefixe']}_{type_utilisateur}_"
+        # Reprendre la numérotation si la commande a déjà été lancée
+        debut = User.objects.filter(username__startswith=prefixe).count()
+        mot_de_passe = make_password(options['mot_de_passe'])  # hacher une seule fois
+        noms = [f"{prefixe}{i:06d}" for i in range(debut, debut + nombre)]
+
+        self.inserer(User, (
+            User(
+                username=nom, password=mot_de_passe, email=f"{nom}@exemple.fr",
+                first_name=self.random.choice(PRENOMS), last_name=self.random.choice(NOMS),
+                date_joined=self.date_aleatoire(options['jours']),
+            )
+            for nom in noms
+        ))
+        ids = list(User.objects.filter(username__in=noms).values_list('id', flat=True))
+        self.inserer(UserProfile, (UserProfile(user_id=i, user_type=type_utilisateur) for i in ids))
+        return ids
+
+    def generer_enfants(self, parents, options):
+        aujourd_hui = date.today()
+        self.inserer(Enfant, (
+            Enfant(
+                parent_id=parent_id,
+                prenom=self.random.choice(PRENOMS),
+                nom=self.random.choice(NOMS),
+                date_naissance=aujourd_hui - timedelta(days=self.random.randint(3 * 365, 14 * 365)),
+                genre=self.random.choice('MFA'),
+                niveau_autonomie=self.random.choice(['faible', 'moyen', 'eleve']),
+            )
+            for parent_id in parents
+            for _ in range(self.random.randint(1, max(1, options['enfants_max'])))
+        ))
+        return list(Enfant.objects.filter(parent_id__in=parents).values_list('id', flat=True))
+
+    def generer_activites(self, enfants, options):
+        jeux = [cle for cle, _ in Activite.JEUX_CHOICES]
+
+        def activites():
+            for _ in range(options['activites']):
+                debut = self.date_aleatoire(options['jours'])
+                duree = self.random.randint(1, 30)
+                yield Activite(
+                    enfant_id=self.random.choice(enfants),
+                    jeu=self.random.choice(jeux),
+                    date_debut=debut,
+                    date_fin=debut + timedelta(minutes=duree),
+                    duree_minutes=duree,
+                    score=self.random.randint(0, 100) if self.random.random() < 0.7 else None,
+                    reussi=self.random.random() < 0.8,
+                    created_at=debut,
+                )
+
+        with dates_imposees(Activite):
+            self.inserer(Activite, activites())
+
+    # ========== FORUM ==========
+
+    def generer_forum(self, auteurs, options):
+        categories = [cle for cle, _ in Topic.CATEGORY_CHOICES]
+        prefixe = f"[{options['prefixe']}] "
+
+        with dates_imposees(Topic, Post):
+            self.inserer(Topic, (
+                Topic(
+                    title=f"{prefixe}Sujet {i} : {self.random.choice(PRENOMS)} et la routine du matin",
+                    created_by_id=self.random.choice(auteurs),
+                    created_at=self.date_aleatoire(options['jours']),
+                    icon=self.random.choice(ICON_CHOICES),
+                    category=self.random.choice(categories),
+                )
+                for i in range(options['topics'])
+            ))
+            topics = list(Topic.objects.filter(title__startswith=prefixe).values_list('id', 'created_at'))
+
+            self.inserer(Post, (
+                Post(
+                    topic_id=topic_id,
+                    content=f"Réponse {n} : ce qui marche chez nous, c'est un pictogramme par étape.",
+                    created_by_id=self.random.choice(auteurs),
+                    created_at=cree_le + timedelta(minutes=self.random.randint(1, 60 * 24 * 30)),
+                )
+                for topic_id, cree_le in topics
+                for n in range(self.random.randint(0, 2 * options['posts']))
+            ))
+
+        types = [cle for cle, _ in Reaction.REACTION_CHOICES]
+        self.inserer(Reaction, (
+            Reaction(topic_id=topic_id, user_id=user_id, reaction_type=self.random.choice(types))
+            for topic_id, _ in topics
+            for user_id in self.random.sample(auteurs, min(len(auteurs), self.random.randint(0, 2 * options['reactions'])))
+        ), ignore_conflicts=True)
+        return [topic_id for topic_id, _ in topics]
+
+    def generer_notifications(self, utilisateurs, topics, options):
+        types = [cle for cle, _ in Notification.NOTIFICATION_TYPES]
+        with dates_imposees(Notification):
+            self.inserer(Notification, (
+                Notification(
+                    user_id=user_id,
+                    notification_type=self.random.choice(types),
+                    message="💬 Quelqu'un a répondu à votre sujet",
+                    link=f"/forum/{self.random.choice(topics)}/" if topics else '',
+                    is_read=self.random.random() < 0.6,
+                    created_at=self.date_aleatoire(options['jours']),
+                )
+                for user_id in utilisateurs
+                for _ in range(self.random.randint(0, 2 * options['notifications']))
+            ))
+
+    def generer_abonnements(self, parents, options):
+        niveaux = list(Level.objects.all())
+        if not niveaux:
+            niveaux = [Level.objects.create(name=nom, price=prix) for nom, prix in NIVEAUX_PAR_DEFAUT]
+
+        with dates_imposees(Subscription):
+            self.inserer(Subscription, (
+                Subscription(
+                    parent_id=parent_id,
+                    level=self.random.choice(niveaux),
+                    start_date=self.date_aleatoire(options['jours']),
+                    active=self.random.random() < 0.85,
+                    simulated_payment_id=f"sim-{parent_id}",
+                )
+                for parent_id in parents
+                if self.random.random() < options['abonnes']
+            ))
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['graine'])
+        self.lot = max(1, options['lot'])
+        self.verbosity = options['verbosity']
+        self.maintenant = timezone.now()
+        debut = time.perf_counter()
+
+        parents = self.generer_utilisateurs(options['parents'], 'parent', options)
+        educateurs = self.generer_utilisateurs(options['educateurs'], 'educator', options)
+        enfants = self.generer_enfants(parents, options)
+        if enfants:
+            self.generer_activites(enfants, options)
+        auteurs = parents + educateurs
+        topics = self.generer_forum(auteurs, options) if auteurs else []
+        self.generer_notifications(auteurs, topics, options)
+        self.generer_abonnements(parents, options)
+
+        if self.verbosity:
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ Population générée en {time.perf_counter() - debut:.1f} s"
+            ))
@@ -0,0 +1,43 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management.base import BaseCommand
+
+from authen import hors_ligne
+
+
+class Command(BaseCommand):
+    help = "Écrit le manifest de précache du service worker (à lancer après collectstatic)"
+
+    def taille(self, url):
+        """Octets d'une entrée statique (0 pour les pages et les packs)"""
+        if not url.startswith(settings.STATIC_URL):
+            return 0
+        nom = url[len(settings.STATIC_URL):]
+        if staticfiles_storage.exists(nom):
+            return staticfiles_storage.size(nom)
+        chemin = finders.find(nom)
+        return Path(chemin).stat().st_size if chemin else 0
+
+    def handle(self, *args, **options):
+        # Entrées déjà sur les tablettes : seules les autres seront téléchargées
+        ancien = set()
+        chemin = hors_ligne.get_chemin_manifest()
+        if chemin.exists():
+            ancien = {(e['url'], e['revision']) for e in hors_ligne.charger_manifest()['entrees']}
+
+        manifest = hors_ligne.generer_manifest()
+        hors_ligne.ecrire_manifest(manifest)
+
+        entrees = manifest['entrees']
+        nouvelles = [e for e in entrees if (e['url'], e['revision']) not in ancien]
+        total = sum(self.taille(e['url']) for e in entrees)
+        a_telecharger = sum(self.taille(e['url']) for e in nouvelles)
+        self.stdout.write(self.style.SUCCESS(
+            f"📴 Manifest {manifest['version']} : {len(entrees)} entrées ({total / 1e6:.1f} Mo) → {chemin}"
+        ))
+        self.stdout.write(
+            f"   Mise à jour des tablettes : {len(nouvelles)} entrées nouvelles ou modifiées ({a_telecharger / 1e6:.1f} Mo)"
+        )
@@ -0,0 +1,116 @@
+import json
+import time
+
+from django.contrib.auth.models import User
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le coût par requête avec et sans connexions persistantes "
+        "(CONN_MAX_AGE), avec une latence de connexion simulée"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requetes', type=int, default=200, help="Nombre de requêtes par mode")
+        parser.add_argument(
+            '--latence', type=float, default=25.0,
+            help="Latence ajoutée à chaque ouverture de connexion (ms) : TCP + TLS + auth "
+                 "d'un PostgreSQL distant. 0 pour mesurer la vraie base seule",
+        )
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--json', action='store_true', help="Sortie JSON")
+
+    def simuler_requete(self, connexion):
+        """Même cycle qu'une requête gunicorn : signaux de début/fin autour d'une requête ORM"""
+        request_started.send(sender=WSGIHandler)
+        try:
+            User.objects.using(connexion.alias).exists()
+        finally:
+            request_finished.send(sender=WSGIHandler)
+
+    def mesurer(self, connexion, conn_max_age, health_checks, nb_requetes):
+        connexion.close()
+        connexion.settings_dict['CONN_MAX_AGE'] = conn_max_age
+        connexion.settings_dict['CONN_HEALTH_CHECKS'] = health_checks
+        self.ouvertures = 0
+
+        durees = []
+        for _ in range(nb_requetes):
+            debut = time.perf_counter()
+            self.simuler_requete(connexion)
+            durees.append((time.perf_counter() - debut) * 1000)
+
+        durees.sort()
+        return {
+            'conn_max_age': conn_max_age,
+            'health_checks': health_checks,
+            'connexions_ouvertes': self.ouvertures,
+            'moyenne_ms': round(sum(durees) / len(durees), 3),
+            'p50_ms': round(durees[len(durees) // 2], 3),
+            'p95_ms': round(durees[int(len(durees) * 0.95)], 3),
+        }
+
+    def handle(self, *args, **options):
+        connexion = connections[options['database']]
+        nb_requetes = max(1, options['requetes'])
+        latence = options['latence'] / 1000
+        reglages = dict(connexion.settings_dict)
+        conn_max_age = reglages.get('CONN_MAX_AGE') or 600
+
+        # Chaque ouverture de connexion paie la latence simulée
+        ouvrir = connexion.get_new_connection
+
+        def ouvrir_avec_latence(params):
+            self.ouvertures += 1
+            if latence:
+                time.sleep(latence)
+            return ouvrir(params)
+
+        connexion.get_new_connection = ouvrir_avec_latence
+        try:
+            resultats = [
+                self.mesurer(connexion, 0, False, nb_requetes),
+                self.mesurer(connexion, conn_max_age, False, nb_requetes),
+                self.mesurer(connexion, conn_max_age, True, nb_requetes),
+            ]
+        finally:
+            del connexion.get_new_connection
+            connexion.close()
+            connexion.settings_dict['CONN_MAX_AGE'] = reglages.get('CONN_MAX_AGE', 0)
+            connexion.settings_dict['CONN_HEALTH_CHECKS'] = reglages.get('CONN_HEALTH_CHECKS', False)
+
+        sans, persistante, avec_verif = resultats
+        gain_ms = sans['moyenne_ms'] - avec_verif['moyenne_ms']
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'moteur': connexion.vendor,
+                'latence_simulee_ms': options['latence'],
+                'requetes': nb_requetes,
+                'modes': resultats,
+                'gain_par_requete_ms': round(gain_ms, 3),
+            }, indent=2))
+            return
+
+        self.stdout.write(
+            f"🔌 {connexion.vendor} — {nb_requetes} requêtes par mode, "
+            f"latence de connexion simulée : {options['latence']:.0f} ms\n"
+        )
+        self.stdout.write(f"  {'mode':<36} {'connexions':>10} {'moy':>9} {'p50':>9} {'p95':>9}")
+        libelles = (
+            'CONN_MAX_AGE=0 (nouvelle connexion)',
+            f'CONN_MAX_AGE={conn_max_age}',
+            f'CONN_MAX_AGE={conn_max_age} + health checks',
+        )
+        for libelle, r in zip(libelles, resultats):
+            self.stdout.write(
+                f"  {libelle:<36} {r['connexions_ouvertes']:>10} "
+                f"{r['moyenne_ms']:>7.2f}ms {r['p50_ms']:>7.2f}ms {r['p95_ms']:>7.2f}ms"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"\n✅ Gain moyen par requête avec connexions persistantes : {gain_ms:.2f} ms"
+        ))
@@ -0,0 +1,173 @@
+import json
+import multiprocessing
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from comautis.base_sqlite import appliquer_pragmas, get_pragmas, verrou_fichier
+
+# Réglages par défaut de Django avant ce changement : journal DELETE, BEGIN différé
+PRAGMAS_DJANGO = {'journal_mode': 'DELETE', 'synchronous': 'FULL'}
+
+MODES = {
+    'defaut': "SQLite par défaut (journal DELETE, BEGIN)",
+    'optimise': "PRAGMA settings + BEGIN IMMEDIATE",
+    'ecrivain_unique': "PRAGMA settings + file d'écriture",
+}
+
+
+def ouvrir(chemin, mode, pragmas):
+    # isolation_level=None : autocommit, transactions explicites comme Django
+    connexion = sqlite3.connect(chemin, timeout=5, isolation_level=None)
+    appliquer_pragmas(connexion, PRAGMAS_DJANGO if mode == 'defaut' else pragmas)
+    return connexion
+
+
+def ecrivain(chemin, mode, pragmas, nb_ecritures, travail, numero, depart, resultats):
+    """Transactions lecture puis écriture, comme une fin d'activité (compte + insertion)"""
+    connexion = ouvrir(chemin, mode, pragmas)
+    depart.wait()
+    debut_sql = 'BEGIN IMMEDIATE' if mode == 'optimise' else 'BEGIN'
+    durees, erreurs = [], 0
+
+    for i in range(nb_ecritures):
+        debut = time.perf_counter()
+        try:
+            if mode == 'ecrivain_unique':
+                with verrou_fichier(chemin + '.ecriture.lock'):
+                    ecrire(connexion, debut_sql, travail, numero, i)
+            else:
+                ecrire(connexion, debut_sql, travail, numero, i)
+            durees.append((time.perf_counter() - debut) * 1000)
+        except sqlite3.OperationalError:
+            # "database is locked" : la requête Django aurait renvoyé une erreur 500
+            if connexion.in_transaction:
+                connexion.execute('ROLLBACK')
+            erreurs += 1
+
+    connexion.close()
+    resultats.put(('ecrivain', durees, erreurs))
+
+
+def ecrire(connexion, debut_sql, travail, numero, i):
+    connexion.execute(debut_sql)
+    connexion.execute('SELECT COUNT(*) FROM activite WHERE enfant_id = ?', (numero,)).fetchone()
+    # Code Python de la vue entre la lecture et l'écriture
+    time.sleep(travail)
+    connexion.execute(
+        'INSERT INTO activite (enfant_id, jeu, score) VALUES (?, ?, ?)', (numero, f'jeu_{i % 8}', i),
+    )
+    connexion.execute('COMMIT')
+
+
+def lecteur(chemin, mode, pragmas, depart, fin, resultats):
+    """Lectures en continu (tableaux de bord) pendant les écritures"""
+    connexion = ouvrir(chemin, mode, pragmas)
+    depart.wait()
+    lectures, erreurs = 0, 0
+    while not fin.is_set():
+        try:
+            connexion.execute('SELECT jeu, COUNT(*), AVG(score) FROM activite GROUP BY jeu').fetchall()
+            lectures += 1
+        except sqlite3.OperationalError:
+            erreurs += 1
+    connexion.close()
+    resultats.put(('lecteur', lectures, erreurs))
+
+
+class Command(BaseCommand):
+    help = "Mesure la contention d'écriture SQLite entre plusieurs process (base temporaire)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ecrivains', type=int, default=4, help="Process qui écrivent")
+        parser.add_argument('--lecteurs', type=int, default=2, help="Process qui lisent en continu")
+        parser.add_argument('--ecritures', type=int, default=200, help="Transactions par écrivain")
+        parser.add_argument(
+            '--travail', type=float, default=1.0,
+            help="Temps passé dans la transaction entre lecture et écriture (ms)",
+        )
+        parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+        parser.add_argument('--json', action='store_true', help="Sortie JSON")
+
+    def mesurer(self, dossier, mode, options):
+        chemin = str(Path(dossier) / f'{mode}.sqlite3')
+        pragmas = get_pragmas()
+
+        init = ouvrir(chemin, mode, pragmas)
+        init.execute(
+            'CREATE TABLE activite (id INTEGER PRIMARY KEY, enfant_id INTEGER, jeu TEXT, score INTEGER)'
+        )
+        init.execute('CREATE INDEX activite_enfant ON activite (enfant_id)')
+        init.close()
+
+        resultats = multiprocessing.Queue()
+        depart = multiprocessing.Event()
+        fin = multiprocessing.Event()
+        lecteurs = [
+            multiprocessing.Process(target=lecteur, args=(chemin, mode, pragmas, depart, fin, resultats))
+            for _ in range(options['lecteurs'])
+        ]
+        ecrivains = [
+            multiprocessing.Process(
+                target=ecrivain, args=(
+                    chemin, mode, pragmas, options['ecritures'], options['travail'] / 1000,
+                    n, depart, resultats,
+                ),
+            )
+            for n in range(options['ecrivains'])
+        ]
+
+        for p in lecteurs + ecrivains:
+            p.start()
+        # Tous les process démarrent ensemble, une fois leur connexion ouverte
+        time.sleep(0.2)
+        debut = time.perf_counter()
+        depart.set()
+
+        # Vider la file avant join() : un process bloqué sur put() ne se termine pas
+        recus = [resultats.get() for _ in ecrivains]
+        duree = time.perf_counter() - debut
+        fin.set()
+        recus += [resultats.get() for _ in lecteurs]
+        for p in ecrivains + lecteurs:
+            p.join()
+
+        durees = sorted(d for genre, valeurs, _ in recus if genre == 'ecrivain' for d in valeurs)
+        lectures = sum(v for genre, v, _ in recus if genre == 'lecteur')
+        return {
+            'mode': mode,
+            'ecritures_reussies': len(durees),
+            'erreurs_verrou': sum(e for genre, _, e in recus if genre == 'ecrivain'),
+            'erreurs_lecture': sum(e for genre, _, e in recus if genre == 'lecteur'),
+            'ecritures_par_s': round(len(durees) / duree, 1),
+            'lectures_par_s': round(lectures / duree, 1),
+            'p50_ms': round(durees[len(durees) // 2], 2) if durees else None,
+            'p95_ms': round(durees[int(len(durees) * 0.95)], 2) if durees else None,
+            'duree_s': round(duree, 2),
+        }
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as dossier:
+            resultats = [self.mesurer(dossier, mode, options) for mode in options['modes']]
+
+        if options['json']:
+            self.stdout.write(json.dumps(resultats, indent=2))
+            return
+
+        self.stdout.write(
+            f"🪶 {options['ecrivains']} écrivains × {options['ecritures']} transactions, "
+            f"{options['lecteurs']} lecteurs en continu\n"
+        )
+        self.stdout.write(
+            f"  {'mode':<42} {'ok':>6} {'locked':>7} {'écr/s':>8} {'lect/s':>8} {'p50':>8} {'p95':>8}"
+        )
+        for r in resultats:
+            p50 = f"{r['p50_ms']:.1f}ms" if r['p50_ms'] is not None else '-'
+            p95 = f"{r['p95_ms']:.1f}ms" if r['p95_ms'] is not None else '-'
+            self.stdout.write(
+                f"  {MODES[r['mode']]:<42} {r['ecritures_reussies']:>6} {r['erreurs_verrou']:>7} "
+                f"{r['ecritures_par_s']:>8} {r['lectures_par_s']:>8} {p50:>8} {p95:>8}"
+            )
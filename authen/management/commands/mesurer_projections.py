@@ -0,0 +1,113 @@
+import json
+import time
+import tracemalloc
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from authen.models import Enfant
+from forum.models import Post, Topic
+from paiement.models import Level, Subscription
+
+
+def octets(valeur):
+    """Taille transférée approximative d'une valeur de colonne"""
+    if valeur is None:
+        return 0
+    if isinstance(valeur, (bytes, memoryview)):
+        return len(valeur)
+    return len(str(valeur).encode('utf-8'))
+
+
+class Command(BaseCommand):
+    help = "Compare les pages de liste avec et sans pour_liste() : octets lus, mémoire et durée (comautis/projections.py)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lignes', type=int, default=5000, help="Enfants, messages et abonnements temporaires ajoutés")
+        parser.add_argument('--taille', type=int, default=2000, help="Caractères des champs texte longs générés")
+        parser.add_argument('--repetitions', type=int, default=3, help="Mesures par liste (la meilleure est gardée)")
+        parser.add_argument('--json', action='store_true', help="Sortie JSON")
+
+    def peupler(self, lignes, taille):
+        """Lignes temporaires aux champs longs remplis (annulées à la fin de la mesure)"""
+        texte = ("Routine visuelle le matin, casque anti-bruit à la cantine. " * (taille // 58 + 1))[:taille]
+        parent = User.objects.create_user(f'mesure_projections_{uuid.uuid4().hex[:8]}')
+        topic = Topic.objects.create(title='Mesure des projections', created_by=parent)
+        level = Level.objects.create(name='Mesure', price=0, description=texte)
+        Enfant.objects.bulk_create(
+            Enfant(
+                parent=parent, prenom=f'Enfant {n}', nom='Mesure', date_naissance='2018-01-01',
+                besoins_specifiques=texte, activites_preferees=texte,
+            )
+            for n in range(lignes)
+        )
+        Post.objects.bulk_create(Post(topic=topic, content=texte, created_by=parent) for _ in range(lignes))
+        Subscription.objects.bulk_create(Subscription(parent=parent, level=level) for _ in range(lignes))
+
+    def mesurer(self, queryset, repetitions):
+        # Octets des colonnes renvoyées par la requête SQL exacte du queryset
+        sql, parametres = queryset.query.sql_with_params()
+        with connection.cursor() as curseur:
+            curseur.execute(sql, parametres)
+            lignes = curseur.fetchall()
+        transferes = sum(octets(valeur) for ligne in lignes for valeur in ligne)
+
+        duree = float('inf')
+        for _ in range(repetitions):
+            debut = time.perf_counter()
+            objets = list(queryset.all())
+            duree = min(duree, time.perf_counter() - debut)
+            del objets
+
+        # Pic mémoire des objets Python construits pour la liste
+        tracemalloc.start()
+        objets = list(queryset.all())
+        _, pic = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {
+            'lignes': len(objets),
+            'colonnes': len(lignes[0]) if lignes else 0,
+            'octets_lus': transferes,
+            'pic_memoire': pic,
+            'duree_ms': round(duree * 1000, 1),
+        }
+
+    def handle(self, *args, **options):
+        listes = {
+            'admin_enfants_list': Enfant.objects.select_related('parent').order_by('-created_at'),
+            'admin_forum_moderation': Post.objects.select_related('created_by', 'topic').order_by('-created_at'),
+            'admin_subscriptions': Subscription.objects.select_related('parent', 'level').order_by('-start_date'),
+        }
+        projections = {
+            'admin_enfants_list': lambda qs: qs.pour_liste(),
+            'admin_forum_moderation': lambda qs: qs.pour_liste(),
+            'admin_subscriptions': lambda qs: qs.pour_liste('level'),
+        }
+
+        resultats = []
+        with transaction.atomic():
+            self.peupler(options['lignes'], options['taille'])
+            for nom, queryset in listes.items():
+                complet = self.mesurer(queryset, options['repetitions'])
+                projete = self.mesurer(projections[nom](queryset), options['repetitions'])
+                resultats.append({'liste': nom, 'complet': complet, 'pour_liste': projete})
+            transaction.set_rollback(True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(resultats, indent=2))
+            return
+
+        self.stdout.write(f"📏 Listes complètes (lignes ajoutées : {options['lignes']}, texte : {options['taille']} car.)\n")
+        self.stdout.write(
+            f"  {'liste':<24} {'lignes':>7} {'Mo lus':>15} {'pic mémoire Mo':>17} {'durée ms':>15}"
+        )
+        for r in resultats:
+            c, p = r['complet'], r['pour_liste']
+            self.stdout.write(
+                f"  {r['liste']:<24} {c['lignes']:>7} "
+                f"{c['octets_lus'] / 1e6:>6.1f} → {p['octets_lus'] / 1e6:>5.1f} "
+                f"{c['pic_memoire'] / 1e6:>8.1f} → {p['pic_memoire'] / 1e6:>5.1f} "
+                f"{c['duree_ms']:>6} → {p['duree_ms']:>6}"
+            )
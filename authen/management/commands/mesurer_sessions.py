@@ -0,0 +1,100 @@
+import json
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+
+from authen.models import UserProfile
+from comautis.scenarios_vues import CompteurRequetes
+
+# Hacheur rapide pendant la mesure : on compare les sessions, pas PBKDF2
+HACHEUR_RAPIDE = ['django.contrib.auth.hashers.MD5PasswordHasher']
+MOT_DE_PASSE = 'mesure-sessions'
+
+
+class Command(BaseCommand):
+    help = "Compare le débit des pages authentifiées selon le backend de session (db, cached_db, signed_cookies)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='/profil-famille/', help="Page authentifiée mesurée")
+        parser.add_argument('--requetes', type=int, default=200, help="Requêtes sur la page par backend")
+        parser.add_argument('--connexions', type=int, default=30, help="Connexions (POST /login/) par backend")
+        parser.add_argument(
+            '--backends', nargs='+', choices=list(settings.SESSION_BACKENDS),
+            default=list(settings.SESSION_BACKENDS),
+        )
+        parser.add_argument('--json', action='store_true', help="Sortie JSON")
+
+    def mesurer(self, backend, user, options):
+        # Sans limitation de débit : les connexions répétées dépasseraient la limite de login
+        with override_settings(
+            SESSION_ENGINE=settings.SESSION_BACKENDS[backend], PASSWORD_HASHERS=HACHEUR_RAPIDE, LIMITATION_ACTIF=False,
+        ):
+            client = Client(HTTP_HOST='localhost')
+            identifiants = {'username': user.username, 'password': MOT_DE_PASSE}
+
+            # Cycles connexion / déconnexion : création, rotation et suppression de la session
+            duree_connexions = 0
+            requetes_connexion = CompteurRequetes()
+            with connection.execute_wrapper(requetes_connexion):
+                for _ in range(options['connexions']):
+                    debut = time.perf_counter()
+                    response = client.post('/login/', identifiants)
+                    duree_connexions += time.perf_counter() - debut
+                    if response.status_code != 302:
+                        raise CommandError(f"Connexion refusée ({response.status_code})")
+                    client.logout()
+
+            # Pages authentifiées : lecture de la session à chaque requête
+            client.post('/login/', identifiants)
+            client.get(options['url'])  # remplit le cache pour cached_db
+            requetes_page = CompteurRequetes()
+            with connection.execute_wrapper(requetes_page):
+                debut = time.perf_counter()
+                for _ in range(options['requetes']):
+                    response = client.get(options['url'])
+                duree_pages = time.perf_counter() - debut
+            if response.status_code != 200:
+                raise CommandError(f"{options['url']} a répondu {response.status_code}")
+            client.logout()
+
+        return {
+            'backend': backend,
+            'connexions_par_s': round(options['connexions'] / duree_connexions, 1),
+            'pages_par_s': round(options['requetes'] / duree_pages, 1),
+            'requetes_session_par_connexion': round(requetes_connexion.session / options['connexions'], 2),
+            'requetes_session_par_page': round(requetes_page.session / options['requetes'], 2),
+            'requetes_sql_par_page': round(requetes_page.total / options['requetes'], 2),
+        }
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            # Utilisateur temporaire : tout est annulé à la fin de la mesure
+            with override_settings(PASSWORD_HASHERS=HACHEUR_RAPIDE):
+                user = User.objects.create_user(f'mesure_sessions_{uuid.uuid4().hex[:8]}', password=MOT_DE_PASSE)
+            UserProfile.objects.create(user=user, user_type='parent')
+
+            resultats = [self.mesurer(backend, user, options) for backend in options['backends']]
+            transaction.set_rollback(True)
+
+        if options['json']:
+            self.stdout.write(json.dumps({'url': options['url'], 'backends': resultats}, indent=2))
+            return
+
+        self.stdout.write(
+            f"🔐 {options['url']} : {options['requetes']} requêtes, {options['connexions']} connexions par backend\n"
+        )
+        self.stdout.write(
+            f"  {'backend':<16} {'connexions/s':>13} {'pages/s':>9} {'SQL session/page':>17} "
+            f"{'SQL session/cycle':>22} {'SQL/page':>9}"
+        )
+        for r in resultats:
+            self.stdout.write(
+                f"  {r['backend']:<16} {r['connexions_par_s']:>13} {r['pages_par_s']:>9} "
+                f"{r['requetes_session_par_page']:>17} {r['requetes_session_par_connexion']:>22} "
+                f"{r['requetes_sql_par_page']:>9}"
+            )
@@ -0,0 +1,247 @@
+import json
+import logging
+import statistics
+import subprocess
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from comautis.memoire import Mesure
+from comautis.scenarios_vues import (
+    BUDGETS_REQUETES, CompteurRequetes, construire_url, executer, get_scenario, lister_vues,
+    preparer_contexte, statut_attendu,
+)
+
+HISTORIQUE_PAR_DEFAUT = Path(settings.BASE_DIR) / 'benchmarks' / 'historique_vues.json'
+
+# En dessous de cet écart (ms), une variation de p50 est du bruit de mesure
+BRUIT_MS = 2.0
+# Idem pour le pic mémoire (Ko)
+BRUIT_KO = 256
+
+
+def percentile(valeurs, p):
+    valeurs = sorted(valeurs)
+    return valeurs[min(len(valeurs) - 1, int(len(valeurs) * p / 100))]
+
+
+def commit_courant():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=settings.BASE_DIR, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure chaque URL de authen, forum et paiement avec le client de test "
+        "(latences p50/p95/p99, requêtes SQL) et compare à l'historique"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repetitions', type=int, default=20, help="Requêtes mesurées par vue")
+        parser.add_argument('--parent', help="Nom du parent utilisé (défaut : celui qui a le plus d'enfants)")
+        parser.add_argument('--vues', nargs='+', help="Limiter à ces noms d'URL")
+        parser.add_argument('--historique', default=str(HISTORIQUE_PAR_DEFAUT), help="Fichier JSON d'historique")
+        parser.add_argument('--etiquette', default='', help="Libellé enregistré avec la mesure")
+        parser.add_argument(
+            '--seuil', type=float, default=1.25,
+            help="Régression si p50 (ou le pic mémoire) dépasse ce multiple de la référence (médiane des 5 dernières mesures)",
+        )
+        parser.add_argument('--sans-enregistrer', action='store_true', help="Ne pas écrire dans l'historique")
+        parser.add_argument(
+            '--memoire', action='store_true',
+            help="Relever aussi le pic mémoire (tracemalloc) et les principaux sites d'allocation de chaque vue",
+        )
+
+    # ========== PRÉPARATION ==========
+
+    def choisir_parent(self, nom):
+        if nom:
+            try:
+                return User.objects.get(username=nom)
+            except User.DoesNotExist:
+                raise CommandError(f"Utilisateur '{nom}' introuvable")
+        parent = User.objects.filter(
+            is_staff=False, is_superuser=False, profile__user_type='parent', enfants__isnull=False,
+        ).order_by('id').first()
+        if parent is None:
+            raise CommandError("Aucun parent avec enfants : lancer d'abord generer_population")
+        return parent
+
+    def clients(self, parent):
+        # Admin temporaire : créé dans la transaction annulée à la fin
+        admin = User.objects.create_user(f'mesure_admin_{uuid.uuid4().hex[:8]}', is_staff=True, is_superuser=True)
+        clients = {None: Client(HTTP_HOST='localhost', raise_request_exception=False)}
+        for role, user in (('parent', parent), ('admin', admin)):
+            client = Client(HTTP_HOST='localhost', raise_request_exception=False)
+            client.force_login(user)
+            clients[role] = client
+        return clients, {'parent': parent, 'admin': admin}
+
+    # ========== MESURE ==========
+
+    def mesurer_vue(self, nom, vue, contexte, clients, utilisateurs, repetitions, memoire=False):
+        scenario = get_scenario(nom)
+        if scenario['ignorer']:
+            return {'ignoree': scenario['ignorer']}
+
+        url = construire_url(vue, contexte)
+        client = clients[scenario['utilisateur']]
+        durees, requetes, statut = [], 0, None
+
+        # Une requête de chauffe (imports, templates, cache) non comptée
+        for i in range(repetitions + 1):
+            if scenario['reconnecter'] and scenario['utilisateur']:
+                client.force_login(utilisateurs[scenario['utilisateur']])
+            if i == 0:
+                executer(client, scenario, url)
+                continue
+            compteur = CompteurRequetes()
+            debut = time.perf_counter()
+            response = executer(client, scenario, url, compteur=compteur)
+            durees.append((time.perf_counter() - debut) * 1000)
+            requetes = max(requetes, compteur.total)
+            statut = response.status_code
+
+        # Exécution à part : tracemalloc ralentit les allocations, les latences n'en tiennent pas compte
+        pic = None
+        if memoire:
+            if scenario['reconnecter'] and scenario['utilisateur']:
+                client.force_login(utilisateurs[scenario['utilisateur']])
+            with Mesure(seuil=0) as pic:
+                executer(client, scenario, url)
+
+        # Les vues suivantes utilisent le même client
+        if scenario['reconnecter'] and scenario['utilisateur']:
+            client.force_login(utilisateurs[scenario['utilisateur']])
+
+        mesure = {
+            'url': url,
+            'methode': scenario['methode'].upper(),
+            'statut': statut,
+            'p50_ms': round(percentile(durees, 50), 2),
+            'p95_ms': round(percentile(durees, 95), 2),
+            'p99_ms': round(percentile(durees, 99), 2),
+            'moyenne_ms': round(statistics.mean(durees), 2),
+            'requetes': requetes,
+        }
+        if pic is not None and pic.active:
+            mesure['pic_memoire_ko'] = pic.pic_ko
+            mesure['sites_memoire'] = pic.sites[:5]
+        return mesure
+
+    # ========== HISTORIQUE ==========
+
+    def charger_historique(self, chemin):
+        if not chemin.exists():
+            return {'executions': []}
+        with open(chemin, encoding='utf-8') as f:
+            return json.load(f)
+
+    def regressions(self, historique, vues, seuil):
+        """Compare chaque vue à son statut attendu, à son budget de requêtes et à la médiane de ses 5 dernières mesures (latence, pic mémoire)"""
+        problemes = []
+        for nom, mesure in vues.items():
+            if 'p50_ms' not in mesure:
+                continue
+            # Erreur ou 429 : la latence mesurée n'est pas celle de la vue
+            if not statut_attendu(get_scenario(nom), mesure['statut']):
+                problemes.append(f"{nom} : statut {mesure['statut']}")
+            budget = BUDGETS_REQUETES.get(nom)
+            if budget is not None and mesure['statut'] < 500 and mesure['requetes'] > budget:
+                problemes.append(f"{nom} : {mesure['requetes']} requêtes SQL (budget {budget})")
+            precedentes = [
+                e['vues'][nom] for e in historique['executions'][-5:]
+                if 'p50_ms' in e['vues'].get(nom, {})
+            ]
+            if not precedentes:
+                continue
+            ref_p50 = statistics.median(m['p50_ms'] for m in precedentes)
+            ref_requetes = min(m['requetes'] for m in precedentes)
+            if mesure['p50_ms'] > ref_p50 * seuil and mesure['p50_ms'] - ref_p50 > BRUIT_MS:
+                problemes.append(f"{nom} : p50 {mesure['p50_ms']} ms (référence {ref_p50} ms)")
+            if mesure['requetes'] > ref_requetes:
+                problemes.append(f"{nom} : {mesure['requetes']} requêtes SQL (référence {ref_requetes})")
+            pics = [m['pic_memoire_ko'] for m in precedentes if 'pic_memoire_ko' in m]
+            if 'pic_memoire_ko' in mesure and pics:
+                ref_pic = statistics.median(pics)
+                if mesure['pic_memoire_ko'] > ref_pic * seuil and mesure['pic_memoire_ko'] - ref_pic > BRUIT_KO:
+                    problemes.append(f"{nom} : pic mémoire {mesure['pic_memoire_ko']} Ko (référence {ref_pic} Ko)")
+        return problemes
+
+    def mesurer_tout(self, options):
+        """Mesure toutes les vues dans une transaction annulée à la fin"""
+        vues = {}
+        # Sans limitation de débit : les répétitions d'une même vue dépasseraient ses limites
+        with override_settings(LIMITATION_ACTIF=False), transaction.atomic():
+            parent = self.choisir_parent(options['parent'])
+            contexte = preparer_contexte(parent)
+            clients, utilisateurs = self.clients(parent)
+            volumes = {
+                'utilisateurs': User.objects.count(),
+                'enfants_du_parent': parent.enfants.count(),
+            }
+
+            for nom, vue in lister_vues():
+                if options['vues'] and nom not in options['vues']:
+                    continue
+                vues[nom] = mesure = self.mesurer_vue(
+                    nom, vue, contexte, clients, utilisateurs, max(1, options['repetitions']), options['memoire'],
+                )
+                if 'ignoree' in mesure:
+                    self.stdout.write(f"  ⏭️  {nom:<34} ignorée : {mesure['ignoree']}")
+                else:
+                    self.stdout.write(
+                        f"  {mesure['methode']:<5} {nom:<34} {mesure['statut']}  p50 {mesure['p50_ms']:>8.2f} ms  "
+                        f"p95 {mesure['p95_ms']:>8.2f} ms  p99 {mesure['p99_ms']:>8.2f} ms  "
+                        f"{mesure['requetes']:>4} requêtes"
+                        + (f"  pic {mesure['pic_memoire_ko']:>9.1f} Ko" if 'pic_memoire_ko' in mesure else '')
+                    )
+            transaction.set_rollback(True)
+        return vues, volumes
+
+    def handle(self, *args, **options):
+        chemin = Path(options['historique'])
+        historique = self.charger_historique(chemin)
+
+        # Les erreurs 500 sont déjà visibles dans le tableau (statut) : pas de traceback par requête
+        journal_requetes = logging.getLogger('django.request')
+        niveau_journal = journal_requetes.level
+        journal_requetes.setLevel(logging.CRITICAL)
+
+        try:
+            vues, volumes = self.mesurer_tout(options)
+        finally:
+            journal_requetes.setLevel(niveau_journal)
+
+        problemes = self.regressions(historique, vues, options['seuil'])
+
+        if not options['sans_enregistrer']:
+            historique['executions'].append({
+                'date': timezone.now().isoformat(),
+                'commit': commit_courant(),
+                'etiquette': options['etiquette'],
+                'base': connection.vendor,
+                'repetitions': options['repetitions'],
+                'volumes': volumes,
+                'vues': vues,
+            })
+            chemin.parent.mkdir(parents=True, exist_ok=True)
+            with open(chemin, 'w', encoding='utf-8') as f:
+                json.dump(historique, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f"\n📈 Mesure ajoutée à {chemin}")
+
+        if problemes:
+            raise CommandError("Régressions détectées :\n  " + "\n  ".join(problemes))
+        self.stdout.write(self.style.SUCCESS("✅ Aucune régression"))
@@ -0,0 +1,87 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+
+from authen import images_manager
+
+
+class Command(BaseCommand):
+    help = "Génère les variantes WebP redimensionnées des images statiques et leur manifest"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--largeurs', default='',
+            help="Largeurs séparées par des virgules, ex : 160,320,640",
+        )
+        parser.add_argument('--qualite', type=int, default=None, help="Qualité WebP (0-100)")
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help="Nombre de process en parallèle (par défaut : nombre de cœurs)",
+        )
+        parser.add_argument(
+            '--forcer', action='store_true',
+            help="Régénère toutes les variantes même si la source n'a pas changé",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            import PIL  # noqa: F401
+        except ImportError:
+            raise CommandError("Pillow est nécessaire : pip install Pillow")
+
+        if options['largeurs']:
+            try:
+                largeurs = sorted(int(l) for l in options['largeurs'].split(','))
+            except ValueError:
+                raise CommandError(f"Largeurs invalides : {options['largeurs']}")
+        else:
+            largeurs = images_manager.get_largeurs()
+        qualite = options['qualite'] or images_manager.get_qualite()
+
+        manifest = images_manager.charger_manifest()
+        sources = images_manager.lister_sources()
+        nouveau_manifest = {}
+        a_traiter = {}
+
+        for cle, source in sources.items():
+            source_hash = images_manager.hash_fichier(source)
+            entree = manifest.get(cle)
+            if not options['forcer'] and images_manager.est_a_jour(entree, source_hash, largeurs, qualite):
+                nouveau_manifest[cle] = entree
+            else:
+                a_traiter[cle] = source
+
+        if a_traiter:
+            with ProcessPoolExecutor(max_workers=max(1, options['workers'])) as pool:
+                futures = {
+                    pool.submit(images_manager.traiter_image, cle, str(source), largeurs, qualite): cle
+                    for cle, source in a_traiter.items()
+                }
+                for future in as_completed(futures):
+                    cle = futures[future]
+                    entree = future.result()
+                    nouveau_manifest[cle] = entree
+                    total = sum(v['taille'] for v in entree['variantes'])
+                    self.stdout.write(
+                        f"🖼️ {cle} ({entree['source_taille'] // 1024} Ko) → "
+                        f"{len(entree['variantes'])} variante(s), {total // 1024} Ko"
+                    )
+
+        # Supprimer les variantes obsolètes (sources modifiées ou supprimées)
+        chemins_actifs = {
+            v['chemin'] for entree in nouveau_manifest.values() for v in entree['variantes']
+        }
+        for entree in manifest.values():
+            for variante in entree['variantes']:
+                if variante['chemin'] not in chemins_actifs:
+                    fichier = images_manager.IMAGES_OPTIMISEES_DIR.parent / variante['chemin']
+                    if fichier.exists():
+                        fichier.unlink()
+
+        images_manager.ecrire_manifest(nouveau_manifest)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {len(a_traiter)} image(s) optimisée(s), "
+            f"{len(sources) - len(a_traiter)} inchangée(s)"
+        ))
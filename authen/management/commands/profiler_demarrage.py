@@ -0,0 +1,119 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Exécuté dans un process neuf pour mesurer un vrai démarrage à froid
+SCRIPT_DEMARRAGE = '''
+import json, sys, time
+t0 = time.perf_counter()
+from comautis.wsgi import application
+t_setup = time.perf_counter()
+from wsgiref.util import setup_testing_defaults
+environ = {'PATH_INFO': sys.argv[1], 'HTTP_HOST': 'localhost'}
+setup_testing_defaults(environ)
+statuts = []
+corps = application(environ, lambda statut, en_tetes, exc_info=None: statuts.append(statut))
+premier = next(iter(corps), b'')
+t_reponse = time.perf_counter()
+print(json.dumps({
+    'status': statuts[0],
+    'setup_ms': (t_setup - t0) * 1000,
+    'premier_octet_ms': (t_reponse - t0) * 1000,
+}))
+'''
+
+
+def lire_importtime(sortie):
+    """Parse la sortie de -X importtime : [(module, self_us, cumul_us), ...]"""
+    modules = []
+    for ligne in sortie.splitlines():
+        if not ligne.startswith('import time:'):
+            continue
+        champs = ligne[len('import time:'):].split('|')
+        if len(champs) != 3:
+            continue
+        try:
+            self_us, cumul_us = int(champs[0]), int(champs[1])
+        except ValueError:
+            # Ligne d'en-tête "self [us] | cumulative | imported package"
+            continue
+        modules.append((champs[2].strip(), self_us, cumul_us))
+    return modules
+
+
+class Command(BaseCommand):
+    help = "Mesure le coût d'import par module et le temps jusqu'au premier octet au démarrage"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='/', help="Page demandée après le démarrage")
+        parser.add_argument('--top', type=int, default=20, help="Nombre de modules affichés")
+        parser.add_argument('--repetitions', type=int, default=3, help="Nombre de démarrages mesurés")
+        parser.add_argument(
+            '--cible', type=float, default=getattr(settings, 'DEMARRAGE_CIBLE_MS', 500),
+            help="Temps cible jusqu'au premier octet (ms)",
+        )
+        parser.add_argument('--json', action='store_true', help="Sortie JSON")
+
+    def demarrer(self, url, importtime=False):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'comautis.settings'))
+        commande = [sys.executable]
+        if importtime:
+            commande += ['-X', 'importtime']
+        commande += ['-c', SCRIPT_DEMARRAGE, url]
+        resultat = subprocess.run(
+            commande, capture_output=True, text=True, env=env, cwd=str(settings.BASE_DIR),
+        )
+        if resultat.returncode != 0:
+            raise CommandError(resultat.stderr[-2000:])
+        mesures = json.loads(resultat.stdout.strip().splitlines()[-1])
+        return mesures, resultat.stderr
+
+    def handle(self, *args, **options):
+        # Un démarrage instrumenté pour le détail par module...
+        _, sortie_imports = self.demarrer(options['url'], importtime=True)
+        modules = lire_importtime(sortie_imports)
+
+        # ... et des démarrages non instrumentés pour les temps réels
+        mesures = [self.demarrer(options['url'])[0] for _ in range(max(1, options['repetitions']))]
+        premier_octet = sorted(m['premier_octet_ms'] for m in mesures)[len(mesures) // 2]
+        setup = sorted(m['setup_ms'] for m in mesures)[len(mesures) // 2]
+
+        par_paquet = defaultdict(int)
+        for nom, self_us, _ in modules:
+            par_paquet[nom.split('.')[0]] += self_us
+
+        top_modules = sorted(modules, key=lambda m: m[1], reverse=True)[:options['top']]
+        top_paquets = sorted(par_paquet.items(), key=lambda p: p[1], reverse=True)[:options['top']]
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'url': options['url'],
+                'setup_ms': round(setup, 1),
+                'premier_octet_ms': round(premier_octet, 1),
+                'cible_ms': options['cible'],
+                'modules': [{'module': n, 'self_ms': s / 1000, 'cumul_ms': c / 1000} for n, s, c in top_modules],
+                'paquets': [{'paquet': n, 'self_ms': s / 1000} for n, s in top_paquets],
+            }, indent=2))
+        else:
+            self.stdout.write("📦 Coût d'import par paquet (self, ms)")
+            for nom, self_us in top_paquets:
+                self.stdout.write(f"  {self_us / 1000:8.1f}  {nom}")
+            self.stdout.write("\n🐢 Modules les plus coûteux (self / cumulé, ms)")
+            for nom, self_us, cumul_us in top_modules:
+                self.stdout.write(f"  {self_us / 1000:8.1f} {cumul_us / 1000:8.1f}  {nom}")
+            self.stdout.write(
+                f"\n⏱️ chargement WSGI : {setup:.0f} ms — premier octet de {options['url']} : "
+                f"{premier_octet:.0f} ms (médiane sur {len(mesures)})"
+            )
+
+        if premier_octet > options['cible']:
+            raise CommandError(
+                f"Premier octet en {premier_octet:.0f} ms, au-delà de la cible de {options['cible']:.0f} ms"
+            )
+        if not options['json']:
+            self.stdout.write(self.style.SUCCESS(f"✅ Sous la cible de {options['cible']:.0f} ms"))
@@ -0,0 +1,34 @@
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Supprime les sessions expirées de django_session par lots "
+        "(à lancer régulièrement, ex : cron quotidien)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lot', type=int, default=5000, help="Sessions supprimées par requête DELETE")
+
+    def handle(self, *args, **options):
+        maintenant = timezone.now()
+        lot = max(1, options['lot'])
+        total = 0
+
+        while True:
+            # Lots bornés : la table n'est jamais verrouillée longtemps
+            cles = list(
+                Session.objects.filter(expire_date__lt=maintenant)
+                .values_list('session_key', flat=True)[:lot]
+            )
+            if not cles:
+                break
+            supprimees, _ = Session.objects.filter(session_key__in=cles).delete()
+            total += supprimees
+
+        restantes = Session.objects.count()
+        self.stdout.write(self.style.SUCCESS(
+            f"🧹 {total} sessions expirées supprimées ({restantes} sessions actives)"
+        ))
@@ -0,0 +1,54 @@
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from comautis.replique import ALIAS_PRINCIPAL, ALIAS_REPLIQUE
+
+
+class Command(BaseCommand):
+    help = (
+        "Copie la base SQLite principale vers la réplique locale "
+        "(remplace la réplication PostgreSQL pour tester le routeur en local)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--intervalle', type=float, default=0,
+            help="Recopier toutes les N secondes (retard de réplication simulé). 0 : une seule copie",
+        )
+
+    def chemin(self, alias):
+        if alias not in connections.databases:
+            raise CommandError(f"Alias '{alias}' absent de DATABASES (définir DATABASE_REPLICA_URL)")
+        connexion = connections[alias]
+        if connexion.vendor != 'sqlite' or connexion.is_in_memory_db():
+            raise CommandError(f"L'alias '{alias}' doit être une base SQLite sur disque")
+        return str(connexion.settings_dict['NAME'])
+
+    def repliquer(self, source, destination):
+        debut = time.perf_counter()
+        src = sqlite3.connect(source)
+        dst = sqlite3.connect(destination)
+        try:
+            # API de sauvegarde en ligne : copie cohérente même pendant des écritures
+            src.backup(dst)
+        finally:
+            dst.close()
+            src.close()
+        return (time.perf_counter() - debut) * 1000
+
+    def handle(self, *args, **options):
+        source = self.chemin(ALIAS_PRINCIPAL)
+        destination = self.chemin(ALIAS_REPLIQUE)
+        if source == destination:
+            raise CommandError("La réplique et la base principale sont le même fichier")
+
+        intervalle = options['intervalle']
+        while True:
+            duree = self.repliquer(source, destination)
+            self.stdout.write(f"🔁 {source} → {destination} ({duree:.0f} ms)")
+            if not intervalle:
+                break
+            time.sleep(intervalle)
@@ -0,0 +1,74 @@
+import subprocess
+
+from django.core.management.base import BaseCommand, CommandError
+
+from authen import sons_manager
+
+
+class Command(BaseCommand):
+    help = "Transcode les sons (WAV) en Opus/MP3 compressés et met à jour le manifest"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--debit', action='append', default=[], metavar='FORMAT=DEBIT',
+            help="Débit d'un format, ex : --debit opus=32k --debit mp3=128k",
+        )
+        parser.add_argument(
+            '--forcer', action='store_true',
+            help="Retranscode tous les sons même si la source n'a pas changé",
+        )
+        parser.add_argument(
+            '--ignorer-sans-ffmpeg', action='store_true',
+            help="Sans ffmpeg, avertit au lieu d'échouer : rien n'est modifié, les sons originaux restent servis",
+        )
+
+    def handle(self, *args, **options):
+        debits = sons_manager.get_debits()
+        for valeur in options['debit']:
+            format_nom, _, debit = valeur.partition('=')
+            if format_nom not in sons_manager.FORMATS or not debit:
+                raise CommandError(f"Débit invalide : {valeur}")
+            debits[format_nom] = debit
+
+        if options['ignorer_sans_ffmpeg'] and sons_manager.get_ffmpeg() is None:
+            self.stderr.write(self.style.WARNING(
+                "⚠️ ffmpeg est introuvable dans le PATH : sons non transcodés, les originaux restent servis"
+            ))
+            return
+
+        manifest = sons_manager.charger_manifest()
+        sources = sons_manager.lister_sources()
+        nouveau_manifest = {}
+        nb_transcodes = 0
+
+        for cle, source in sources.items():
+            try:
+                entree, modifie = sons_manager.traiter_son(
+                    cle, source, manifest.get(cle), debits, forcer=options['forcer']
+                )
+            except RuntimeError as e:
+                raise CommandError(str(e))
+            except subprocess.CalledProcessError as e:
+                raise CommandError(f"ffmpeg a échoué sur {source} (code {e.returncode})")
+
+            nouveau_manifest[cle] = entree
+            if modifie:
+                nb_transcodes += 1
+                tailles = ', '.join(
+                    f"{nom} {v['taille'] // 1024} Ko" for nom, v in entree['variantes'].items()
+                )
+                self.stdout.write(f"🔊 {cle} ({entree['source_taille'] // 1024} Ko) → {tailles}")
+
+        # Nettoyer les variantes des sons supprimés
+        for cle in set(manifest) - set(nouveau_manifest):
+            for variante in manifest[cle]['variantes'].values():
+                fichier = sons_manager.SONS_COMPRESSES_DIR.parent / variante['chemin']
+                if fichier.exists():
+                    fichier.unlink()
+
+        sons_manager.ecrire_manifest(nouveau_manifest)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {nb_transcodes} son(s) transcodé(s), "
+            f"{len(sources) - nb_transcodes} inchangé(s)"
+        ))
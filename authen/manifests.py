@@ -0,0 +1,47 @@
+"""
+Manifests JSON des fichiers générés à partir des statiques (sons compressés,
+images optimisées) : empreinte des sources, lecture, écriture atomique et
+cache mémoire pour la durée du process, par chemin de manifest
+"""
+import hashlib
+import json
+from pathlib import Path
+
+_caches = {}
+
+
+def hash_fichier(chemin):
+    """Retourne le sha256 du contenu d'un fichier"""
+    h = hashlib.sha256()
+    with open(chemin, 'rb') as f:
+        for bloc in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloc)
+    return h.hexdigest()
+
+
+def charger_manifest(chemin):
+    """Charge le manifest depuis le disque ({} s'il n'existe pas encore)"""
+    chemin = Path(chemin)
+    if not chemin.exists():
+        return {}
+    with open(chemin, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def ecrire_manifest(chemin, manifest):
+    """Écrit le manifest de façon atomique et invalide le cache mémoire"""
+    chemin = Path(chemin)
+    chemin.parent.mkdir(parents=True, exist_ok=True)
+    tmp = chemin.with_suffix('.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True, ensure_ascii=False)
+    tmp.replace(chemin)
+    _caches.pop(chemin, None)
+
+
+def get_manifest(chemin):
+    """Manifest mis en cache pour la durée du process"""
+    chemin = Path(chemin)
+    if chemin not in _caches:
+        _caches[chemin] = charger_manifest(chemin)
+    return _caches[chemin]
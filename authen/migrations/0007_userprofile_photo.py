@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authen', '0006_userpreferences'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='photo',
+            field=models.ImageField(blank=True, null=True, upload_to='profils/'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authen', '0007_userprofile_photo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activite',
+            name='session',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authen', '0008_activite_session'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumeActivitesMois',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mois', models.DateField(help_text='Premier jour du mois')),
+                ('nombre', models.IntegerField(default=0)),
+                ('minutes', models.IntegerField(default=0)),
+                ('reussies', models.IntegerField(default=0)),
+                ('scores', models.IntegerField(default=0, help_text='Activités notées')),
+                ('score_total', models.IntegerField(default=0)),
+                ('jeux', models.JSONField(default=dict, help_text='{jeu: [sessions, minutes]}')),
+                ('jours', models.JSONField(default=list, help_text='Jours du mois joués')),
+                ('enfant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumes_archives', to='authen.enfant')),
+            ],
+            options={
+                'verbose_name': "Résumé d'activités archivées",
+                'verbose_name_plural': "Résumés d'activités archivées",
+                'unique_together': {('enfant', 'mois')},
+            },
+        ),
+    ]
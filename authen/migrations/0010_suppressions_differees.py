@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authen', '0009_resumeactivitesmois'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enfant',
+            name='suppression_demandee',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.CreateModel(
+            name='SuppressionDifferee',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modele', models.CharField(help_text='auth.user, authen.enfant, forum.topic', max_length=100)),
+                ('objet_id', models.IntegerField()),
+                ('libelle', models.CharField(max_length=200)),
+                ('etat', models.CharField(choices=[('attente', 'En attente'), ('en_cours', 'En cours'), ('terminee', 'Terminée'), ('erreur', 'Erreur')], db_index=True, default='attente', max_length=10)),
+                ('estimees', models.JSONField(default=dict)),
+                ('supprimees', models.JSONField(default=dict)),
+                ('erreur', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('mis_a_jour', models.DateTimeField(auto_now=True)),
+                ('termine_le', models.DateTimeField(blank=True, null=True)),
+                ('demandee_par', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Suppression différée',
+                'verbose_name_plural': 'Suppressions différées',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authen', '0010_suppressions_differees'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActionGroupee',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(max_length=50)),
+                ('libelle', models.CharField(max_length=200)),
+                ('ids', models.JSONField(default=list, help_text="Sélection, traitée dans l'ordre")),
+                ('etat', models.CharField(choices=[('attente', 'En attente'), ('en_cours', 'En cours'), ('terminee', 'Terminée'), ('erreur', 'Erreur')], db_index=True, default='attente', max_length=10)),
+                ('total', models.IntegerField(default=0)),
+                ('traitees', models.IntegerField(default=0)),
+                ('modifiees', models.IntegerField(default=0)),
+                ('erreur', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('mis_a_jour', models.DateTimeField(auto_now=True)),
+                ('termine_le', models.DateTimeField(blank=True, null=True)),
+                ('demandee_par', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Action groupée',
+                'verbose_name_plural': 'Actions groupées',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
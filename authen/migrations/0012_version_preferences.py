@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authen', '0011_actiongroupee'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userpreferences',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
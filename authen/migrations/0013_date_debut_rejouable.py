@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:53
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authen', '0012_version_preferences'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='activite',
+            name='date_debut',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
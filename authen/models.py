@@ -1,7 +1,10 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from datetime import timedelta
 
+from comautis.projections import ListeQuerySet
+
 class UserProfile(models.Model):
     USER_TYPE_CHOICES = [
         ('parent', 'Parent'),
@@ -12,6 +15,7 @@ class UserProfile(models.Model):
     user_type = models.CharField(max_length=20, choices=USER_TYPE_CHOICES, default='parent')
     phone = models.CharField(max_length=20, blank=True, null=True)
     institution = models.CharField(max_length=200, blank=True, null=True)
+    photo = models.ImageField(upload_to='profils/', blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -23,6 +27,13 @@ class UserProfile(models.Model):
         verbose_name_plural = "Profils Utilisateurs"
 
 
+class VisiblesManager(models.Manager):
+    """Manager par défaut : objets en cours de suppression (authen/suppressions.py) masqués"""
+    
+    def get_queryset(self):
+        return super().get_queryset().filter(suppression_demandee=False)
+
+
 class Enfant(models.Model):
     GENRE_CHOICES = [
         ('M', 'Garçon'),
@@ -59,6 +70,12 @@ class Enfant(models.Model):
     # Métadonnées
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    suppression_demandee = models.BooleanField(default=False, editable=False)
+    
+    # Texte libre de la fiche, différé par Enfant.objects.pour_liste()
+    CHAMPS_LONGS = ('besoins_specifiques', 'activites_preferees')
+    
+    objects = VisiblesManager.from_queryset(ListeQuerySet)()
     
     def __str__(self):
         return f"{self.prenom} {self.nom}"
@@ -166,7 +183,8 @@ class Activite(models.Model):
     
     # Informations sur l'activité
     jeu = models.CharField(max_length=50, choices=JEUX_CHOICES)
-    date_debut = models.DateTimeField(auto_now_add=True)
+    # Heure de début du jeu : rejouée depuis la file hors ligne d'auto_tracker.js, pas l'heure d'écriture
+    date_debut = models.DateTimeField(default=timezone.now)
     date_fin = models.DateTimeField(null=True, blank=True)
     duree_minutes = models.IntegerField(default=0, help_text="Durée en minutes")
     
@@ -176,6 +194,8 @@ class Activite(models.Model):
     
     # Métadonnées
     created_at = models.DateTimeField(auto_now_add=True)
+    # Session de jeu d'auto_tracker.js : rend la fin idempotente (début et fin écrits par lots)
+    session = models.UUIDField(null=True, blank=True, unique=True, editable=False)
     
     def __str__(self):
         return f"{self.enfant.prenom} - {self.get_jeu_display()} - {self.date_debut.strftime('%d/%m/%Y')}"
@@ -191,4 +211,181 @@ class Activite(models.Model):
     class Meta:
         verbose_name = "Activité"
         verbose_name_plural = "Activités"
-        ordering = ['-date_debut']
\ No newline at end of file
+        ordering = ['-date_debut']
+
+
+class ResumeActivitesMois(models.Model):
+    """Totaux d'un enfant pour un mois archivé (activités déplacées dans les segments gzip)"""
+    
+    enfant = models.ForeignKey(Enfant, on_delete=models.CASCADE, related_name='resumes_archives')
+    mois = models.DateField(help_text="Premier jour du mois")
+    
+    nombre = models.IntegerField(default=0)
+    minutes = models.IntegerField(default=0)
+    reussies = models.IntegerField(default=0)
+    scores = models.IntegerField(default=0, help_text="Activités notées")
+    score_total = models.IntegerField(default=0)
+    jeux = models.JSONField(default=dict, help_text="{jeu: [sessions, minutes]}")
+    jours = models.JSONField(default=list, help_text="Jours du mois joués")
+    
+    def __str__(self):
+        return f"{self.enfant.prenom} - {self.mois.strftime('%m/%Y')}"
+    
+    class Meta:
+        verbose_name = "Résumé d'activités archivées"
+        verbose_name_plural = "Résumés d'activités archivées"
+        unique_together = ('enfant', 'mois')
+
+
+class UserPreferences(models.Model):
+    """Modèle pour stocker les préférences utilisateur"""
+    
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='preferences')
+    
+    # Notifications
+    notifications_email = models.BooleanField(default=True)
+    rappels_routine = models.BooleanField(default=True)
+    alertes_forum = models.BooleanField(default=False)
+    newsletter = models.BooleanField(default=True)
+    
+    # Affichage
+    THEME_CHOICES = [
+        ('clair', 'Mode clair'),
+        ('sombre', 'Mode sombre'),
+        ('auto', 'Automatique'),
+    ]
+    theme = models.CharField(max_length=10, choices=THEME_CHOICES, default='clair')
+    
+    TAILLE_CHOICES = [
+        ('petite', 'Petite'),
+        ('normale', 'Normale'),
+        ('grande', 'Grande'),
+        ('tres_grande', 'Très grande'),
+    ]
+    taille_police = models.CharField(max_length=15, choices=TAILLE_CHOICES, default='normale')
+    
+    LANGUE_CHOICES = [
+        ('fr', 'Français'),
+        ('en', 'English'),
+        ('es', 'Español'),
+    ]
+    langue = models.CharField(max_length=5, choices=LANGUE_CHOICES, default='fr')
+    
+    contraste_eleve = models.BooleanField(default=False)
+    
+    # Sons
+    sons_jeux = models.BooleanField(default=True)
+    musique_fond = models.BooleanField(default=False)
+    
+    VOLUME_CHOICES = [
+        ('silencieux', 'Silencieux'),
+        ('faible', 'Faible'),
+        ('moyen', 'Moyen'),
+        ('fort', 'Fort'),
+    ]
+    volume = models.CharField(max_length=15, choices=VOLUME_CHOICES, default='moyen')
+    
+    lecture_vocale = models.BooleanField(default=False)
+    
+    # Confidentialité
+    VISIBILITE_CHOICES = [
+        ('tous', 'Tous les membres'),
+        ('amis', 'Amis uniquement'),
+        ('prive', 'Privé'),
+    ]
+    visibilite_profil = models.CharField(max_length=10, choices=VISIBILITE_CHOICES, default='tous')
+    
+    partage_donnees = models.BooleanField(default=True)
+    
+    # Incrémentée à chaque modification (cache des préférences, authen/preferences.py)
+    version = models.PositiveIntegerField(default=1, editable=False)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Préférences de {self.user.username}"
+    
+    class Meta:
+        verbose_name = "Préférence utilisateur"
+        verbose_name_plural = "Préférences utilisateur"
+
+
+class SuppressionDifferee(models.Model):
+    """Suppression d'un compte, d'un enfant ou d'un sujet, exécutée par lots en arrière-plan"""
+    
+    ETAT_CHOICES = [
+        ('attente', 'En attente'),
+        ('en_cours', 'En cours'),
+        ('terminee', 'Terminée'),
+        ('erreur', 'Erreur'),
+    ]
+    
+    modele = models.CharField(max_length=100, help_text="auth.user, authen.enfant, forum.topic")
+    objet_id = models.IntegerField()
+    libelle = models.CharField(max_length=200)
+    demandee_par = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    etat = models.CharField(max_length=10, choices=ETAT_CHOICES, default='attente', db_index=True)
+    
+    # Progression : {table: lignes}
+    estimees = models.JSONField(default=dict)
+    supprimees = models.JSONField(default=dict)
+    erreur = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    mis_a_jour = models.DateTimeField(auto_now=True)
+    termine_le = models.DateTimeField(null=True, blank=True)
+    
+    def progression(self):
+        """Pourcentage de lignes supprimées (estimation faite au démarrage)"""
+        if self.etat == 'terminee':
+            return 100
+        total = sum(self.estimees.values())
+        return min(99, int(sum(self.supprimees.values()) * 100 / total)) if total else 0
+    
+    def tables(self):
+        """[(table, lignes supprimées, lignes estimées)]"""
+        return [(table, self.supprimees.get(table, 0), estimees) for table, estimees in self.estimees.items()]
+    
+    def __str__(self):
+        return f"{self.modele} #{self.objet_id} ({self.get_etat_display()})"
+    
+    class Meta:
+        verbose_name = "Suppression différée"
+        verbose_name_plural = "Suppressions différées"
+        ordering = ['-created_at']
+
+
+class ActionGroupee(models.Model):
+    """Action d'administration sur une grande sélection, exécutée par lots en arrière-plan"""
+    
+    ETAT_CHOICES = SuppressionDifferee.ETAT_CHOICES
+    
+    action = models.CharField(max_length=50)
+    libelle = models.CharField(max_length=200)
+    ids = models.JSONField(default=list, help_text="Sélection, traitée dans l'ordre")
+    demandee_par = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    etat = models.CharField(max_length=10, choices=ETAT_CHOICES, default='attente', db_index=True)
+    
+    # Progression : ids[:traitees] déjà traités, dont `modifiees` réellement modifiés
+    total = models.IntegerField(default=0)
+    traitees = models.IntegerField(default=0)
+    modifiees = models.IntegerField(default=0)
+    erreur = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    mis_a_jour = models.DateTimeField(auto_now=True)
+    termine_le = models.DateTimeField(null=True, blank=True)
+    
+    def progression(self):
+        if self.etat == 'terminee':
+            return 100
+        return int(self.traitees * 100 / self.total) if self.total else 0
+    
+    def __str__(self):
+        return f"{self.libelle} ({self.get_etat_display()})"
+    
+    class Meta:
+        verbose_name = "Action groupée"
+        verbose_name_plural = "Actions groupées"
+        ordering = ['-created_at']
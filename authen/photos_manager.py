@@ -0,0 +1,97 @@
+import hashlib
+import io
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+# Taille maximale (en pixels, plus grand côté) des photos conservées après upload
+TAILLE_MAX_PAR_DEFAUT = 1600
+
+# Tailles fixes des miniatures (côté du carré en pixels)
+MINIATURES_PAR_DEFAUT = {
+    'icone': 64,
+    'carte': 160,
+    'grande': 320,
+}
+
+QUALITE_JPEG = 85
+
+
+def get_taille_max():
+    return getattr(settings, 'PHOTOS_TAILLE_MAX', TAILLE_MAX_PAR_DEFAUT)
+
+
+def get_miniatures():
+    return getattr(settings, 'MINIATURES_TAILLES', MINIATURES_PAR_DEFAUT)
+
+
+def _encoder_jpeg(image):
+    """Encode une image PIL en JPEG sans métadonnées (EXIF, GPS...)"""
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    tampon = io.BytesIO()
+    # Pas d'exif= : Pillow n'écrit aucune métadonnée
+    image.save(tampon, 'JPEG', quality=QUALITE_JPEG, optimize=True, progressive=True)
+    return tampon.getvalue()
+
+
+def preparer_photo(fichier):
+    """
+    Réduit une photo uploadée et supprime ses métadonnées
+    Retourne un ContentFile nommé d'après le hash de son contenu
+    """
+    from PIL import Image, ImageOps
+
+    fichier.seek(0)
+    with Image.open(fichier) as image:
+        # draft() permet au décodeur JPEG de décoder directement en taille réduite :
+        # avant exif_transpose, qui décode l'image entière
+        taille_max = get_taille_max()
+        image.draft('RGB', (taille_max, taille_max))
+        # Appliquer l'orientation EXIF avant de jeter les métadonnées
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((taille_max, taille_max), Image.LANCZOS)
+        contenu = _encoder_jpeg(image)
+
+    nom = hashlib.sha256(contenu).hexdigest()[:32] + '.jpg'
+    return ContentFile(contenu, name=nom)
+
+
+def chemin_miniature(nom_original, taille):
+    """Chemin (dans MEDIA_ROOT) de la miniature d'une photo pour une taille donnée"""
+    # Les originaux sont nommés par hash de contenu : la miniature l'est aussi
+    return str(PurePosixPath('miniatures') / taille / PurePosixPath(nom_original).with_suffix('.jpg'))
+
+
+def generer_miniature(nom_original, taille):
+    """Génère la miniature si elle n'existe pas encore et retourne son chemin"""
+    from PIL import Image, ImageOps
+
+    chemin = chemin_miniature(nom_original, taille)
+    if default_storage.exists(chemin):
+        return chemin
+
+    cote = get_miniatures()[taille]
+    with default_storage.open(nom_original, 'rb') as f:
+        with Image.open(f) as image:
+            image.draft('RGB', (cote * 2, cote * 2))
+            image = ImageOps.exif_transpose(image)
+            miniature = ImageOps.fit(image, (cote, cote), Image.LANCZOS)
+            contenu = _encoder_jpeg(miniature)
+
+    # Écriture directe (pas de renommage) : le nom est déterministe
+    if not default_storage.exists(chemin):
+        default_storage.save(chemin, ContentFile(contenu))
+    return chemin
+
+
+def url_miniature(champ_photo, taille='carte'):
+    """URL de la miniature d'un ImageField (servie par la vue miniature)"""
+    if not champ_photo:
+        return ''
+    if taille not in get_miniatures():
+        raise ValueError(f"Taille de miniature inconnue : {taille}")
+    return reverse('miniature', args=[taille, champ_photo.name])
@@ -0,0 +1,102 @@
+"""
+Préférences utilisateur (thème, taille de police, contraste, sons, volume...)
+
+PreferencesMiddleware pose request.preferences, chargé à la première lecture
+seulement (utilisateur lu dans la session, pas dans auth_user) : depuis le
+cache (clé par utilisateur, l'objet porte sa version),
+sinon une requête SQL puis mise en cache. Sans préférences enregistrées (ou
+visiteur anonyme), les valeurs par défaut du modèle, sans écriture.
+
+Le processeur de contexte les expose aux gabarits ({{ preferences.theme }}),
+{% attributs_preferences %} les pose en attributs data- du <body> (sans rien
+de propre au compte : les pages de jeux sont précalculées par variante).
+enregistrer() n'écrit que les champs modifiés, incrémente la version et
+remplace l'entrée du cache.
+"""
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.functional import SimpleLazyObject
+
+from .models import UserPreferences
+
+# Champs modifiables depuis la page Paramètres
+CHAMPS = (
+    'notifications_email', 'rappels_routine', 'alertes_forum', 'newsletter',
+    'theme', 'taille_police', 'langue', 'contraste_eleve',
+    'sons_jeux', 'musique_fond', 'volume', 'lecture_vocale',
+    'visibilite_profil', 'partage_donnees',
+)
+
+# Champs qui changent le rendu des pages (attributs data- du <body>)
+AFFICHAGE = ('theme', 'taille_police', 'contraste_eleve', 'sons_jeux', 'musique_fond', 'volume', 'lecture_vocale')
+
+
+def get_duree():
+    return getattr(settings, 'PREFERENCES_CACHE_DUREE', 24 * 3600)
+
+
+def cle(user_id):
+    return f'preferences:{user_id}'
+
+
+def charger(user_id):
+    """Préférences de l'utilisateur : cache, sinon base (défauts du modèle si aucune)"""
+    if user_id is None:
+        return UserPreferences()
+    preferences = cache.get(cle(user_id))
+    if preferences is None:
+        preferences = UserPreferences.objects.filter(user_id=user_id).first() or UserPreferences(user_id=user_id)
+        # add : ne remplace pas une version plus récente écrite entre-temps par enregistrer()
+        cache.add(cle(user_id), preferences, get_duree())
+    return preferences
+
+
+def utilisateur_id(request):
+    # Lu dans la session : pas de requête sur auth_user pour une page qui n'en a pas besoin
+    session = getattr(request, 'session', None)
+    return session.get(SESSION_KEY) if session is not None else None
+
+
+def enregistrer(user, valeurs):
+    """Écrit les champs de `valeurs` qui ont changé ; renvoie les préférences à jour"""
+    actuelles = charger(user.pk)
+    modifies = {champ: valeur for champ, valeur in valeurs.items() if getattr(actuelles, champ) != valeur}
+    if not modifies:
+        return actuelles
+
+    with transaction.atomic():
+        preferences, creees = UserPreferences.objects.select_for_update().get_or_create(
+            user_id=user.pk, defaults=modifies,
+        )
+        if not creees:
+            for champ, valeur in modifies.items():
+                setattr(preferences, champ, valeur)
+            preferences.version += 1
+            preferences.save(update_fields=[*modifies, 'version', 'updated_at'])
+    cache.set(cle(user.pk), preferences, get_duree())
+    return preferences
+
+
+def variante_affichage(request):
+    """Variante des pages précalculées (comautis/pages_precalculees.py) : une par combinaison d'affichage"""
+    return '-'.join(str(getattr(request.preferences, champ)) for champ in AFFICHAGE)
+
+
+class PreferencesMiddleware:
+    """request.preferences, lu une fois par requête (et seulement si utilisé)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.preferences = SimpleLazyObject(lambda: charger(utilisateur_id(request)))
+        return self.get_response(request)
+
+
+def preferences(request):
+    """Processeur de contexte : {{ preferences }} dans tous les gabarits"""
+    if hasattr(request, 'preferences'):
+        return {'preferences': request.preferences}
+    return {'preferences': SimpleLazyObject(lambda: charger(utilisateur_id(request)))}
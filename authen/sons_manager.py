@@ -0,0 +1,161 @@
+import shutil
+import subprocess
+from pathlib import Path
+
+from django.conf import settings
+from django.templatetags.static import static
+
+from . import manifests
+from .manifests import hash_fichier
+
+# Dossier des sons originaux (WAV/MP3) et dossier des versions compressées
+SONS_DIR = Path(settings.BASE_DIR) / 'authen' / 'static' / 'sons'
+SONS_COMPRESSES_DIR = Path(settings.BASE_DIR) / 'authen' / 'static' / 'sons_compresses'
+MANIFEST_PATH = SONS_COMPRESSES_DIR / 'manifest.json'
+
+EXTENSIONS_SOURCES = ('.wav', '.mp3')
+
+# Formats de sortie : codec ffmpeg, extension et type MIME (ordre = préférence)
+FORMATS = {
+    'opus': {'codec': 'libopus', 'extension': '.opus', 'mime': 'audio/ogg; codecs=opus'},
+    'mp3': {'codec': 'libmp3lame', 'extension': '.mp3', 'mime': 'audio/mpeg'},
+}
+
+DEBITS_PAR_DEFAUT = {'opus': '48k', 'mp3': '96k'}
+
+
+def get_debits():
+    """Débits par format, surchargeables via settings.SONS_DEBITS"""
+    debits = dict(DEBITS_PAR_DEFAUT)
+    debits.update(getattr(settings, 'SONS_DEBITS', {}))
+    return debits
+
+
+def lister_sources():
+    """Liste les sons originaux sous la forme {'animaux/horse': Path(...)}"""
+    sources = {}
+    for chemin in sorted(SONS_DIR.rglob('*')):
+        if chemin.suffix.lower() in EXTENSIONS_SOURCES:
+            cle = chemin.relative_to(SONS_DIR).with_suffix('').as_posix()
+            sources[cle] = chemin
+    return sources
+
+
+def charger_manifest():
+    return manifests.charger_manifest(MANIFEST_PATH)
+
+
+def ecrire_manifest(manifest):
+    manifests.ecrire_manifest(MANIFEST_PATH, manifest)
+
+
+def get_manifest():
+    """Manifest mis en cache pour la durée du process"""
+    return manifests.get_manifest(MANIFEST_PATH)
+
+
+def get_ffmpeg():
+    """Chemin de ffmpeg (None s'il n'est pas installé)"""
+    return shutil.which('ffmpeg')
+
+
+def transcoder(source, destination, format_nom, debit):
+    """Transcode un fichier avec ffmpeg"""
+    ffmpeg = get_ffmpeg()
+    if ffmpeg is None:
+        raise RuntimeError("ffmpeg est introuvable dans le PATH")
+
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    subprocess.run(
+        [
+            ffmpeg, '-y', '-loglevel', 'error',
+            '-i', str(source),
+            '-vn', '-map_metadata', '-1',
+            '-c:a', FORMATS[format_nom]['codec'],
+            '-b:a', debit,
+            str(destination),
+        ],
+        check=True,
+    )
+
+
+def traiter_son(cle, source, entree_existante, debits, forcer=False):
+    """
+    Transcode un son dans tous les formats demandés
+    Retourne (entrée du manifest, True si un transcodage a eu lieu)
+    """
+    source_hash = hash_fichier(source)
+    variantes_existantes = (entree_existante or {}).get('variantes', {})
+
+    entree = {
+        'source': source.relative_to(SONS_DIR.parent).as_posix(),
+        'source_hash': source_hash,
+        'source_taille': source.stat().st_size,
+        'variantes': {},
+    }
+    modifie = False
+
+    for format_nom, debit in debits.items():
+        ancienne = variantes_existantes.get(format_nom)
+        if (
+            not forcer
+            and ancienne
+            and ancienne.get('source_hash') == source_hash
+            and ancienne.get('debit') == debit
+            and (SONS_COMPRESSES_DIR.parent / ancienne['chemin']).exists()
+        ):
+            # Source et réglages inchangés : on garde la variante existante
+            entree['variantes'][format_nom] = ancienne
+            continue
+
+        extension = FORMATS[format_nom]['extension']
+        tmp = SONS_COMPRESSES_DIR / f'{cle}.tmp{extension}'
+        try:
+            transcoder(source, tmp, format_nom, debit)
+
+            # Nom final basé sur le hash du contenu produit (URL immuable)
+            contenu_hash = hash_fichier(tmp)[:12]
+            destination = SONS_COMPRESSES_DIR / f'{cle}.{contenu_hash}{extension}'
+            tmp.replace(destination)
+        finally:
+            # Sortie partielle d'un ffmpeg en échec
+            tmp.unlink(missing_ok=True)
+
+        # Supprimer l'ancienne variante devenue obsolète
+        if ancienne:
+            ancien_fichier = SONS_COMPRESSES_DIR.parent / ancienne['chemin']
+            if ancien_fichier != destination and ancien_fichier.exists():
+                ancien_fichier.unlink()
+
+        entree['variantes'][format_nom] = {
+            'chemin': destination.relative_to(SONS_COMPRESSES_DIR.parent).as_posix(),
+            'mime': FORMATS[format_nom]['mime'],
+            'debit': debit,
+            'taille': destination.stat().st_size,
+            'source_hash': source_hash,
+        }
+        modifie = True
+
+    return entree, modifie
+
+
+def urls_son(cle):
+    """
+    Retourne les URLs disponibles pour un son, dans l'ordre de préférence
+    Format : [{'url': ..., 'mime': ...}, ...] (l'original en dernier recours)
+    """
+    entree = get_manifest().get(cle)
+    urls = []
+    if entree:
+        for format_nom in FORMATS:
+            variante = entree['variantes'].get(format_nom)
+            if variante:
+                urls.append({'url': static(variante['chemin']), 'mime': variante['mime']})
+        urls.append({'url': static(entree['source']), 'mime': ''})
+        return urls
+
+    # Pas encore transcodé : on sert l'original
+    for extension in EXTENSIONS_SOURCES:
+        if (SONS_DIR / f'{cle}{extension}').exists():
+            return [{'url': static(f'sons/{cle}{extension}'), 'mime': ''}]
+    return []
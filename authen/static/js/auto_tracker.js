@@ -9,7 +9,9 @@
     // Détecter automatiquement l'enfant_id et le jeu depuis l'URL
     const urlParts = window.location.pathname.split('/');
     let enfantId = null;
-    let jeuName = null;
+    // Jeu déclaré par la page (<meta name="jeu">), sinon deviné plus bas
+    const metaJeu = document.querySelector('meta[name="jeu"]');
+    let jeuName = metaJeu ? metaJeu.content : null;
     
     // Extraire enfant_id (format : /jeu/enfant/123/animaux/)
     const enfantIndex = urlParts.indexOf('enfant');
@@ -36,9 +38,9 @@
     
     // Trouver le jeu correspondant
     for (const [key, pattern] of Object.entries(jeuPatterns)) {
+        if (jeuName) break;
         if (pattern.test(window.location.pathname)) {
             jeuName = key;
-            break;
         }
     }
     
@@ -50,6 +52,15 @@
         }
     }
     
+    // Pages de jeux communes à tous les enfants : enfant choisi sur son tableau de bord
+    if (!enfantId) {
+        try {
+            enfantId = localStorage.getItem('comautis:enfant');
+        } catch (error) {
+            enfantId = null;
+        }
+    }
+    
     // Si pas de jeu détecté, essayer depuis le titre de la page
     if (!jeuName) {
         const title = document.title.toLowerCase();
@@ -69,21 +80,137 @@
     
     console.log('🎮 Auto-tracking activé:', jeuName, 'pour enfant', enfantId);
     
+    // Jeton CSRF de Django (cookie csrftoken)
+    function getCookie(name) {
+        const match = document.cookie.match(new RegExp('(?:^|; )' + name + '=([^;]*)'));
+        return match ? decodeURIComponent(match[1]) : null;
+    }
+    
     // Variables de tracking
     let activiteId = null;
     let startTime = Date.now();
     let hasStarted = false;
+    // Identifie la session de cette page dans la file hors ligne
+    const cleSession = jeuName + '-' + enfantId + '-' + startTime;
+    
+    // ========== FILE HORS LIGNE ==========
+    // Sessions jouées sans réseau (jeux servis par le service worker) : gardées
+    // dans le navigateur et rejouées au retour du réseau avec leur heure réelle
+    const CLE_FILE = 'comautis:activites:file';
+    const FILE_MAX = 200;
+    
+    function lireFile() {
+        try {
+            return JSON.parse(localStorage.getItem(CLE_FILE)) || [];
+        } catch (error) {
+            return [];
+        }
+    }
+    
+    function ecrireFile(file) {
+        try {
+            localStorage.setItem(CLE_FILE, JSON.stringify(file.slice(-FILE_MAX)));
+        } catch (error) {
+            console.error('❌ File hors ligne indisponible:', error);
+        }
+    }
+    
+    // Résultat estimé de la session en cours
+    function resultat() {
+        const durationMinutes = Math.round((Date.now() - startTime) / 1000 / 60);
+        // Score estimé : si durée > 2 min, on considère que c'est réussi
+        const reussi = durationMinutes >= 2;
+        return { durationMinutes, reussi, score: reussi ? 75 : 50 };
+    }
+    
+    // Une seule entrée par session : une nouvelle fin remplace la précédente
+    function mettreEnFile() {
+        const { score, reussi } = resultat();
+        const file = lireFile().filter(evenement => evenement.cle !== cleSession);
+        file.push({
+            cle: cleSession,
+            activite_id: activiteId,
+            enfant_id: enfantId,
+            jeu: jeuName,
+            debut: startTime,
+            fin: Date.now(),
+            score: score,
+            reussi: reussi,
+        });
+        ecrireFile(file);
+        console.log('📴 Activité gardée pour le retour du réseau');
+    }
+    
+    // null si le serveur refuse l'événement (inutile de réessayer),
+    // exception si le réseau ou le serveur ne répond pas (réessayé plus tard)
+    async function envoyer(url, donnees) {
+        const response = await fetch(url, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': getCookie('csrftoken'),
+            },
+            body: JSON.stringify(donnees),
+        });
+        if (response.redirected || response.status === 429 || response.status >= 500) {
+            throw new Error('Réponse ' + response.status);
+        }
+        return response.ok ? response.json() : null;
+    }
+    
+    // Renvoie le jeton de la session enregistrée
+    async function rejouer(evenement) {
+        const fin = { score: evenement.score, reussi: evenement.reussi, fin: evenement.fin };
+        if (evenement.activite_id) {
+            const data = await envoyer('/api/end-activity/', { activite_id: evenement.activite_id, ...fin });
+            if (data && data.success) return evenement.activite_id;
+            // Jeton expiré pendant la coupure : la session est recréée
+        }
+        const debut = await envoyer('/api/start-activity/', {
+            enfant_id: evenement.enfant_id,
+            jeu: evenement.jeu,
+            debut: evenement.debut,
+        });
+        if (!debut || !debut.success) return null;
+        await envoyer('/api/end-activity/', { activite_id: debut.activite_id, ...fin });
+        return debut.activite_id;
+    }
+    
+    let rejeuEnCours = false;
+    
+    async function rejouerFile() {
+        if (rejeuEnCours || !navigator.onLine) return;
+        rejeuEnCours = true;
+        try {
+            for (const evenement of lireFile()) {
+                const jeton = await rejouer(evenement);
+                ecrireFile(lireFile().filter(autre => autre.cle !== evenement.cle));
+                // Session de cette page : les fins suivantes partent directement
+                if (evenement.cle === cleSession && jeton) activiteId = jeton;
+            }
+        } catch (error) {
+            console.log('📴 Réseau indisponible, rejeu reporté');
+        } finally {
+            rejeuEnCours = false;
+        }
+    }
+    
+    window.addEventListener('online', rejouerFile);
     
     // Fonction pour démarrer l'activité
     async function startActivity() {
         if (hasStarted) return;
         hasStarted = true;
         
+        // Hors ligne : la session sera envoyée avec sa fin
+        if (!navigator.onLine) return;
+        
         try {
             const response = await fetch('/api/start-activity/', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
+                    'X-CSRFToken': getCookie('csrftoken'),
                 },
                 body: JSON.stringify({
                     enfant_id: enfantId,
@@ -100,19 +227,24 @@
         } catch (error) {
             console.error('❌ Erreur démarrage:', error);
         }
+        
+        // Sessions d'avant la coupure, envoyées une fois le début connu
+        rejouerFile();
     }
     
     // Fonction pour terminer l'activité
     async function endActivity() {
-        if (!activiteId) return;
+        if (!hasStarted) return;
+        
+        // Début non enregistré (hors ligne) : la session entière passe par la file
+        if (!activiteId || !navigator.onLine) {
+            mettreEnFile();
+            rejouerFile();
+            return;
+        }
         
         try {
-            // Calculer la durée en minutes
-            const durationMinutes = Math.round((Date.now() - startTime) / 1000 / 60);
-            
-            // Score estimé : si durée > 2 min, on considère que c'est réussi
-            const reussi = durationMinutes >= 2;
-            const score = reussi ? 75 : 50; // Score estimé
+            const { durationMinutes, reussi, score } = resultat();
             
             const response = await fetch('/api/end-activity/', {
                 method: 'POST',
@@ -133,7 +265,8 @@
                 console.log(`   Durée: ${durationMinutes} minutes`);
             }
         } catch (error) {
-            console.error('❌ Erreur fin activité:', error);
+            // Réseau coupé pendant l'envoi
+            mettreEnFile();
         }
     }
     
@@ -146,19 +279,23 @@
     
     // Terminer quand l'utilisateur quitte
     window.addEventListener('beforeunload', function() {
-        if (activiteId) {
-            const durationMinutes = Math.round((Date.now() - startTime) / 1000 / 60);
-            const reussi = durationMinutes >= 2;
+        if (!hasStarted) return;
+        
+        if (activiteId && navigator.onLine) {
+            const { reussi, score } = resultat();
             
             // Utiliser sendBeacon pour garantir l'envoi
             const data = JSON.stringify({
                 activite_id: activiteId,
-                score: reussi ? 75 : 50,
+                score: score,
                 reussi: reussi
             });
             
-            navigator.sendBeacon('/api/end-activity/', data);
+            if (navigator.sendBeacon('/api/end-activity/', data)) return;
         }
+        
+        // Hors ligne : rejouée au prochain chargement d'une page avec réseau
+        mettreEnFile();
     });
     
     // Terminer aussi après 30 secondes d'inactivité
@@ -0,0 +1,18 @@
+/* Jeux hors ligne : enregistre le service worker (authen/hors_ligne.py) et, quand
+   le réseau revient, lui demande de télécharger ce qu'il n'a pas pu mettre en cache */
+(function () {
+    'use strict';
+
+    if (!('serviceWorker' in navigator)) return;
+    const script = document.currentScript;
+
+    window.addEventListener('load', () => {
+        navigator.serviceWorker.register(script.dataset.serviceWorker, { scope: '/' }).catch(() => {});
+    });
+
+    window.addEventListener('online', () => {
+        navigator.serviceWorker.ready.then(enregistrement => {
+            if (enregistrement.active) enregistrement.active.postMessage({ type: 'completer' });
+        });
+    });
+})();
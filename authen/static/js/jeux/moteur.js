@@ -0,0 +1,415 @@
+/* Moteur commun des jeux ComAutiste : memory, compter, quiz
+   La page (authen/jeux/moteur.html) ne contient que la coquille : data-moteur
+   choisit le jeu, data-pack donne l'URL versionnée de son contenu (JSON). */
+(function () {
+    'use strict';
+
+    const corps = document.body;
+    const zone = document.getElementById('zone-jeu');
+
+    // ========== OUTILS ==========
+
+    function el(balise, classe, texte) {
+        const noeud = document.createElement(balise);
+        if (classe) noeud.className = classe;
+        if (texte !== undefined) noeud.textContent = texte;
+        return noeud;
+    }
+
+    function bouton(classe, texte, action) {
+        const noeud = el('button', classe, texte);
+        noeud.type = 'button';
+        noeud.addEventListener('click', action);
+        return noeud;
+    }
+
+    function hasard(liste) {
+        return liste[Math.floor(Math.random() * liste.length)];
+    }
+
+    function melanger(liste) {
+        const copie = liste.slice();
+        for (let i = copie.length - 1; i > 0; i--) {
+            const j = Math.floor(Math.random() * (i + 1));
+            [copie[i], copie[j]] = [copie[j], copie[i]];
+        }
+        return copie;
+    }
+
+    function remplir(modele, valeurs) {
+        return modele.replace(/\{(\w+)\}/g, (tout, cle) => (cle in valeurs ? valeurs[cle] : tout));
+    }
+
+    function etoiles(reussite) {
+        if (reussite < 0.6) return '⭐';
+        if (reussite < 0.8) return '⭐⭐';
+        return '⭐⭐⭐';
+    }
+
+    // ========== SONS ET FÊTE (préférences de l'utilisateur) ==========
+
+    const VOLUMES = { silencieux: 0, faible: 0.1, moyen: 0.3, fort: 0.5 };
+    const volume = corps.dataset.sonsJeux === '0' ? 0 : (VOLUMES[corps.dataset.volume] ?? 0.3);
+    let contexteAudio = null;
+
+    function jouerSon(type) {
+        const Contexte = window.AudioContext || window.webkitAudioContext;
+        if (!volume || !Contexte) return;
+        contexteAudio = contexteAudio || new Contexte();
+        const debut = contexteAudio.currentTime;
+        const oscillateur = contexteAudio.createOscillator();
+        const gain = contexteAudio.createGain();
+        oscillateur.connect(gain);
+        gain.connect(contexteAudio.destination);
+
+        const notes = type === 'correct' ? [523.25, 659.25, 783.99] : [200, 150];
+        notes.forEach((frequence, i) => oscillateur.frequency.setValueAtTime(frequence, debut + i * 0.1));
+        gain.gain.setValueAtTime(volume, debut);
+        gain.gain.exponentialRampToValueAtTime(0.01, debut + 0.3);
+        oscillateur.start(debut);
+        oscillateur.stop(debut + 0.3);
+    }
+
+    function confettis() {
+        const fete = document.getElementById('celebration');
+        if (!fete || window.matchMedia('(prefers-reduced-motion: reduce)').matches) return;
+        const couleurs = ['#ff6b9d', '#667eea', '#84fab0', '#feca57', '#ff8e53'];
+        for (let i = 0; i < 30; i++) {
+            const morceau = el('div', 'confetti');
+            morceau.style.left = Math.random() * 100 + '%';
+            morceau.style.background = hasard(couleurs);
+            morceau.style.animationDelay = Math.random() * 0.3 + 's';
+            fete.appendChild(morceau);
+            setTimeout(() => morceau.remove(), 3000);
+        }
+    }
+
+    // Fenêtre de fin de partie : lignes = [[libellé, valeur]], rejouer() relance le jeu
+    function finDePartie({ titre, message, note, lignes = [], rejouer }) {
+        const modale = el('div', 'modale ouverte');
+        modale.setAttribute('role', 'dialog');
+        modale.setAttribute('aria-modal', 'true');
+        const contenu = el('div', 'modale-contenu');
+        contenu.append(el('div', 'modale-emoji', '🎉'), el('h2', '', titre), el('p', '', message));
+        if (note) contenu.appendChild(el('div', 'etoiles', note));
+        lignes.forEach(([libelle, valeur]) => {
+            const ligne = el('p');
+            ligne.append(el('strong', '', libelle + ' : '), String(valeur));
+            contenu.appendChild(ligne);
+        });
+        const rejouerBtn = bouton('btn btn-primaire', '🔄 Rejouer', () => {
+            modale.remove();
+            rejouer();
+        });
+        contenu.appendChild(rejouerBtn);
+        modale.appendChild(contenu);
+        document.body.appendChild(modale);
+        rejouerBtn.focus();
+        jouerSon('correct');
+        confettis();
+        setTimeout(confettis, 500);
+    }
+
+    function info(libelle) {
+        const bloc = el('div', 'info');
+        const valeur = el('div', 'info-valeur', '0');
+        bloc.append(el('div', 'info-label', libelle), valeur);
+        return [bloc, valeur];
+    }
+
+    // ========== MEMORY ==========
+
+    function memory(pack) {
+        let niveau = pack.niveaux[0];
+        let minuteur = null;
+
+        if (pack.niveaux.length > 1) {
+            const choix = el('div', 'panneau');
+            const boutons = el('div', 'niveaux');
+            choix.append(el('h3', '', '🎯 Choisis ta difficulté :'), boutons);
+            pack.niveaux.forEach((n, i) => {
+                const btn = bouton('niveau-btn' + (i === 0 ? ' actif' : ''), n.libelle, () => {
+                    boutons.querySelectorAll('.niveau-btn').forEach(b => b.classList.remove('actif'));
+                    btn.classList.add('actif');
+                    niveau = n;
+                    partie();
+                });
+                boutons.appendChild(btn);
+            });
+            zone.appendChild(choix);
+        }
+
+        const infos = el('div', 'panneau infos');
+        const [blocTemps, temps] = info('⏱️ Temps');
+        const [blocCoups, coups] = info('🎯 Coups');
+        const [blocPaires, paires] = info('✨ Paires');
+        infos.append(blocTemps, blocCoups, blocPaires);
+        const plateau = el('div', 'plateau');
+        const controles = el('div', 'controls');
+        controles.appendChild(bouton('btn btn-primaire', '🔄 Nouvelle Partie', () => partie()));
+        zone.append(infos, plateau, controles);
+
+        function partie() {
+            const total = Math.min(niveau.paires, pack.cartes.length);
+            const cartes = melanger(pack.cartes.slice(0, total).flatMap(c => [c, c]));
+            let retournees = [];
+            let trouvees = 0;
+            let nbCoups = 0;
+            let secondes = 0;
+            let verrou = false;
+
+            temps.textContent = '0s';
+            coups.textContent = '0';
+            paires.textContent = `0/${total}`;
+            clearInterval(minuteur);
+            minuteur = setInterval(() => { temps.textContent = ++secondes + 's'; }, 1000);
+
+            plateau.replaceChildren(...cartes.map(donnees => {
+                const carte = el('button', 'carte');
+                carte.type = 'button';
+                carte.setAttribute('aria-label', 'Carte cachée');
+                const recto = el('span', 'carte-face carte-recto');
+                if (donnees.image) {
+                    const image = el('img');
+                    image.src = donnees.image;
+                    image.alt = donnees.nom;
+                    recto.appendChild(image);
+                } else {
+                    const pastille = el('span', 'carte-couleur');
+                    pastille.style.background = donnees.couleur;
+                    recto.appendChild(pastille);
+                }
+                carte.append(el('span', 'carte-face carte-dos', pack.dos), recto);
+                carte.addEventListener('click', () => retourner(carte, donnees));
+                return carte;
+            }));
+
+            function retourner(carte, donnees) {
+                if (verrou || carte.classList.contains('retournee')) return;
+                carte.classList.add('retournee');
+                carte.setAttribute('aria-label', donnees.nom);
+                retournees.push([carte, donnees]);
+                if (retournees.length < 2) return;
+
+                coups.textContent = ++nbCoups;
+                const [[carte1, donnees1], [carte2, donnees2]] = retournees;
+                retournees = [];
+                if (donnees1.nom === donnees2.nom) {
+                    carte1.classList.add('trouvee');
+                    carte2.classList.add('trouvee');
+                    paires.textContent = `${++trouvees}/${total}`;
+                    if (trouvees === total) {
+                        clearInterval(minuteur);
+                        setTimeout(() => finDePartie({
+                            titre: 'Bravo !',
+                            message: 'Tu as trouvé toutes les paires !',
+                            // 3 étoiles jusqu'à 2,5 coups par paire, 1 au-delà de 3
+                            note: nbCoups > total * 3 ? '⭐' : nbCoups > total * 2.5 ? '⭐⭐' : '⭐⭐⭐',
+                            lignes: [['⏱️ Temps', secondes + 's'], ['🎯 Coups', nbCoups]],
+                            rejouer: partie,
+                        }), 500);
+                    }
+                    return;
+                }
+                verrou = true;
+                setTimeout(() => {
+                    [carte1, carte2].forEach(c => {
+                        c.classList.remove('retournee');
+                        c.setAttribute('aria-label', 'Carte cachée');
+                    });
+                    verrou = false;
+                }, 1000);
+            }
+        }
+
+        partie();
+    }
+
+    // ========== COMPTER ==========
+
+    function compter(pack) {
+        const nombreux = pack.maximum > 5 ? ' nombreux' : '';
+        const score = el('div', 'panneau score');
+        const note = el('div', 'etoiles', '⭐⭐⭐');
+        const resume = el('p', 'texte-score');
+        score.append(el('h3', '', '🌟 Ton Score 🌟'), note, resume);
+
+        const jeu = el('div', 'panneau');
+        const objets = el('div', 'objets' + nombreux);
+        const nombres = el('div', 'nombres' + nombreux);
+        const retour = el('div', 'retour');
+        jeu.append(el('div', 'question-texte', 'Combien y en a-t-il ?'), objets, nombres, retour);
+
+        const controles = el('div', 'controls');
+        const suivant = bouton('btn btn-primaire', '➡️ Question Suivante', () => question());
+        suivant.hidden = true;
+        controles.appendChild(suivant);
+        zone.append(score, jeu, controles);
+
+        let bonnes = 0;
+        let posees = 0;
+
+        function afficherScore() {
+            resume.textContent = `${bonnes} bonnes réponses sur ${posees}`;
+            note.textContent = posees ? etoiles(bonnes / posees) : '⭐⭐⭐';
+        }
+
+        function question() {
+            if (posees >= pack.questions) {
+                finDePartie({
+                    titre: 'Bravo Champion !',
+                    message: pack.victoire,
+                    note: etoiles(bonnes / posees),
+                    rejouer: () => { bonnes = 0; posees = 0; question(); },
+                });
+                return;
+            }
+            // Chaque nombre revient à tour de rôle (1, 2, ... maximum, 1, 2...)
+            const attendu = (posees % pack.maximum) + 1;
+            posees++;
+            afficherScore();
+            suivant.hidden = true;
+            retour.textContent = '';
+            retour.className = 'retour';
+
+            const emoji = hasard(hasard(Object.values(pack.collections)));
+            objets.replaceChildren(...Array.from({ length: attendu }, (_, i) => {
+                const objet = el('div', 'objet', emoji);
+                objet.style.animationDelay = (i * 0.05) + 's';
+                return objet;
+            }));
+
+            nombres.replaceChildren(...Array.from({ length: pack.maximum }, (_, i) => {
+                const btn = bouton('nombre-btn', String(i + 1), () => repondre(i + 1, btn));
+                return btn;
+            }));
+
+            function repondre(nombre, btn) {
+                const boutons = nombres.querySelectorAll('button');
+                if (nombre === attendu) {
+                    bonnes++;
+                    afficherScore();
+                    boutons.forEach(b => { b.disabled = true; });
+                    btn.classList.add('correct');
+                    retour.textContent = hasard(pack.encouragements);
+                    retour.className = 'retour correct';
+                    jouerSon('correct');
+                    confettis();
+                    setTimeout(() => {
+                        if (posees >= pack.questions) question();
+                        else { suivant.hidden = false; suivant.focus(); }
+                    }, 1500);
+                    return;
+                }
+                btn.classList.add('faux');
+                retour.textContent = 'Essaie encore ! Tu peux y arriver ! 💪';
+                retour.className = 'retour faux';
+                jouerSon('faux');
+                setTimeout(() => {
+                    btn.classList.remove('faux');
+                    retour.textContent = '';
+                }, 1000);
+            }
+        }
+
+        question();
+    }
+
+    // ========== QUIZ ==========
+
+    function quiz(pack) {
+        const jeu = el('div', 'panneau');
+        const score = el('div', 'info-label');
+        const enonce = el('div', 'question-texte');
+        const visuel = el('div', 'visuel');
+        const reponses = el('div', 'reponses' + (pack.choix ? ' cartes-choix' : ''));
+        const valider = bouton('btn btn-primaire', 'Valider ma réponse', () => corriger());
+        const retour = el('div', 'retour');
+        const suivant = bouton('btn btn-primaire', 'Suivant →', () => { indice++; question(); });
+        jeu.append(score, enonce, visuel, reponses, valider, retour, suivant);
+        zone.appendChild(jeu);
+
+        let indice = 0;
+        let points = 0;
+        let choisie = null;
+
+        function choixDe(q) {
+            if (pack.choix) return pack.choix;
+            // Bonne réponse + distracteurs tirés au hasard
+            const autres = melanger(pack.distracteurs.filter(nom => nom !== q.reponse));
+            return melanger([q.reponse, ...autres.slice(0, (pack.nombre_choix || 4) - 1)]).map(libelle => ({ libelle }));
+        }
+
+        function question() {
+            if (indice >= pack.questions.length) {
+                finDePartie({
+                    titre: 'Bravo !',
+                    message: pack.fin,
+                    note: etoiles(points / pack.questions.length),
+                    lignes: [['Score final', `${points} / ${pack.questions.length}`]],
+                    rejouer: () => { indice = 0; points = 0; question(); },
+                });
+                return;
+            }
+            const q = pack.questions[indice];
+            score.textContent = `Score : ${points} / ${pack.questions.length}`;
+            enonce.textContent = q.texte || pack.question;
+            visuel.textContent = q.visuel || '';
+            visuel.hidden = !q.visuel;
+            retour.textContent = '';
+            retour.className = 'retour';
+            valider.disabled = true;
+            valider.hidden = false;
+            suivant.hidden = true;
+            choisie = null;
+
+            reponses.replaceChildren(...choixDe(q).map(choix => {
+                const btn = bouton('reponse-btn', '', () => {
+                    reponses.querySelectorAll('button').forEach(b => b.classList.remove('choisie'));
+                    btn.classList.add('choisie');
+                    choisie = choix.libelle;
+                    valider.disabled = false;
+                });
+                if (choix.icone) btn.appendChild(el('span', 'reponse-icone', choix.icone));
+                btn.append(choix.libelle);
+                if (choix.description) btn.appendChild(el('span', 'reponse-description', choix.description));
+                return btn;
+            }));
+        }
+
+        function corriger() {
+            const q = pack.questions[indice];
+            const juste = choisie === q.reponse;
+            if (juste) points++;
+            score.textContent = `Score : ${points} / ${pack.questions.length}`;
+            reponses.querySelectorAll('button').forEach(b => { b.disabled = true; });
+            reponses.querySelector('.choisie').classList.add(juste ? 'correct' : 'faux');
+            retour.textContent = (juste ? '✅ ' : '❌ ') + remplir(juste ? pack.bravo : pack.rate, q);
+            retour.className = 'retour ' + (juste ? 'correct' : 'faux');
+            jouerSon(juste ? 'correct' : 'faux');
+            valider.hidden = true;
+            suivant.hidden = false;
+            suivant.focus();
+        }
+
+        question();
+    }
+
+    // ========== DÉMARRAGE ==========
+
+    const MOTEURS = { memory, compter, quiz };
+
+    // Même URL que le <link rel="preload"> : la réponse déjà en route est réutilisée
+    fetch(corps.dataset.pack, { credentials: 'same-origin' })
+        .then(reponse => {
+            if (!reponse.ok) throw new Error(reponse.status);
+            return reponse.json();
+        })
+        .then(pack => {
+            zone.replaceChildren();
+            MOTEURS[pack.moteur](pack);
+        })
+        .catch(() => {
+            zone.replaceChildren(el('p', 'chargement', '😕 Le jeu n\'a pas pu être chargé. Vérifie ta connexion et recharge la page.'));
+        });
+})();
@@ -0,0 +1,261 @@
+"""
+Suppressions différées des comptes, enfants et sujets du forum
+
+Un .delete() dans la requête fait charger par le collecteur de Django toutes les
+activités, notifications, messages, réactions, badges et abonnements liés, puis
+les supprime en une seule transaction. Ici :
+- demander_suppression() masque l'objet tout de suite (compte désactivé et renommé,
+  enfant / sujet marqué suppression_demandee et exclu par son manager par défaut)
+  et enregistre une SuppressionDifferee ;
+- un thread d'arrière-plan (ou la commande executer_suppressions) vide ensuite les
+  tables dépendantes, des feuilles vers l'objet, par lots de SUPPRESSIONS_LOT :
+  DELETE ... WHERE id IN (...), une transaction courte par lot ;
+- la progression (lignes supprimées / estimées par table) est affichée sur
+  /admin-dashboard/suppressions/.
+
+Les activités déjà archivées (archives_activites) sont retirées de leurs segments
+avant les tables.
+
+Les étapes sont idempotentes : une suppression interrompue (redémarrage) est
+reprise depuis le début par le prochain worker, sans erreur.
+"""
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import DatabaseError, IntegrityError, connections, models, router, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from comautis.arriere_plan import Travailleur
+from comautis.base_sqlite import ecriture_exclusive
+
+from . import archives_activites
+from .models import Enfant, SuppressionDifferee
+
+logger = logging.getLogger(__name__)
+
+PREFIXE_COMPTE_SUPPRIME = 'supprime-'
+ETATS_ACTIFS = ('attente', 'en_cours', 'erreur')
+
+# Nouvelles lignes dépendantes créées pendant la suppression (requête déjà en vol)
+ESSAIS = 3
+
+
+def get_lot():
+    return getattr(settings, 'SUPPRESSIONS_LOT', 500)
+
+
+def get_pause():
+    return getattr(settings, 'SUPPRESSIONS_PAUSE', 0.05)
+
+
+def get_reprise():
+    return getattr(settings, 'SUPPRESSIONS_REPRISE', 600)
+
+
+# ========== PLAN DE SUPPRESSION ==========
+
+@dataclass
+class Etape:
+    """Table à vider : lignes dont `chemin` mène à l'id de l'objet supprimé"""
+    modele: type
+    chemin: str
+    a_detacher: list = field(default_factory=list)  # [(modèle, champ)] en SET_NULL
+
+
+def plan(modele, chemin='pk', pile=()):
+    """Étapes de suppression d'un objet de `modele`, dépendants (feuilles) d'abord"""
+    etapes = []
+    a_detacher = []
+    for relation in modele._meta.get_fields(include_hidden=True):
+        # Mêmes relations que le collecteur de Django (FK et OneToOne inverses)
+        if not (relation.auto_created and not relation.concrete and (relation.one_to_one or relation.one_to_many)):
+            continue
+        dependant, on_delete = relation.related_model, relation.on_delete
+        if on_delete is models.CASCADE:
+            if dependant in pile or dependant is modele:
+                raise ValueError(f"Cycle de cascades : {dependant._meta.label}")
+            etapes += plan(dependant, f'{relation.field.name}__{chemin}', pile + (modele,))
+        elif on_delete is models.SET_NULL:
+            a_detacher.append((dependant, relation.field))
+        elif on_delete is not models.DO_NOTHING:
+            raise ValueError(f"{dependant._meta.label}.{relation.field.name} : on_delete non géré")
+    etapes.append(Etape(modele, chemin, a_detacher))
+    return etapes
+
+
+def lignes(etape, objet_id):
+    return etape.modele._base_manager.filter(**{etape.chemin: objet_id}).order_by()
+
+
+def estimer(etapes, objet_id):
+    """{table: lignes à supprimer} (une requête COUNT par étape)"""
+    estimees = {}
+    for etape in etapes:
+        label = etape.modele._meta.label
+        estimees[label] = estimees.get(label, 0) + lignes(etape, objet_id).count()
+    return estimees
+
+
+# ========== EXÉCUTION ==========
+
+def vider(etape, suppression):
+    """Supprime les lignes de l'étape par lots, une transaction par lot"""
+    modele = etape.modele
+    using = router.db_for_write(modele)
+    connexion = connections[using]
+    nom = connexion.ops.quote_name
+    lot = get_lot()
+
+    while True:
+        ids = list(lignes(etape, suppression.objet_id).values_list('pk', flat=True)[:lot])
+        if not ids:
+            return
+        marques = ', '.join(['%s'] * len(ids))
+        with ecriture_exclusive(using), transaction.atomic(using=using):
+            with connexion.cursor() as curseur:
+                for dependant, champ in etape.a_detacher:
+                    curseur.execute(
+                        f"UPDATE {nom(dependant._meta.db_table)} SET {nom(champ.column)} = NULL "
+                        f"WHERE {nom(champ.column)} IN ({marques})", ids,
+                    )
+                curseur.execute(
+                    f"DELETE FROM {nom(modele._meta.db_table)} WHERE {nom(modele._meta.pk.column)} IN ({marques})", ids,
+                )
+                supprimees = curseur.rowcount
+            label = modele._meta.label
+            suppression.supprimees[label] = suppression.supprimees.get(label, 0) + supprimees
+            suppression.save(update_fields=['supprimees', 'mis_a_jour'])
+        # Laisse passer les requêtes des utilisateurs entre deux lots
+        time.sleep(get_pause())
+
+
+def enfants_concernes(modele, objet_id):
+    """Ids des enfants dont l'historique part avec l'objet (enfant ou compte parent)"""
+    if modele is Enfant:
+        return [objet_id]
+    if modele is User:
+        return list(Enfant._base_manager.filter(parent_id=objet_id).values_list('pk', flat=True))
+    return []
+
+
+def executer(suppression):
+    """Exécute une suppression déjà prise en charge (etat en_cours)"""
+    modele = apps.get_model(suppression.modele)
+    etapes = plan(modele)
+    if not suppression.estimees:
+        suppression.estimees = estimer(etapes, suppression.objet_id)
+        suppression.save(update_fields=['estimees', 'mis_a_jour'])
+
+    # Archives froides d'abord : tant que les enfants existent, leurs ids sont connus
+    # (reprise comprise) ; archiver_activites n'archive plus leurs activités
+    retirees = archives_activites.retirer_enfants(enfants_concernes(modele, suppression.objet_id))
+    if retirees:
+        logger.info("%s : %s activités retirées des archives", suppression, retirees)
+
+    for essai in range(1, ESSAIS + 1):
+        try:
+            for etape in etapes:
+                vider(etape, suppression)
+            break
+        except IntegrityError:
+            # Ligne dépendante insérée entre le vidage d'une table et la suppression de son parent
+            if essai == ESSAIS:
+                raise
+
+    suppression.etat = 'terminee'
+    suppression.termine_le = timezone.now()
+    suppression.save(update_fields=['etat', 'termine_le', 'mis_a_jour'])
+
+
+def prendre_suivante(erreurs=False, exclure=()):
+    """Prend en charge la prochaine suppression en attente (ou abandonnée par un worker arrêté)"""
+    etats = Q(etat='attente') | Q(etat='en_cours', mis_a_jour__lt=timezone.now() - timedelta(seconds=get_reprise()))
+    if erreurs:
+        etats |= Q(etat='erreur')
+    candidates = SuppressionDifferee.objects.filter(etats).exclude(pk__in=exclure).order_by('id')
+    for pk in candidates.values_list('pk', flat=True)[:10]:
+        # UPDATE conditionnel : un seul worker gagne
+        with ecriture_exclusive():
+            prise = SuppressionDifferee.objects.filter(etats, pk=pk).update(
+                etat='en_cours', erreur='', mis_a_jour=timezone.now(),
+            )
+        if prise:
+            return SuppressionDifferee.objects.get(pk=pk)
+    return None
+
+
+def executer_en_attente(erreurs=False):
+    """Exécute les suppressions en attente ; renvoie le nombre de suppressions terminées"""
+    terminees = 0
+    essayees = set()
+    while (suppression := prendre_suivante(erreurs, exclure=essayees)) is not None:
+        essayees.add(suppression.pk)
+        try:
+            executer(suppression)
+            terminees += 1
+        except (DatabaseError, ValueError) as e:
+            logger.exception("Suppression %s interrompue", suppression)
+            SuppressionDifferee.objects.filter(pk=suppression.pk).update(
+                etat='erreur', erreur=str(e)[:1000], mis_a_jour=timezone.now(),
+            )
+    return terminees
+
+
+# ========== DEMANDE ==========
+
+def masquer(objet):
+    """Rend l'objet invisible immédiatement (une requête UPDATE)"""
+    if isinstance(objet, User):
+        # Plus de connexion possible (sessions comprises), nom d'utilisateur libéré
+        User.objects.filter(pk=objet.pk).update(
+            is_active=False, username=f'{PREFIXE_COMPTE_SUPPRIME}{objet.pk}', email='', password=make_password(None),
+        )
+    else:
+        type(objet)._base_manager.filter(pk=objet.pk).update(suppression_demandee=True)
+
+
+def demander_suppression(objet, demandee_par=None):
+    """Masque l'objet et programme la suppression de ses données"""
+    libelle = objet.get_username() if isinstance(objet, User) else str(objet)
+    with ecriture_exclusive(), transaction.atomic():
+        masquer(objet)
+        suppression = SuppressionDifferee.objects.create(
+            modele=objet._meta.label_lower, objet_id=objet.pk, libelle=libelle[:200],
+            demandee_par=demandee_par if demandee_par and demandee_par.pk != objet.pk else None,
+        )
+    transaction.on_commit(travailleur.reveiller)
+    return suppression
+
+
+def demander_suppressions(modele, ids, demandee_par=None):
+    """demander_suppression pour un lot d'enfants ou de sujets : un UPDATE et un INSERT ; renvoie le nombre masqué"""
+    with ecriture_exclusive(), transaction.atomic():
+        objets = list(modele._base_manager.filter(pk__in=ids, suppression_demandee=False))
+        modele._base_manager.filter(pk__in=[objet.pk for objet in objets]).update(suppression_demandee=True)
+        SuppressionDifferee.objects.bulk_create(
+            SuppressionDifferee(
+                modele=modele._meta.label_lower, objet_id=objet.pk, libelle=str(objet)[:200], demandee_par=demandee_par,
+            )
+            for objet in objets
+        )
+    transaction.on_commit(travailleur.reveiller)
+    return len(objets)
+
+
+def en_suppression(modele):
+    """Sous-requête des ids en cours de suppression, pour les exclure : .exclude(pk__in=...)"""
+    return SuppressionDifferee.objects.filter(
+        modele=modele._meta.label_lower, etat__in=ETATS_ACTIFS,
+    ).values('objet_id')
+
+
+# ========== TRAVAILLEUR ==========
+
+travailleur = Travailleur('suppressions', executer_en_attente, intervalle=get_reprise)
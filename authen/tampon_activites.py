@@ -0,0 +1,268 @@
+"""
+Tampon d'écriture des activités envoyées par auto_tracker.js
+
+Chaque navigation entre deux jeux produit un début, puis une ou plusieurs fins
+(inactivité, sendBeacon au départ de la page). Au lieu d'une écriture par
+événement, les événements sont regroupés en mémoire et écrits toutes les
+ACTIVITES_TAMPON_INTERVALLE secondes en une transaction :
+- un début et sa fin arrivés dans la même fenêtre : un seul INSERT ;
+- plusieurs fins de la même session : seule la dernière est écrite, et une fin
+  identique à celle déjà écrite est ignorée ;
+- les fins sont des upserts sur Activite.session : peu importe quel worker a
+  reçu le début, ni s'il l'a déjà écrit.
+
+Le jeton renvoyé au navigateur (activite_id) est signé et contient la session,
+l'enfant, le jeu et l'heure de début : n'importe quel worker peut traiter la fin.
+
+Hors ligne, auto_tracker.js garde ses événements et les rejoue au retour du
+réseau avec leur heure réelle (debut / fin, millisecondes) : bornée entre
+ACTIVITES_REJEU_DUREE_MAX et maintenant, l'activité garde sa date du jour.
+"""
+import atexit
+import logging
+import threading
+import uuid
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.db import DatabaseError, IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from comautis.base_sqlite import ecriture_exclusive
+
+from .models import Activite, Enfant
+
+logger = logging.getLogger(__name__)
+
+SEL_JETON = 'authen.activite'
+CHAMPS_FIN = ['date_fin', 'duree_minutes', 'score', 'reussi']
+
+# Fins déjà écrites gardées en mémoire pour ignorer les doublons
+FINS_MEMORISEES = 10000
+
+
+def get_intervalle():
+    return getattr(settings, 'ACTIVITES_TAMPON_INTERVALLE', 1.0)
+
+
+def get_maximum():
+    return getattr(settings, 'ACTIVITES_TAMPON_MAX', 500)
+
+
+def get_duree_max():
+    return getattr(settings, 'ACTIVITES_SESSION_DUREE_MAX', 12 * 3600)
+
+
+def get_rejeu_max():
+    return getattr(settings, 'ACTIVITES_REJEU_DUREE_MAX', 7 * 24 * 3600)
+
+
+# ========== JETON DE SESSION ==========
+
+def creer_jeton(user, session, enfant_id, jeu, debut):
+    return signing.dumps(
+        {'s': session.hex, 'u': user.pk, 'e': enfant_id, 'j': jeu, 't': debut.timestamp()},
+        salt=SEL_JETON, compress=True,
+    )
+
+
+def lire_jeton(jeton, user):
+    """Contenu du jeton s'il est valide et appartient à l'utilisateur, sinon None"""
+    try:
+        donnees = signing.loads(
+            jeton, salt=SEL_JETON, max_age=get_duree_max(),
+        )
+    except (signing.BadSignature, TypeError):
+        return None
+    if donnees.get('u') != user.pk:
+        return None
+    return {
+        'session': uuid.UUID(donnees['s']),
+        'enfant_id': donnees['e'],
+        'jeu': donnees['j'],
+        'debut': datetime.fromtimestamp(donnees['t'], tz=dt_timezone.utc),
+    }
+
+
+# ========== TAMPON ==========
+
+class TamponActivites:
+    """Débuts et fins en attente, écrits par lots (un par process)"""
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._debuts = {}  # session -> Activite à insérer
+        self._fins = {}  # session -> Activite à insérer ou compléter
+        self._fins_ecrites = OrderedDict()  # session -> (duree, score, reussi)
+        self._reveil = threading.Event()
+        self._thread = None
+        self.statistiques = Counter()
+
+    def __len__(self):
+        with self._verrou:
+            return len(self._debuts) + len(self._fins)
+
+    # date_debut = heure de début du jeton (et non l'heure d'écriture du lot)
+
+    def debut(self, session, enfant_id, jeu, debut):
+        with self._verrou:
+            self.statistiques['evenements'] += 1
+            if session not in self._fins:
+                self._debuts[session] = Activite(
+                    session=session, enfant_id=enfant_id, jeu=jeu, date_debut=debut, duree_minutes=0,
+                )
+
+    def fin(self, session, enfant_id, jeu, debut, fin, score=None, reussi=True):
+        duree = max(0, int((fin - debut).total_seconds() / 60))
+        with self._verrou:
+            self.statistiques['evenements'] += 1
+            if self._fins_ecrites.get(session) == (duree, score, reussi):
+                self.statistiques['doublons'] += 1
+                return
+            # Début encore en attente : fusionné avec la fin en un seul INSERT
+            self._debuts.pop(session, None)
+            if session in self._fins:
+                self.statistiques['doublons'] += 1
+            self._fins[session] = Activite(
+                session=session, enfant_id=enfant_id, jeu=jeu, date_debut=debut,
+                date_fin=fin, duree_minutes=duree, score=score, reussi=reussi,
+            )
+
+    def vider(self):
+        """Écrit les événements en attente en une transaction ; renvoie le nombre d'activités écrites"""
+        with self._verrou:
+            debuts, self._debuts = self._debuts, {}
+            fins, self._fins = self._fins, {}
+        if not debuts and not fins:
+            return 0
+
+        try:
+            try:
+                self._ecrire(debuts, fins)
+            except IntegrityError:
+                # Enfant supprimé entre l'événement et l'écriture : ses événements
+                # sont écartés, les autres écrits (sans quoi le lot échouerait à chaque essai)
+                self._ecarter_enfants_supprimes(debuts, fins)
+                self._ecrire(debuts, fins)
+        except IntegrityError:
+            logger.exception("Lot de %s activités refusé par la base, abandonné", len(debuts) + len(fins))
+            self.statistiques['activites_abandonnees'] += len(debuts) + len(fins)
+            return 0
+        except DatabaseError:
+            logger.exception("Écriture de %s activités impossible, nouvel essai au prochain lot", len(debuts) + len(fins))
+            self.remettre(debuts, fins)
+            return 0
+
+        with self._verrou:
+            for session, activite in fins.items():
+                self._fins_ecrites[session] = (activite.duree_minutes, activite.score, activite.reussi)
+                self._fins_ecrites.move_to_end(session)
+            while len(self._fins_ecrites) > FINS_MEMORISEES:
+                self._fins_ecrites.popitem(last=False)
+            self.statistiques['transactions'] += 1
+            self.statistiques['activites_ecrites'] += len(debuts) + len(fins)
+        return len(debuts) + len(fins)
+
+    def _ecrire(self, debuts, fins):
+        with ecriture_exclusive(), transaction.atomic():
+            if debuts:
+                # Fin déjà écrite par un autre worker : le début n'écrase rien
+                Activite.objects.bulk_create(debuts.values(), ignore_conflicts=True)
+            if fins:
+                Activite.objects.bulk_create(
+                    fins.values(), update_conflicts=True, unique_fields=['session'], update_fields=CHAMPS_FIN,
+                )
+
+    def _ecarter_enfants_supprimes(self, debuts, fins):
+        """Retire (sur place) les événements des enfants qui n'existent plus"""
+        ids = {activite.enfant_id for activite in [*debuts.values(), *fins.values()]}
+        existants = set(Enfant.objects.filter(id__in=ids).values_list('id', flat=True))
+        ecartes = 0
+        for evenements in (debuts, fins):
+            for session in [s for s, activite in evenements.items() if activite.enfant_id not in existants]:
+                del evenements[session]
+                ecartes += 1
+        if ecartes:
+            logger.warning("%s activités d'enfants supprimés écartées (enfants %s)", ecartes, sorted(ids - existants))
+            self.statistiques['activites_abandonnees'] += ecartes
+
+    def remettre(self, debuts, fins):
+        """Remet un lot en échec dans le tampon sans écraser les événements plus récents"""
+        with self._verrou:
+            for session, activite in fins.items():
+                self._fins.setdefault(session, activite)
+                self._debuts.pop(session, None)
+            for session, activite in debuts.items():
+                if session not in self._fins:
+                    self._debuts.setdefault(session, activite)
+
+    # ========== ÉCRITURE PÉRIODIQUE ==========
+
+    def planifier(self):
+        """Après un événement : écriture immédiate (intervalle 0), sinon par le thread d'écriture"""
+        if get_intervalle() <= 0:
+            self.vider()
+            return
+        if self._thread is None:
+            with self._verrou:
+                if self._thread is None:
+                    # Démarré à la première requête : jamais dans le master gunicorn avant le fork
+                    self._thread = threading.Thread(target=self.boucle, daemon=True, name='tampon-activites')
+                    self._thread.start()
+                    atexit.register(self.vider)
+        if len(self) >= get_maximum():
+            self._reveil.set()
+
+    def boucle(self):
+        while True:
+            self._reveil.wait(get_intervalle())
+            self._reveil.clear()
+            close_old_connections()
+            try:
+                self.vider()
+            except Exception:
+                logger.exception("Erreur du thread d'écriture des activités")
+
+
+tampon = TamponActivites()
+
+
+# ========== API ==========
+
+def lire_horodatage(valeur):
+    """
+    Heure envoyée par le navigateur (millisecondes depuis 1970) pour un événement rejoué
+    None si absente ; ValueError si invalide ou plus ancienne que ACTIVITES_REJEU_DUREE_MAX
+    """
+    if valeur is None:
+        return None
+    maintenant = timezone.now()
+    try:
+        moment = datetime.fromtimestamp(float(valeur) / 1000, tz=dt_timezone.utc)
+    except (OverflowError, OSError):  # 1e400, ou hors de la plage de la plateforme
+        raise ValueError("Horodatage hors limites")
+    if moment < maintenant - timedelta(seconds=get_rejeu_max()):
+        raise ValueError("Événement trop ancien")
+    # Horloge de la tablette en avance : ramenée à maintenant
+    return min(moment, maintenant)
+
+
+def enregistrer_debut(user, enfant_id, jeu, debut=None):
+    """Début d'une session de jeu ; renvoie le jeton à renvoyer avec la fin"""
+    session, debut = uuid.uuid4(), debut or timezone.now()
+    tampon.debut(session, enfant_id, jeu, debut)
+    tampon.planifier()
+    return creer_jeton(user, session, enfant_id, jeu, debut)
+
+
+def enregistrer_fin(user, jeton, score=None, reussi=True, fin=None):
+    """Fin d'une session (False si le jeton est invalide ou expiré)"""
+    session = lire_jeton(jeton, user)
+    if session is None:
+        return False
+    fin = max(fin, session['debut']) if fin else timezone.now()
+    tampon.fin(fin=fin, score=score, reussi=reussi, **session)
+    tampon.planifier()
+    return True
@@ -0,0 +1,113 @@
+{% autoescape off %}/* Service worker ComAutiste : jeux disponibles hors ligne (authen/hors_ligne.py)
+   Manifest de précache généré par python manage.py generer_precache */
+'use strict';
+
+// Change avec le manifest : le navigateur voit un nouveau script et installe ce worker
+const VERSION = '{{ version }}';
+const PRECACHE = {{ manifest }};
+const PAGE_REPLI = {{ page_repli }};
+const CACHE = 'comautis-jeux';
+// Réseau trop lent pour une page : la version en cache est servie
+const DELAI_RESEAU_MS = 4000;
+
+// URL (chemin + paramètres) -> clé dans le cache ; la révision fait partie de la clé
+const CLES = new Map(PRECACHE.map(({ url, revision }) => [
+    url,
+    revision ? url + (url.includes('?') ? '&' : '?') + '__revision=' + revision : url,
+]));
+
+function cheminDe(requete) {
+    const url = new URL(requete.url);
+    return url.origin === self.location.origin ? url.pathname + url.search : null;
+}
+
+// Télécharge seulement les entrées absentes du cache : d'une version à l'autre,
+// les statiques hachés inchangés gardent la même clé et ne sont pas retéléchargés
+async function completer() {
+    const cache = await caches.open(CACHE);
+    const presentes = new Set((await cache.keys()).map(requete => cheminDe(requete)));
+    const manquantes = [...CLES].filter(([, cle]) => !presentes.has(cle));
+    await Promise.all(manquantes.map(async ([url, cle]) => {
+        try {
+            // Page ou statique non haché : revalidé auprès du serveur, pas pris dans le cache HTTP
+            const reponse = await fetch(url, { credentials: 'same-origin', cache: cle === url ? 'default' : 'no-cache' });
+            // Page redirigée (session expirée) ou erreur : retentée au prochain passage
+            if (reponse.ok && !reponse.redirected) await cache.put(cle, reponse);
+        } catch (erreur) {
+            // Hors ligne pendant l'installation : idem
+        }
+    }));
+    return manquantes.length;
+}
+
+// Retire ce que le nouveau manifest ne contient plus
+async function nettoyer() {
+    const attendues = new Set(CLES.values());
+    const cache = await caches.open(CACHE);
+    for (const requete of await cache.keys()) {
+        if (!attendues.has(cheminDe(requete))) await cache.delete(requete);
+    }
+}
+
+self.addEventListener('install', event => {
+    event.waitUntil(completer().then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(nettoyer().then(() => self.clients.claim()));
+});
+
+// Envoyé par la page au retour du réseau : rattrape les entrées manquées
+self.addEventListener('message', event => {
+    if (event.data && event.data.type === 'completer') event.waitUntil(completer());
+});
+
+async function depuisCache(cle) {
+    const cache = await caches.open(CACHE);
+    return cache.match(cle);
+}
+
+async function reseauPuisCache(requete, cle) {
+    const reseau = fetch(requete).then(async reponse => {
+        if (reponse.ok && !reponse.redirected) {
+            const cache = await caches.open(CACHE);
+            await cache.put(cle, reponse.clone());
+        }
+        return reponse;
+    });
+    reseau.catch(() => null);  // réponse du cache déjà servie : l'échec réseau est attendu
+    const delai = new Promise(resolve => setTimeout(resolve, DELAI_RESEAU_MS));
+    try {
+        const reponse = await Promise.race([reseau, delai.then(() => depuisCache(cle))]);
+        return reponse || await reseau;
+    } catch (erreur) {
+        return (await depuisCache(cle)) || Response.error();
+    }
+}
+
+self.addEventListener('fetch', event => {
+    const requete = event.request;
+    if (requete.method !== 'GET') return;  // API d'activités : file d'auto_tracker.js
+    const chemin = cheminDe(requete);
+    if (chemin === null) return;
+
+    const cle = CLES.get(chemin);
+    if (cle !== undefined) {
+        const entree = cle === chemin
+            // URL versionnée (nom haché, pack ?v=) : le cache suffit
+            ? depuisCache(cle).then(reponse => reponse || fetch(requete))
+            // Page : la plus récente si le réseau répond, sinon celle du cache
+            : reseauPuisCache(requete, cle);
+        event.respondWith(entree);
+        return;
+    }
+
+    // Autre page hors ligne : la liste des jeux
+    if (requete.mode === 'navigate') {
+        event.respondWith(fetch(requete).catch(async () => {
+            const repli = CLES.has(PAGE_REPLI) ? await depuisCache(CLES.get(PAGE_REPLI)) : null;
+            return repli || Response.error();
+        }));
+    }
+});
+{% endautoescape %}
\ No newline at end of file
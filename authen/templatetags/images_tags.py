@@ -0,0 +1,41 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from authen import images_manager
+
+register = template.Library()
+
+
+@register.simple_tag
+def image_url(chemin, largeur=None):
+    """
+    URL de la variante WebP adaptée à une largeur d'affichage
+    Ex : {% image_url 'images/histoires/1.jpg' 640 %} (pour les fonds CSS et le JS)
+    """
+    return images_manager.url_image(chemin, int(largeur) if largeur else None)
+
+
+@register.simple_tag
+def responsive_img(chemin, alt='', sizes='100vw', **attributs):
+    """
+    Balise <img> avec srcset, dimensions intrinsèques et chargement différé
+    Ex : {% responsive_img 'images/jeux/fruits/apple.png' alt='Pomme' sizes='150px' class='fruit' %}
+    """
+    entree = images_manager.get_image(chemin)
+    extra = format_html_join('', ' {}="{}"', attributs.items())
+
+    if not entree or not entree['variantes']:
+        return format_html(
+            '<img src="{}" alt="{}" loading="lazy" decoding="async"{}>',
+            static(chemin), alt, extra,
+        )
+
+    variantes = entree['variantes']
+    srcset = ', '.join(f"{static(v['chemin'])} {v['largeur']}w" for v in variantes)
+    return format_html(
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}" '
+        'loading="lazy" decoding="async"{}>',
+        static(variantes[-1]['chemin']), srcset, sizes,
+        entree['largeur'], entree['hauteur'], alt, extra,
+    )
@@ -0,0 +1,11 @@
+from django import template
+
+from authen.photos_manager import url_miniature
+
+register = template.Library()
+
+
+@register.filter
+def miniature(champ_photo, taille='carte'):
+    """URL de la miniature d'une photo, ex : {{ enfant.photo|miniature:'carte' }}"""
+    return url_miniature(champ_photo, taille)
@@ -0,0 +1,20 @@
+from django import template
+from django.utils.html import format_html_join
+
+from authen.preferences import AFFICHAGE
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def attributs_preferences(context):
+    """
+    Préférences d'affichage et de son en attributs data- pour le CSS et le JavaScript
+    Ex : <body {% attributs_preferences %}> → data-theme="sombre" data-sons-jeux="1" ...
+    """
+    preferences = context['preferences']
+    valeurs = ((champ, getattr(preferences, champ)) for champ in AFFICHAGE)
+    return format_html_join(
+        ' ', 'data-{}="{}"',
+        ((champ.replace('_', '-'), int(valeur) if isinstance(valeur, bool) else valeur) for champ, valeur in valeurs),
+    )
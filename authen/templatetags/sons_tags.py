@@ -0,0 +1,42 @@
+import json
+
+from django import template
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+
+from authen import sons_manager
+
+register = template.Library()
+
+
+@register.simple_tag
+def son_url(cle):
+    """URL de la meilleure variante d'un son, ex : {% son_url 'animaux/horse' %}"""
+    urls = sons_manager.urls_son(cle)
+    return urls[0]['url'] if urls else ''
+
+
+@register.simple_tag
+def son_sources(cle):
+    """Balises <source> pour un <audio>, de la variante la plus légère à l'original"""
+    return format_html_join(
+        '\n', '<source src="{}"{}>',
+        (
+            (u['url'], format_html(' type="{}"', u['mime']) if u['mime'] else '')
+            for u in sons_manager.urls_son(cle)
+        ),
+    )
+
+
+@register.simple_tag
+def sons_json(*cles):
+    """
+    Table {clé: [variantes]} pour le JavaScript des pages de sons
+    Sans argument, retourne tous les sons connus
+    """
+    if not cles:
+        cles = sons_manager.lister_sources().keys()
+    data = {cle: sons_manager.urls_son(cle) for cle in cles}
+    # Échapper les caractères HTML pour une insertion sûre dans un <script>
+    texte = json.dumps(data).replace('<', '\\u003c').replace('>', '\\u003e').replace('&', '\\u0026')
+    return mark_safe(texte)
@@ -1,3 +1,1482 @@
-from django.test import TestCase
+import gzip
+import json
+import logging
+import re
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from contextvars import Context
+from datetime import date, timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from authen import (
+    actions_groupees, activity_tracker, archives_activites, hors_ligne, images_manager, jeux_packs, photos_manager,
+    sons_manager, suppressions,
+)
+from authen.models import (
+    ActionGroupee, Activite, Badge, Enfant, Notification, ResumeActivitesMois, SuppressionDifferee, UserBadge,
+    UserPreferences, UserProfile,
+)
+from authen.suppressions import demander_suppression, executer_en_attente
+from authen.tampon_activites import TamponActivites
+from comautis import base_sqlite, memoire, profilage, replique, requetes_lentes
+from comautis.arriere_plan import Travailleur
+from comautis.demarrage import reprendre_taches
+from comautis.fichiers_statiques import ServeurStatiqueMiddleware, encodages_acceptes
+from comautis.journaux import JournalPartage
+from comautis.limitation import get_limites
+from comautis.scenarios_vues import (
+    BUDGETS_REQUETES, CompteurRequetes, construire_url, executer, get_scenario, lister_vues,
+    preparer_contexte, statut_attendu,
+)
+from forum.models import Post, Reaction, Topic
+from paiement.models import Level, Subscription
+
+# Gabarits absents de l'arbre (paiement, users_list) : versions minimales qui
+# parcourent les mêmes objets, pour mesurer les requêtes des vues et de leurs relations
+GABARITS_ABSENTS = {
+    'authen/users_list.html': '{% for u in users %}{{ u.username }}{% endfor %}{{ total_users }}',
+    'paiement/levels.html': '{% for level in levels %}{{ level.name }} {{ level.price }}{% endfor %}',
+    'paiement/already_subscribed.html': '{{ level.name }}',
+    'paiement/subscribed.html': '{{ level.name }}',
+    'paiement/pay_level.html': '{{ level.name }}{% for e in errors %}{{ e }}{% endfor %}',
+    'paiement/payment_success.html': '{{ level.name }} {{ payment_id }} {{ payment_method_name }}',
+    'paiement/my_subscriptions.html': (
+        '{% for s in active_subscriptions %}{{ s.level.name }}{% endfor %}'
+        '{% for s in inactive_subscriptions %}{{ s.level.name }}{% endfor %}'
+    ),
+    'paiement/cancel_subscription.html': '{{ subscription.level.name }}',
+    'paiement/change_level.html': (
+        '{{ current_subscription.level.name }}{% for level in available_levels %}{{ level.name }}{% endfor %}'
+    ),
+    'paiement/level_changed.html': '{{ new_level.name }}',
+}
+
+TEMPLATES_TESTS = [{
+    **settings.TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **settings.TEMPLATES[0]['OPTIONS'],
+        'loaders': [
+            ('django.template.loaders.locmem.Loader', GABARITS_ABSENTS),
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ],
+    },
+}]
+
+
+def image_jpeg(largeur=800, hauteur=600):
+    """Fichier JPEG uploadé, généré en mémoire"""
+    from PIL import Image
+    tampon = BytesIO()
+    Image.new('RGB', (largeur, hauteur), (200, 80, 40)).save(tampon, 'JPEG')
+    return SimpleUploadedFile('photo.jpg', tampon.getvalue(), content_type='image/jpeg')
+
+
+class PhotosTests(TestCase):
+    """Photos réduites à l'upload et miniatures servies à la famille seulement"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.parent = User.objects.create_user('parent_photos')
+        cls.autre = User.objects.create_user('autre_photos')
+
+    def setUp(self):
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        reglages = override_settings(MEDIA_ROOT=dossier.name)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        self.client = Client(HTTP_HOST='localhost')
+        self.client.force_login(self.parent)
+
+    def formulaire(self, photo):
+        return {
+            'prenom': 'Léo', 'nom': 'Martin', 'date_naissance': '2018-05-04', 'genre': 'M',
+            'niveau_autonomie': 'moyen', 'photo': photo,
+        }
+
+    def test_miniature_generee_pour_la_famille_seulement(self):
+        self.client.post('/ajouter-enfant/', self.formulaire(image_jpeg(3000, 2000)))
+        enfant = Enfant.objects.get(parent=self.parent)
+        self.assertTrue(enfant.photo.name.endswith('.jpg'))
+        self.assertEqual(enfant.photo.width, 1600)
+
+        url = photos_manager.url_miniature(enfant.photo, 'carte')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        from PIL import Image
+        self.assertEqual(Image.open(BytesIO(b''.join(response.streaming_content))).size, (160, 160))
+
+        # Autre famille : nom de fichier connu, mais pas sa photo
+        self.client.force_login(self.autre)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(photos_manager.url_miniature(enfant.photo, 'grande')).status_code, 404)
+
+    def test_fichier_qui_n_est_pas_une_image(self):
+        texte = SimpleUploadedFile('photo.jpg', b'pas une image', content_type='image/jpeg')
+        response = self.client.post('/ajouter-enfant/', self.formulaire(texte))
+        self.assertContains(response, 'pas pu être lue')
+        self.assertContains(response, 'value="Léo"')
+        self.assertFalse(Enfant.objects.exists())
+
+        # Photo illisible déjà sur disque (ancien upload) : 404 et non 500
+        enfant = Enfant.objects.create(parent=self.parent, prenom='Zoé', nom='Roy', date_naissance=date(2017, 1, 1))
+        enfant.photo.save('ancienne.jpg', ContentFile(b'corrompue'))
+        response = self.client.get(photos_manager.url_miniature(enfant.photo, 'icone'))
+        self.assertEqual(response.status_code, 404)
+
+
+class ImagesResponsivesTests(TestCase):
+    def test_srcset_dimensions_et_chargement_differe(self):
+        parent = User.objects.create_user('parent_images')
+        enfant = Enfant.objects.create(parent=parent, prenom='Léo', nom='Martin', date_naissance=date(2018, 5, 4))
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(parent)
+        variantes = [
+            {'largeur': largeur, 'hauteur': largeur * 2 // 3, 'chemin': f'images_optimisees/coloriages/roi.{largeur}.abc.webp'}
+            for largeur in (320, 640)
+        ]
+        manifest = {'images/coloriages/roi.jpg': {'largeur': 1200, 'hauteur': 800, 'variantes': variantes}}
+        with mock.patch.object(images_manager, 'get_manifest', return_value=manifest):
+            response = client.get(f'/enfant/{enfant.id}/dessiner/')
+
+        self.assertContains(response, 'roi.320.abc.webp 320w, ')
+        self.assertContains(response, 'width="1200" height="800"')
+        # Images sans variantes (manifest absent) : original, toujours différé
+        self.assertContains(response, 'loading="lazy"', count=10)
+        self.assertNotContains(response, 'background-image')
+
+
+class ManifestsStatiquesTests(TestCase):
+    """optimiser_images et transcoder_sons sur un dossier temporaire"""
+
+    def setUp(self):
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        self.dossier = Path(dossier.name)
+
+    def deplacer(self, module, **chemins):
+        for nom, chemin in chemins.items():
+            self.enterContext(mock.patch.object(module, nom, chemin))
+
+    def test_optimiser_images(self):
+        from PIL import Image
+        images, sortie = self.dossier / 'images', self.dossier / 'images_optimisees'
+        (images / 'jeux').mkdir(parents=True)
+        Image.new('RGB', (400, 300), (10, 20, 30)).save(images / 'jeux' / 'pomme.png')
+        Image.new('RGB', (100, 80), (200, 20, 30)).save(images / 'poire.jpg')
+        self.deplacer(images_manager, IMAGES_DIR=images, IMAGES_OPTIMISEES_DIR=sortie, MANIFEST_PATH=sortie / 'manifest.json')
+
+        call_command('optimiser_images', largeurs='160,320', workers=1, stdout=StringIO())
+        manifest = images_manager.get_manifest()
+        self.assertEqual(sorted(manifest), ['images/jeux/pomme.png', 'images/poire.jpg'])
+        pomme = manifest['images/jeux/pomme.png']
+        self.assertEqual((pomme['largeur'], pomme['hauteur']), (400, 300))
+        self.assertEqual([v['largeur'] for v in pomme['variantes']], [160, 320])
+        # Plus étroite que les largeurs demandées : une seule variante, à sa taille
+        self.assertEqual([v['largeur'] for v in manifest['images/poire.jpg']['variantes']], [100])
+        for variante in pomme['variantes']:
+            self.assertTrue((self.dossier / variante['chemin']).exists())
+
+        # Sources inchangées : rien n'est régénéré
+        sortie_commande = StringIO()
+        call_command('optimiser_images', largeurs='160,320', workers=1, stdout=sortie_commande)
+        self.assertIn('0 image(s) optimisée(s)', sortie_commande.getvalue())
+
+        # Source supprimée : entrée et variantes retirées
+        (images / 'poire.jpg').unlink()
+        call_command('optimiser_images', largeurs='160,320', workers=1, stdout=StringIO())
+        self.assertEqual(sorted(images_manager.get_manifest()), ['images/jeux/pomme.png'])
+        self.assertEqual(len(list(sortie.rglob('*.webp'))), 2)
+
+    def preparer_sons(self):
+        sons, sortie = self.dossier / 'sons', self.dossier / 'sons_compresses'
+        (sons / 'animaux').mkdir(parents=True)
+        (sons / 'animaux' / 'cheval.wav').write_bytes(b'RIFF cheval')
+        self.deplacer(sons_manager, SONS_DIR=sons, SONS_COMPRESSES_DIR=sortie, MANIFEST_PATH=sortie / 'manifest.json')
+        return sortie
+
+    def test_transcoder_sons(self):
+        sortie = self.preparer_sons()
+
+        def ffmpeg_factice(source, destination, format_nom, debit):
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            destination.write_bytes(source.read_bytes() + debit.encode())
+
+        with mock.patch.object(sons_manager, 'transcoder', ffmpeg_factice):
+            call_command('transcoder_sons', stdout=StringIO())
+            entree = sons_manager.get_manifest()['animaux/cheval']
+            self.assertEqual(entree['source'], 'sons/animaux/cheval.wav')
+            self.assertEqual(sorted(entree['variantes']), ['mp3', 'opus'])
+
+            sortie_commande = StringIO()
+            call_command('transcoder_sons', stdout=sortie_commande)
+            self.assertIn('0 son(s) transcodé(s)', sortie_commande.getvalue())
+
+            # Débit changé : nouvelle variante, l'ancienne est supprimée
+            ancienne = self.dossier / entree['variantes']['opus']['chemin']
+            call_command('transcoder_sons', debit=['opus=32k'], stdout=StringIO())
+            self.assertFalse(ancienne.exists())
+        self.assertEqual(len([f for f in sortie.rglob('*') if f.is_file()]), 3)  # 2 variantes + manifest
+
+    def test_echec_ffmpeg(self):
+        sortie = self.preparer_sons()
+
+        def ffmpeg_en_echec(source, destination, format_nom, debit):
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            destination.write_bytes(b'partiel')
+            raise subprocess.CalledProcessError(1, ['ffmpeg'])
+
+        with mock.patch.object(sons_manager, 'transcoder', ffmpeg_en_echec), \
+                self.assertRaisesMessage(CommandError, 'ffmpeg a échoué'):
+            call_command('transcoder_sons', stdout=StringIO())
+        self.assertEqual([f for f in sortie.rglob('*') if f.is_file()], [])
+
+    def test_sans_ffmpeg(self):
+        sortie = self.preparer_sons()
+        with mock.patch.object(sons_manager, 'get_ffmpeg', return_value=None):
+            with self.assertRaisesMessage(CommandError, 'ffmpeg est introuvable'):
+                call_command('transcoder_sons', stdout=StringIO())
+
+            # Build sans ffmpeg : avertissement, aucun manifest, l'original est servi
+            erreurs = StringIO()
+            call_command('transcoder_sons', ignorer_sans_ffmpeg=True, stdout=StringIO(), stderr=erreurs)
+        self.assertIn('originaux restent servis', erreurs.getvalue())
+        self.assertFalse(sortie.exists())
+        self.assertEqual([son['url'] for son in sons_manager.urls_son('animaux/cheval')], ['/static/sons/animaux/cheval.wav'])
+
+
+class ServeurStatiqueTests(SimpleTestCase):
+    """Statiques servis par l'application : variantes compressées, Range, 304"""
+
+    def setUp(self):
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        self.racine = Path(dossier.name)
+        (self.racine / 'sons').mkdir()
+        (self.racine / 'sons' / 'histoire.0123456789ab.mp3').write_bytes(b'0123456789')
+        (self.racine / 'app.js').write_bytes(b'console.log(1);' * 10)
+        (self.racine / 'app.js.gz').write_bytes(gzip.compress(b'console.log(1);' * 10))
+        self.enterContext(override_settings(STATIC_ROOT=dossier.name))
+        self.middleware = ServeurStatiqueMiddleware(lambda request: HttpResponse('vue', status=404))
+
+    def get(self, chemin, **en_tetes):
+        response = self.middleware(RequestFactory().get(settings.STATIC_URL + chemin, **en_tetes))
+        self.addCleanup(response.close)
+        return response
+
+    @staticmethod
+    def contenu(response):
+        return b''.join(response.streaming_content)
+
+    def test_lire_plage(self):
+        lire = ServeurStatiqueMiddleware.lire_plage
+        self.assertEqual(lire('bytes=0-3', 10), (0, 3))
+        self.assertEqual(lire('bytes=4-', 10), (4, 9))
+        self.assertEqual(lire('bytes=-3', 10), (7, 9))
+        self.assertEqual(lire('bytes=-30', 10), (0, 9))
+        self.assertEqual(lire('bytes=5-999', 10), (5, 9))
+        for plage in ('bytes=-0', 'bytes=6-2', 'bytes=10-', 'bytes=0-1,4-5', 'lignes=0-3', 'bytes=-'):
+            with self.subTest(plage=plage):
+                self.assertEqual(lire(plage, 10), (None, None))
+        self.assertEqual(lire('bytes=0-3', 0), (None, None))
+
+    def test_requete_range(self):
+        response = self.get('sons/histoire.0123456789ab.mp3', HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.contenu(response), b'2345')
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(response['Content-Length'], '4')
+        self.assertIn('immutable', response['Cache-Control'])
+
+        response = self.get('sons/histoire.0123456789ab.mp3', HTTP_RANGE='bytes=20-30')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+        # Range : octets de l'original, jamais de la variante compressée
+        response = self.get('app.js', HTTP_RANGE='bytes=0-6', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(self.contenu(response), b'console')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_variante_compressee_et_304(self):
+        response = self.get('app.js', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+        self.assertEqual(gzip.decompress(self.contenu(response)), b'console.log(1);' * 10)
+        etag = response['ETag']
+
+        self.assertEqual(self.get('app.js', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # L'ETag dépend de la variante : l'original n'est pas « non modifié »
+        self.assertEqual(self.get('app.js', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.get('app.js', HTTP_IF_NONE_MATCH='*').status_code, 304)
+
+        derniere = self.get('app.js')['Last-Modified']
+        self.assertEqual(self.get('app.js', HTTP_IF_MODIFIED_SINCE=derniere).status_code, 304)
+        self.assertEqual(self.get('app.js', HTTP_IF_MODIFIED_SINCE='Mon, 01 Jan 2001 00:00:00 GMT').status_code, 200)
+        self.assertEqual(self.get('app.js', HTTP_IF_MODIFIED_SINCE='hier').status_code, 200)
+
+    def test_hors_static_root(self):
+        for chemin in ('absent.js', '../secret.txt', 'sons'):
+            with self.subTest(chemin=chemin):
+                self.assertEqual(self.get(chemin).content, b'vue')
+
+    def test_encodages_acceptes(self):
+        proposes = ('br', 'gzip')
+        self.assertEqual(encodages_acceptes('gzip, deflate, br', proposes), ['br', 'gzip'])
+        self.assertEqual(encodages_acceptes('br;q=0, gzip;q=0.5', proposes), ['gzip'])
+        self.assertEqual(encodages_acceptes('GZIP ; Q=0.000', proposes), [])
+        self.assertEqual(encodages_acceptes('*;q=0.1, br;q=0', proposes), ['gzip'])
+        self.assertEqual(encodages_acceptes('gzip;q=abc, identity', proposes), [])
+        self.assertEqual(encodages_acceptes('', proposes), [])
+
+        # gzip refusé explicitement : l'original, pas la variante .gz
+        response = self.get('app.js', HTTP_ACCEPT_ENCODING='gzip;q=0, deflate')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(self.contenu(response), b'console.log(1);' * 10)
+
+    def test_inactif_en_debug_par_defaut(self):
+        with override_settings(DEBUG=True, STATIQUES_SERVIS_PAR_APP=None):
+            self.assertFalse(ServeurStatiqueMiddleware(lambda request: None).actif)
+        with override_settings(DEBUG=True, STATIQUES_SERVIS_PAR_APP=True):
+            self.assertTrue(ServeurStatiqueMiddleware(lambda request: None).actif)
+        with override_settings(DEBUG=False, STATIQUES_SERVIS_PAR_APP=None):
+            self.assertTrue(ServeurStatiqueMiddleware(lambda request: None).actif)
+
+
+class ProfilageTests(SimpleTestCase):
+    """Profil à la demande : staff et paramètre seulement, fichiers purgés"""
+
+    def setUp(self):
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        self.dossier = Path(dossier.name)
+        self.enterContext(override_settings(PROFILAGE_DOSSIER=self.dossier, PROFILAGE_INTERVALLE_MS=1))
+
+    def get(self, chemin, staff=True, **en_tetes):
+        def vue(request):
+            time.sleep(0.03)
+            return HttpResponse('vue')
+
+        request = RequestFactory().get(chemin, **en_tetes)
+        request.user = mock.Mock(is_staff=staff, **{'get_username.return_value': 'admin'})
+        return profilage.ProfilageMiddleware(vue)(request)
+
+    def test_profil_staff(self):
+        response = self.get('/jeux/?_profil=1')
+        profil_id = response['X-Profil']
+        self.assertRegex(profil_id, profilage.ID_VALIDE)
+        piles = (self.dossier / f'{profil_id}.collapsed').read_text(encoding='utf-8')
+        self.assertIn('vue(authen/tests.py:', piles)
+        resume = json.loads((self.dossier / f'{profil_id}.json').read_text(encoding='utf-8'))
+        self.assertEqual((resume['chemin'], resume['utilisateur'], resume['statut']), ('/jeux/?_profil=1', 'admin', 200))
+        self.assertGreater(resume['categories']['vue']['echantillons'], 0)
+        self.assertEqual(profilage.chemin_piles(profil_id), self.dossier / f'{profil_id}.collapsed')
+
+        self.assertTrue(self.get('/jeux/', HTTP_X_PROFIL='1').has_header('X-Profil'))
+
+    def test_sans_demande_rien(self):
+        for chemin, staff, en_tetes in (
+            ('/jeux/?_profil=1', False, {}),
+            ('/jeux/', False, {'HTTP_X_PROFIL': '1'}),
+            ('/jeux/', True, {}),
+            ('/jeux/?_profil=0', True, {}),
+            ('/jeux/?_profil=', True, {}),
+            ('/jeux/?autre_profil=1', True, {}),
+            ('/jeux/?_profil=1', True, {'HTTP_X_PROFIL': '0'}),
+        ):
+            with self.subTest(chemin=chemin, staff=staff, en_tetes=en_tetes):
+                self.assertFalse(self.get(chemin, staff, **en_tetes).has_header('X-Profil'))
+        self.assertEqual(list(self.dossier.iterdir()), [])
+
+    def test_purger(self):
+        ids = [f'20260101-0000{i:02d}-abcdef' for i in range(5)]
+        for profil_id in ids:
+            (self.dossier / f'{profil_id}.json').write_text('{}', encoding='utf-8')
+            (self.dossier / f'{profil_id}.collapsed').write_text('', encoding='utf-8')
+        with override_settings(PROFILAGE_CONSERVES=2):
+            self.get('/jeux/?_profil=1')
+        restants = sorted(chemin.stem for chemin in self.dossier.glob('*.json'))
+        self.assertEqual(len(restants), 2)
+        self.assertEqual(restants[0], ids[-1])
+        self.assertEqual(len(list(self.dossier.glob('*.collapsed'))), 2)
+
+    def test_chemin_piles_identifiant_invalide(self):
+        (self.dossier / 'secret.collapsed').write_text('', encoding='utf-8')
+        for profil_id in ('secret', '../profils/secret', '20260101-000000-abcdef', '20260101-000000-ABCDEF'):
+            with self.subTest(profil_id=profil_id):
+                self.assertIsNone(profilage.chemin_piles(profil_id))
+
+
+@override_settings(MEMOIRE_ACTIF=True, MEMOIRE_ECHANTILLON=1, MEMOIRE_INTERVALLE_MS=1)
+class MemoireTests(SimpleTestCase):
+    """Pic mémoire par requête : en-tête, pics par vue, journal au-delà du seuil"""
+
+    @staticmethod
+    def vue(request):
+        donnees = [bytes(1024) for _ in range(2000)]
+        time.sleep(0.05)  # laisse le surveillant prendre un instantané
+        return HttpResponse(str(len(donnees)))
+
+    def get(self, chemin):
+        return memoire.MemoireMiddleware(self.vue)(RequestFactory().get(chemin))
+
+    def lignes_journal(self):
+        journal = Path(settings.MEMOIRE_JOURNAL)
+        return journal.read_text(encoding='utf-8').splitlines() if journal.exists() else []
+
+    def test_inactive_si_tracemalloc_deja_utilise(self):
+        tracemalloc.start()
+        self.addCleanup(tracemalloc.stop)
+        with memoire.Mesure() as mesure:
+            self.vue(None)
+        self.assertFalse(mesure.active)
+        self.assertIsNone(mesure.pic_ko)
+        # La trace de l'appelant n'est pas arrêtée
+        self.assertTrue(tracemalloc.is_tracing())
+
+    def test_pic_par_vue_sous_le_seuil(self):
+        avant = self.lignes_journal()
+        with override_settings(MEMOIRE_SEUIL_MO=1000):
+            response = self.get('/memoire/sous-seuil/')
+        self.assertRegex(response['X-Pic-Memoire'], r'^\d+(\.\d)? Ko$')
+        pic_ko = float(response['X-Pic-Memoire'].split()[0])
+        self.assertGreater(pic_ko, 2000)
+        self.assertEqual(memoire.statistiques()['/memoire/sous-seuil/'], {'nombre': 1, 'moyenne_ko': pic_ko, 'max_ko': pic_ko})
+        self.assertEqual(self.lignes_journal(), avant)
+
+    def test_journal_au_dela_du_seuil(self):
+        avant = self.lignes_journal()
+        with override_settings(MEMOIRE_SEUIL_MO=1):
+            response = self.get('/memoire/au-dela/')
+        self.assertIn('X-Pic-Memoire', response)
+        lignes = self.lignes_journal()
+        self.assertEqual(len(lignes), len(avant) + 1)
+        entree = json.loads(lignes[-1])
+        self.assertEqual((entree['vue'], entree['statut']), ('/memoire/au-dela/', 200))
+        self.assertTrue(any(site['site'].startswith('authen/tests.py:') for site in entree['sites']))
+
+
+class BaseSqliteTests(SimpleTestCase):
+    """PRAGMA validés, file d'écriture réentrante et limitée aux méthodes qui écrivent"""
+
+    def setUp(self):
+        # File d'écriture active sur une base fichier temporaire (la base de test est en mémoire)
+        dossier = self.enterContext(tempfile.TemporaryDirectory())
+        base = mock.Mock(settings_dict={'NAME': str(Path(dossier) / 'base.sqlite3')})
+        self.enterContext(mock.patch.object(base_sqlite, 'connections', {'default': base}))
+        self.enterContext(mock.patch.object(base_sqlite, 'ecrivain_unique_actif', return_value=True))
+
+    def test_pragmas_valides_seulement(self):
+        curseur = mock.Mock()
+        base_sqlite.appliquer_pragmas(curseur, {'busy_timeout': 5000, 'cache_size': -20000, 'journal_mode': 'WAL'})
+        self.assertEqual(curseur.execute.call_args_list, [
+            mock.call('PRAGMA busy_timeout = 5000'), mock.call('PRAGMA cache_size = -20000'),
+            mock.call('PRAGMA journal_mode = WAL'),
+        ])
+
+        for pragmas in (
+            {'journal_mode': 'WAL; DROP TABLE auth_user'},
+            {'journal_mode = WAL; --': 'DELETE'},
+            {'busy_timeout': '5000 '},
+            {'synchronous': ''},
+        ):
+            with self.subTest(pragmas=pragmas):
+                curseur = mock.Mock()
+                with self.assertRaises(ValueError):
+                    base_sqlite.appliquer_pragmas(curseur, pragmas)
+                curseur.execute.assert_not_called()
+
+    def test_ecriture_exclusive_reentrante(self):
+        with mock.patch.object(base_sqlite, 'verrou_fichier', wraps=base_sqlite.verrou_fichier) as verrou:
+            with base_sqlite.ecriture_exclusive():
+                self.assertTrue(base_sqlite._etat.dans_file)
+                # Appel imbriqué (fonction décorée appelée depuis une vue) : pas de second verrou
+                with base_sqlite.ecriture_exclusive():
+                    self.assertTrue(base_sqlite._etat.dans_file)
+                self.assertTrue(base_sqlite._etat.dans_file)
+        self.assertEqual(verrou.call_count, 1)
+        self.assertFalse(base_sqlite._etat.dans_file)
+
+    def test_middleware_methodes_qui_ecrivent(self):
+        def vue(request):
+            return HttpResponse(str(getattr(base_sqlite._etat, 'dans_file', False)))
+
+        middleware = base_sqlite.EcrivainUniqueMiddleware(vue)
+        for methode, dans_file in (
+            ('GET', b'False'), ('HEAD', b'False'), ('OPTIONS', b'False'),
+            ('POST', b'True'), ('PUT', b'True'), ('PATCH', b'True'), ('DELETE', b'True'),
+        ):
+            with self.subTest(methode=methode):
+                response = middleware(RequestFactory().generic(methode, '/'))
+                self.assertEqual(response.content, dans_file)
+
+
+class RequetesLentesTests(TestCase):
+    """Journal des requêtes lentes : normalisation, plan capturé une fois, agrégation, fichier partagé"""
+
+    def test_normaliser_empreinte(self):
+        normaliser = requetes_lentes.normaliser
+        self.assertEqual(
+            normaliser("SELECT *\n  FROM t WHERE id IN (1, 2,3) AND nom = 'l''ami' AND x > 2.5"),
+            "SELECT * FROM t WHERE id IN (...) AND nom = ? AND x > ?",
+        )
+        self.assertEqual(
+            normaliser('INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s), (%s, %s)'),
+            'INSERT INTO t (a, b) VALUES (...)',
+        )
+        # Colonnes et tables numérotées inchangées, seules les valeurs disparaissent
+        self.assertEqual(normaliser('SELECT t2.col1 FROM t2 LIMIT 21'), 'SELECT t2.col1 FROM t2 LIMIT ?')
+
+        empreinte = requetes_lentes.empreinte
+        self.assertRegex(empreinte(normaliser('SELECT 1')), r'^[0-9a-f]{12}$')
+        self.assertEqual(
+            empreinte(normaliser('SELECT * FROM t WHERE id IN (1, 2)')),
+            empreinte(normaliser('SELECT  * FROM t WHERE id IN (7, 8, 9, 10)')),
+        )
+        self.assertNotEqual(empreinte(normaliser('SELECT a FROM t')), empreinte(normaliser('SELECT b FROM t')))
+
+    @override_settings(REQUETES_LENTES_ACTIF=True, REQUETES_LENTES_SEUIL_MS=0)
+    def test_plan_capture_une_fois_par_empreinte(self):
+        self.enterContext(mock.patch.object(requetes_lentes, '_plans_captures', set()))
+        deja = len(list(requetes_lentes.lire_entrees()))
+        with mock.patch.object(requetes_lentes, 'expliquer', wraps=requetes_lentes.expliquer) as expliquer:
+            for pk in (1, 2, 3):
+                User.objects.filter(pk=pk).exists()
+        self.assertEqual(expliquer.call_count, 1)
+
+        entrees = list(requetes_lentes.lire_entrees())[deja:]
+        self.assertEqual(len(entrees), 3)
+        self.assertEqual(len({entree['empreinte'] for entree in entrees}), 1)
+        self.assertIn('"auth_user"."id" = ?', entrees[0]['sql'])
+        self.assertTrue(entrees[0]['plan'])
+        self.assertEqual([entree['plan'] for entree in entrees[1:]], [None, None])
+        self.assertTrue(entrees[0]['appelant'].startswith('authen/tests.py:'))
+
+    def test_agreger(self):
+        dossier = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        journal = dossier / 'requetes_lentes.jsonl'
+
+        def entree(cle, sql, duree_ms, vue=None, plan=None):
+            return json.dumps({
+                'date': '2026-01-01T00:00:00', 'empreinte': cle, 'sql': sql, 'duree_ms': duree_ms,
+                'vue': vue, 'appelant': 'authen/views.py:1 vue', 'plan': plan,
+            })
+
+        # Archive (.1) puis fichier courant, une ligne illisible ignorée
+        (dossier / 'requetes_lentes.jsonl.1').write_text('\n'.join([
+            entree('a', 'SELECT * FROM "auth_user"', 300, 'authen.views.liste', ['SCAN auth_user']),
+            entree('b', 'SELECT * FROM "forum_topic" LIMIT ?', 150, 'forum.views.index'),
+        ]) + '\n', encoding='utf-8')
+        journal.write_text('\n'.join([
+            entree('a', 'SELECT * FROM "auth_user"', 100, 'authen.views.liste'),
+            '{tronquée',
+            entree('b', 'SELECT * FROM "forum_topic" LIMIT ?', 110, 'forum.views.index',
+                   ['SEARCH forum_topic USING INDEX x']),
+            entree('c', 'UPDATE "authen_enfant" SET x = ?', 120),
+        ]) + '\n', encoding='utf-8')
+
+        with override_settings(REQUETES_LENTES_JOURNAL=journal):
+            top = requetes_lentes.agreger()
+            self.assertEqual(len(requetes_lentes.agreger(limite=2)), 2)
+
+        self.assertEqual([groupe['empreinte'] for groupe in top], ['a', 'b', 'c'])
+        a, b, c = top
+        self.assertEqual((a['nombre'], a['total_ms'], a['moyenne_ms'], a['max_ms']), (2, 400.0, 200.0, 300))
+        self.assertEqual(a['vues'], [('authen.views.liste', 2)])
+        # Plan de la première occurrence gardé quand les suivantes n'en ont pas
+        self.assertEqual((a['plan'], a['balayage'], a['sans_limite']), (['SCAN auth_user'], True, True))
+        self.assertEqual((b['balayage'], b['sans_limite']), (False, False))
+        self.assertEqual((c['vues'], c['plan'], c['balayage']), ([('hors requête', 1)], None, False))
+
+    def test_journal_partage_entre_process(self):
+        # Deux handlers sur le même fichier : deux workers gunicorn. 450 lignes (~7 Ko)
+        # tiennent dans le fichier et ses 3 archives de 2 Ko : aucune ne doit manquer
+        chemin = Path(self.enterContext(tempfile.TemporaryDirectory())) / 'journal.jsonl'
+        handlers = [JournalPartage(chemin, taille_max=2000, archives=3) for _ in range(2)]
+        for handler in handlers:
+            self.addCleanup(handler.close)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+        for i in range(450):
+            handlers[i % 2].emit(logging.makeLogRecord({'msg': f'{{"ligne": {i}}}'}))
+
+        fichiers = [chemin.with_name(f'journal.jsonl.{numero}') for numero in (3, 2, 1)] + [chemin]
+        lignes = [ligne for fichier in fichiers for ligne in fichier.read_text(encoding='utf-8').splitlines()]
+        self.assertEqual([json.loads(ligne)['ligne'] for ligne in lignes], list(range(450)))
+        self.assertFalse(chemin.with_name('journal.jsonl.4').exists())
+
+
+@override_settings(TEMPLATES=TEMPLATES_TESTS)
+class BudgetRequetesTests(TestCase):
+    """
+    Nombre max de requêtes SQL par URL nommée (table BUDGETS_REQUETES)
+    Mesuré sur une petite base puis après l'avoir fortement grossie : un N+1
+    fait dépasser le budget ou fait varier le nombre de requêtes
+    """
+
+    # ========== DONNÉES ==========
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.parent = User.objects.create_user('parent_budget', password='secret')
+        UserProfile.objects.create(user=cls.parent, user_type='parent')
+        cls.autre = User.objects.create_user('autre_budget', password='secret')
+        UserProfile.objects.create(user=cls.autre, user_type='parent')
+        cls.admin = User.objects.create_user('admin_budget', password='secret', is_staff=True, is_superuser=True)
+
+        # Badges déjà obtenus : add_reaction suit le même chemin quelle que soit la taille de la base
+        for name, _ in Badge.BADGE_TYPES:
+            badge = Badge.objects.create(name=name, description=name, icon='🏅')
+            for user in (cls.parent, cls.autre):
+                UserBadge.objects.create(user=user, badge=badge)
+
+        enfant = Enfant.objects.create(parent=cls.parent, prenom='Léo', nom='Martin', date_naissance=date(2018, 5, 4))
+        cls.ajouter_activites([enfant], jours=2)
+        topic = Topic.objects.create(title='Routines du soir', created_by=cls.autre, category='sommeil')
+        Post.objects.create(topic=topic, content='Merci', created_by=cls.parent)
+        Reaction.objects.create(topic=topic, user=cls.autre, reaction_type='like')
+        Notification.objects.create(user=cls.parent, notification_type='comment', message='Réponse', link='/forum/')
+        Level.objects.create(name='Découverte', price=0)
+        Level.objects.create(name='Premium', price=9)
+        Subscription.objects.create(parent=cls.parent, level=Level.objects.first(), active=True)
+
+    @staticmethod
+    def ajouter_activites(enfants, jours):
+        maintenant = timezone.now()
+        Activite.objects.bulk_create([
+            Activite(enfant=enfant, jeu=jeu, date_debut=maintenant - timedelta(days=jour, minutes=minute),
+                     duree_minutes=5, score=50, reussi=jour % 3 != 0)
+            for enfant in enfants
+            for jour in range(jours)
+            for minute, jeu in enumerate(('memory', 'couleurs', 'puzzle'))
+        ])
+
+    def grossir_base(self, contexte):
+        """Multiplie les lignes que chaque vue peut parcourir (sans changer les objets des scénarios)"""
+        call_command(
+            'generer_population', parents=20, educateurs=3, activites=2000, jours=60, topics=30,
+            posts=3, reactions=3, notifications=3, prefixe='budget', lot=500, verbosity=0,
+        )
+        enfants = Enfant.objects.bulk_create([
+            Enfant(parent=self.parent, prenom=f'Enfant {i}', nom='Martin', date_naissance=date(2016, 1, 1))
+            for i in range(5)
+        ])
+        self.ajouter_activites(enfants + list(self.parent.enfants.all()), jours=40)
+
+        topic = Topic.objects.get(id=contexte['topic_id'])
+        auteurs = list(User.objects.filter(username__startswith='budget_'))
+        Post.objects.bulk_create([Post(topic=topic, content='Réponse', created_by=user) for user in auteurs])
+        Reaction.objects.bulk_create([Reaction(topic=topic, user=user, reaction_type='support') for user in auteurs])
+        Topic.objects.bulk_create([Topic(title=f'Sujet {i}', created_by=self.autre, icon='book') for i in range(20)])
+        Notification.objects.bulk_create([
+            Notification(user=self.parent, notification_type='reaction', message='Réaction', link='/forum/')
+            for _ in range(80)
+        ])
+        Subscription.objects.bulk_create([
+            Subscription(parent=self.parent, level_id=contexte['new_level_id'], active=False) for _ in range(10)
+        ])
+        Level.objects.bulk_create([Level(name=f'Niveau {i}', price=i) for i in range(5)])
+
+    # ========== MESURE ==========
+
+    def mesurer(self, contexte):
+        """{nom: (statut, requêtes)} pour chaque URL nommée non ignorée"""
+        clients = {None: Client(HTTP_HOST='localhost')}
+        utilisateurs = {'parent': self.parent, 'admin': self.admin}
+        for role, user in utilisateurs.items():
+            clients[role] = Client(HTTP_HOST='localhost')
+            clients[role].force_login(user)
+
+        mesures = {}
+        for nom, vue in lister_vues():
+            scenario = get_scenario(nom)
+            if scenario['ignorer']:
+                continue
+            url = construire_url(vue, contexte)
+            client = clients[scenario['utilisateur']]
+            compteur = CompteurRequetes()
+            # Première requête hors mesure (session en cache, imports)
+            for compter in (False, True):
+                if scenario['reconnecter'] and scenario['utilisateur']:
+                    client.force_login(utilisateurs[scenario['utilisateur']])
+                response = executer(client, scenario, url, compteur=compteur if compter else None)
+            if scenario['reconnecter'] and scenario['utilisateur']:
+                client.force_login(utilisateurs[scenario['utilisateur']])
+            mesures[nom] = (response.status_code, compteur.total)
+        return mesures
+
+    def test_chaque_vue_a_un_budget(self):
+        sans_budget = [
+            nom for nom, _ in lister_vues()
+            if not get_scenario(nom)['ignorer'] and nom not in BUDGETS_REQUETES
+        ]
+        self.assertEqual(sans_budget, [], "Ajouter ces vues à BUDGETS_REQUETES (comautis/scenarios_vues.py)")
+
+    def test_top_requetes_lentes_illisible(self):
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(self.admin)
+        for top in ('abc', '-5', '1e9', '99999999999999999999', ''):
+            with self.subTest(top=top):
+                self.assertEqual(client.get('/admin-dashboard/requetes-lentes/', {'top': top}).status_code, 200)
+
+    def test_budgets_petite_et_grande_base(self):
+        contexte = preparer_contexte(self.parent)
+        petite = self.mesurer(contexte)
+        self.grossir_base(contexte)
+        grande = self.mesurer(contexte)
+
+        for nom, (statut, requetes) in petite.items():
+            with self.subTest(vue=nom):
+                self.assertTrue(statut_attendu(get_scenario(nom), statut), f"{nom} : statut {statut}")
+                budget = BUDGETS_REQUETES.get(nom)
+                if budget is not None:
+                    self.assertLessEqual(requetes, budget, f"{nom} : petite base")
+                    self.assertLessEqual(grande[nom][1], budget, f"{nom} : grande base")
+                self.assertEqual(
+                    grande[nom][1], requetes,
+                    f"{nom} : le nombre de requêtes dépend du volume de données ({requetes} -> {grande[nom][1]})",
+                )
+
+
+class ReponsesConditionnellesTests(TestCase):
+    """ETag des pages coûteuses : 304 tant que rien ne change, page recalculée sinon"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.parent = User.objects.create_user('parent_etag', password='secret')
+        UserProfile.objects.create(user=cls.parent, user_type='parent')
+        cls.enfant = Enfant.objects.create(
+            parent=cls.parent, prenom='Léo', nom='Martin', date_naissance=date(2018, 5, 4),
+        )
+        cls.topic = Topic.objects.create(title='Routines du soir', created_by=cls.parent, category='sommeil')
+
+    def setUp(self):
+        caches['default'].clear()
+        self.client = Client(HTTP_HOST='localhost')
+        self.client.force_login(self.parent)
+
+    def etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        return response['ETag']
+
+    def test_304_sans_changement(self):
+        for url in ('/dashboard/', '/progression/', '/forum/', f'/forum/{self.topic.id}/'):
+            with self.subTest(url=url):
+                self.etag(url)  # première visite : pose le cookie CSRF, qui fait partie de l'ETag
+                etag = self.etag(url)
+                with self.assertNumQueries(2):  # utilisateur + validateur (session en cache)
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_page_recalculee_apres_changement(self):
+        etag = self.etag('/progression/')
+        Activite.objects.create(enfant=self.enfant, jeu='memory', duree_minutes=4)
+        self.assertEqual(self.client.get('/progression/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.etag('/dashboard/')
+        Notification.objects.create(user=self.parent, notification_type='comment', message='Réponse')
+        self.assertEqual(self.client.get('/dashboard/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.etag(f'/forum/{self.topic.id}/')
+        Post.objects.create(topic=self.topic, content='Merci', created_by=self.parent)
+        self.assertEqual(self.client.get(f'/forum/{self.topic.id}/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_pas_d_etag_en_post(self):
+        response = self.client.post('/forum/', {})
+        self.assertFalse(response.has_header('ETag'))
+
+
+class RepliqueTests(SimpleTestCase):
+    """Lectures désignées sur la réplique, sauf après une écriture de la même requête ou du même navigateur"""
+
+    def setUp(self):
+        self.enterContext(mock.patch.object(replique, 'replique_disponible', return_value=True))
+        self.routeur = replique.RouteurReplique()
+
+    def lire(self, ecrire=False):
+        """Alias choisi pour une lecture faite dans une fonction @lecture_replique"""
+        @replique.lecture_replique
+        def analyse():
+            if ecrire:
+                self.routeur.db_for_write(Activite)
+            return self.routeur.db_for_read(Activite)
+        return Context().run(analyse)
+
+    def test_routeur(self):
+        self.assertEqual(self.lire(), 'replica')
+        self.assertEqual(self.lire(ecrire=True), 'default')
+        # Hors fonction décorée, ou sans réplique configurée : base principale
+        self.assertEqual(Context().run(self.routeur.db_for_read, Activite), 'default')
+        with mock.patch.object(replique, 'replique_disponible', return_value=False):
+            self.assertEqual(self.lire(), 'default')
+
+        self.assertFalse(self.routeur.allow_migrate('replica', 'authen'))
+        self.assertIsNone(self.routeur.allow_migrate('default', 'authen'))
+
+    def test_middleware_collant(self):
+        lectures = []
+
+        @replique.lecture_replique
+        def vue(request):
+            if request.method == 'POST':
+                self.routeur.db_for_write(Activite)
+            lectures.append(self.routeur.db_for_read(Activite))
+            return HttpResponse()
+
+        middleware = replique.LectureRepliqueMiddleware(vue)
+        requetes = RequestFactory()
+
+        def appeler(requete):
+            return Context().run(middleware, requete)
+
+        response = appeler(requetes.get('/admin-dashboard/'))
+        self.assertNotIn(replique.COOKIE_COLLANT, response.cookies)
+
+        response = appeler(requetes.post('/admin-dashboard/'))
+        self.assertEqual(response.cookies[replique.COOKIE_COLLANT]['max-age'], 15)
+
+        # Le navigateur qui vient d'écrire lit la base principale tant que le cookie dure
+        requete = requetes.get('/admin-dashboard/')
+        requete.COOKIES[replique.COOKIE_COLLANT] = '1'
+        appeler(requete)
+        self.assertEqual(lectures, ['replica', 'default', 'default'])
+
+        with mock.patch.object(replique, 'replique_disponible', return_value=False), \
+                self.assertRaises(MiddlewareNotUsed):
+            replique.LectureRepliqueMiddleware(vue)
+
+
+class PourListeTests(TestCase):
+    """pour_liste() : champs texte longs différés, y compris sur les relations nommées"""
+
+    @classmethod
+    def setUpTestData(cls):
+        parent = User.objects.create_user('parent_liste')
+        Enfant.objects.create(
+            parent=parent, prenom='Léo', nom='Martin', date_naissance=date(2018, 5, 4),
+            besoins_specifiques='Besoin ' * 1000, activites_preferees='Puzzle',
+        )
+        level = Level.objects.create(name='Premium', price=9, description='Description ' * 500)
+        Subscription.objects.create(parent=parent, level=level, active=True)
+        topic = Topic.objects.create(title='Routines du soir', created_by=parent, category='sommeil')
+        Post.objects.create(topic=topic, content='Très long message ' * 100, created_by=parent)
+
+    def test_champs_longs_differes(self):
+        with CaptureQueriesContext(connection) as requetes:
+            enfant = Enfant.objects.select_related('parent').pour_liste().get()
+        self.assertNotIn('besoins_specifiques', requetes[0]['sql'])
+        self.assertEqual(enfant.get_deferred_fields(), {'besoins_specifiques', 'activites_preferees'})
+        # Toujours lisible, au prix d'une requête par objet
+        with self.assertNumQueries(1):
+            self.assertTrue(enfant.besoins_specifiques.startswith('Besoin'))
+
+    def test_relations_nommees(self):
+        abonnement = Subscription.objects.select_related('level').pour_liste('level').get()
+        self.assertEqual(abonnement.get_deferred_fields(), set())
+        self.assertEqual(abonnement.level.get_deferred_fields(), {'description'})
+        with self.assertNumQueries(0):
+            self.assertEqual(abonnement.level.name, 'Premium')
+
+        # Modèle sans CHAMPS_LONGS : queryset inchangé
+        abonnements = Subscription.objects.all()
+        self.assertIs(abonnements.pour_liste(), abonnements)
+
+    def test_apercu_des_messages(self):
+        post = Post.objects.select_related('topic').pour_liste(longueur=20).get()
+        self.assertEqual(post.get_deferred_fields(), {'content'})
+        self.assertEqual(post.apercu, 'Très long message Tr')
+
+
+@override_settings(ACTIVITES_TAMPON_INTERVALLE=0)
+class TamponActivitesTests(TestCase):
+    """Débuts / fins d'auto_tracker.js regroupés en peu d'écritures"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.parent = User.objects.create_user('parent_tampon', password='secret')
+        cls.enfant = Enfant.objects.create(
+            parent=cls.parent, prenom='Léo', nom='Martin', date_naissance=date(2018, 5, 4),
+        )
+
+    def setUp(self):
+        self.client = Client(HTTP_HOST='localhost')
+        self.client.force_login(self.parent)
+
+    def test_debut_puis_beacon(self):
+        response = self.client.post(
+            '/api/start-activity/', {'enfant_id': self.enfant.id, 'jeu': 'memory'}, content_type='application/json',
+        )
+        jeton = response.json()['activite_id']
+
+        # sendBeacon : text/plain, sans en-tête CSRF, parfois envoyé deux fois
+        fin = json.dumps({'activite_id': jeton, 'score': 75, 'reussi': True})
+        for _ in range(2):
+            response = self.client.post('/api/end-activity/', fin, content_type='text/plain;charset=UTF-8')
+            self.assertTrue(response.json()['success'])
+
+        activite = Activite.objects.get(enfant=self.enfant)
+        self.assertEqual((activite.jeu, activite.score, activite.reussi), ('memory', 75, True))
+        self.assertIsNotNone(activite.date_fin)
+
+    def test_refus(self):
+        autre = User.objects.create_user('autre_tampon')
+        enfant_autre = Enfant.objects.create(parent=autre, prenom='Zoé', nom='Roy', date_naissance=date(2017, 1, 1))
+        response = self.client.post(
+            '/api/start-activity/', {'enfant_id': enfant_autre.id, 'jeu': 'memory'}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 404)
+
+        jeton = self.client.post(
+            '/api/start-activity/', {'enfant_id': self.enfant.id, 'jeu': 'puzzle'}, content_type='application/json',
+        ).json()['activite_id']
+        self.client.force_login(autre)
+        response = self.client.post('/api/end-activity/', json.dumps({'activite_id': jeton}), content_type='text/plain')
+        self.assertEqual(response.status_code, 400)
+
+    def test_nombres_hors_limites(self):
+        # JSON valide, mais int(inf) lève OverflowError
+        response = self.client.post(
+            '/api/start-activity/', '{"enfant_id": 1e400, "jeu": "memory"}', content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+        jeton = self.client.post(
+            '/api/start-activity/', {'enfant_id': self.enfant.id, 'jeu': 'memory'}, content_type='application/json',
+        ).json()['activite_id']
+        response = self.client.post(
+            '/api/end-activity/', f'{{"activite_id": "{jeton}", "score": 1e400}}', content_type='text/plain',
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_session_rejouee_hors_ligne(self):
+        # Jouée sans réseau il y a deux heures, envoyée au retour du réseau
+        debut = timezone.now() - timedelta(hours=2)
+        jeton = self.client.post('/api/start-activity/', {
+            'enfant_id': self.enfant.id, 'jeu': 'fruits', 'debut': debut.timestamp() * 1000,
+        }, content_type='application/json').json()['activite_id']
+        fin = debut + timedelta(minutes=6)
+        response = self.client.post('/api/end-activity/', {
+            'activite_id': jeton, 'score': 75, 'reussi': True, 'fin': fin.timestamp() * 1000,
+        }, content_type='application/json')
+        self.assertTrue(response.json()['success'])
+
+        activite = Activite.objects.get(enfant=self.enfant)
+        self.assertAlmostEqual(activite.date_debut, debut, delta=timedelta(seconds=1))
+        self.assertEqual(activite.duree_minutes, 6)
+
+        trop_ancien = (timezone.now() - timedelta(days=30)).timestamp() * 1000
+        response = self.client.post('/api/start-activity/', {
+            'enfant_id': self.enfant.id, 'jeu': 'fruits', 'debut': trop_ancien,
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        # Hors de la plage de datetime
+        for url, corps in [
+            ('/api/start-activity/', f'{{"enfant_id": {self.enfant.id}, "jeu": "fruits", "debut": 1e400}}'),
+            ('/api/end-activity/', f'{{"activite_id": "{jeton}", "fin": 1e400}}'),
+            ('/api/end-activity/', f'{{"activite_id": "{jeton}", "fin": 1e300}}'),
+        ]:
+            self.assertEqual(self.client.post(url, corps, content_type='application/json').status_code, 400)
+
+    def test_evenements_regroupes(self):
+        tampon = TamponActivites()
+        debut = timezone.now() - timedelta(minutes=5)
+        sessions = [uuid.uuid4() for _ in range(40)]
+        for session in sessions:
+            tampon.debut(session, self.enfant.id, 'couleurs', debut)
+        # La moitié se termine dans la même fenêtre, avec une fin en double
+        for session in sessions[:20]:
+            for _ in range(2):
+                tampon.fin(session, self.enfant.id, 'couleurs', debut, timezone.now(), score=80, reussi=True)
+
+        with self.assertNumQueries(4):  # savepoint, INSERT des débuts, upsert des fins, release
+            self.assertEqual(tampon.vider(), 40)
+        self.assertEqual(Activite.objects.filter(enfant=self.enfant).count(), 40)
+        self.assertEqual(Activite.objects.filter(enfant=self.enfant, duree_minutes=5).count(), 20)
+
+        # Fin identique à celle déjà écrite : ignorée ; fin d'une session écrite comme début : upsert
+        tampon.fin(sessions[0], self.enfant.id, 'couleurs', debut, timezone.now(), score=80, reussi=True)
+        tampon.fin(sessions[30], self.enfant.id, 'couleurs', debut, timezone.now(), score=40, reussi=False)
+        self.assertEqual(tampon.vider(), 1)
+        self.assertEqual(Activite.objects.filter(enfant=self.enfant).count(), 40)
+        self.assertEqual(Activite.objects.get(session=sessions[30]).score, 40)
+
+
+class TamponActivitesEcritureTests(TransactionTestCase):
+    """Lot écrit par une vraie transaction : clés étrangères vérifiées au commit"""
+
+    def test_enfant_supprime_ne_bloque_pas_le_lot(self):
+        parent = User.objects.create_user('parent_lot')
+        enfant = Enfant.objects.create(parent=parent, prenom='Léo', nom='Martin', date_naissance=date(2018, 5, 4))
+        supprime = Enfant.objects.create(parent=parent, prenom='Zoé', nom='Roy', date_naissance=date(2017, 1, 1))
+        tampon = TamponActivites()
+        debut = timezone.now() - timedelta(minutes=5)
+        tampon.debut(uuid.uuid4(), enfant.id, 'memory', debut)
+        tampon.fin(uuid.uuid4(), supprime.id, 'memory', debut, timezone.now())
+        tampon.fin(uuid.uuid4(), enfant.id, 'puzzle', debut, timezone.now())
+        supprime.delete()
+
+        with self.assertLogs('authen.tampon_activites', 'WARNING'):
+            self.assertEqual(tampon.vider(), 2)
+        self.assertEqual(Activite.objects.filter(enfant=enfant).count(), 2)
+        # Rien n'est remis dans le tampon : pas de nouvel essai à chaque lot
+        self.assertEqual(len(tampon), 0)
+        self.assertEqual(tampon.statistiques['activites_abandonnees'], 1)
+
+
+class ArchivesActivitesTests(TestCase):
+    """Mois anciens archivés : mêmes statistiques qu'avant l'archivage"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.parent = User.objects.create_user('parent_archives', password='secret')
+        cls.enfant = Enfant.objects.create(
+            parent=cls.parent, prenom='Léo', nom='Martin', date_naissance=date(2018, 5, 4),
+        )
+        maintenant = timezone.now()
+        jeux = ['memory', 'puzzle', 'couleurs', 'formes']
+        for i in range(60):
+            activite = Activite.objects.create(
+                enfant=cls.enfant, jeu=jeux[i % len(jeux) if i % 3 else 0], duree_minutes=i % 7,
+                score=None if i % 5 == 0 else i, reussi=i % 4 != 0,
+            )
+            # Deux ans d'historique, une activité tous les 12 jours
+            Activite.objects.filter(pk=activite.pk).update(date_debut=maintenant - timedelta(days=12 * i, hours=i))
+
+    def setUp(self):
+        dossier = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(self.settings(ACTIVITES_ARCHIVES_DOSSIER=dossier, ACTIVITES_MOIS_CHAUDS=13))
+
+    def statistiques(self):
+        stats = activity_tracker.get_stats_enfants([self.enfant])[self.enfant.id]
+        stats['derniere_activite'] = stats['derniere_activite'].pk
+        return stats, activity_tracker.get_temps_par_jeu(self.enfant)
+
+    def test_statistiques_identiques(self):
+        avant = self.statistiques()
+        call_command('archiver_activites', stdout=StringIO())
+
+        restantes = Activite.objects.filter(enfant=self.enfant).count()
+        self.assertLess(restantes, 60)
+        self.assertTrue(ResumeActivitesMois.objects.filter(enfant=self.enfant).exists())
+        archivees = list(archives_activites.activites_archivees([self.enfant.id]))
+        self.assertEqual(len(archivees) + restantes, 60)
+
+        apres = self.statistiques()
+        self.assertEqual(apres[0].keys(), avant[0].keys())
+        for cle, valeur in avant[0].items():
+            if isinstance(valeur, float):
+                self.assertAlmostEqual(apres[0][cle], valeur, msg=cle)
+            else:
+                self.assertEqual(apres[0][cle], valeur, msg=cle)
+        self.assertEqual(apres[1], avant[1])
+
+    def test_reprise_sans_doublon(self):
+        call_command('archiver_activites', stdout=StringIO())
+        call_command('archiver_activites', stdout=StringIO())
+        archivees = [a['id'] for a in archives_activites.activites_archivees([self.enfant.id])]
+        self.assertEqual(len(archivees), len(set(archivees)))
+
+    def test_suppression_retire_les_archives(self):
+        soeur = Enfant.objects.create(parent=self.parent, prenom='Zoé', nom='Martin', date_naissance=date(2016, 2, 1))
+        vieille = Activite.objects.create(enfant=soeur, jeu='memory', duree_minutes=3)
+        Activite.objects.filter(pk=vieille.pk).update(date_debut=timezone.now() - timedelta(days=500))
+        call_command('archiver_activites', stdout=StringIO())
+        archivees = len(list(archives_activites.activites_archivees([self.enfant.id])))
+
+        # Demandée, pas encore exécutée : ses activités ne sont plus archivées
+        demander_suppression(soeur, demandee_par=self.parent)
+        autre = Activite.objects.create(enfant=soeur, jeu='puzzle', duree_minutes=2)
+        Activite.objects.filter(pk=autre.pk).update(date_debut=timezone.now() - timedelta(days=600))
+        call_command('archiver_activites', stdout=StringIO())
+        self.assertTrue(Activite.objects.filter(pk=autre.pk).exists())
+
+        executer_en_attente()
+        self.assertEqual(list(archives_activites.activites_archivees([soeur.id])), [])
+        self.assertEqual(len(list(archives_activites.activites_archivees([self.enfant.id]))), archivees)
+        self.assertEqual(archives_activites.retirer_enfants([soeur.id]), 0)
+
+
+@override_settings(SUPPRESSIONS_LOT=7, SUPPRESSIONS_PAUSE=0)
+class SuppressionsDiffereesTests(TestCase):
+    """Objet masqué dans la requête, données effacées ensuite par lots"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin_suppr', password='secret', is_staff=True)
+        cls.parent = User.objects.create_user('parent_suppr', password='secret')
+        cls.autre = User.objects.create_user('autre_suppr', password='secret')
+        UserProfile.objects.create(user=cls.parent, user_type='parent')
+        cls.enfants = [
+            Enfant.objects.create(parent=cls.parent, prenom=prenom, nom='Martin', date_naissance=date(2018, 5, 4))
+            for prenom in ('Léo', 'Zoé')
+        ]
+        Activite.objects.bulk_create(
+            Activite(enfant=enfant, jeu='memory', duree_minutes=i) for enfant in cls.enfants for i in range(20)
+        )
+        Notification.objects.bulk_create(
+            Notification(user=cls.parent, notification_type='badge', message=f'n{i}') for i in range(10)
+        )
+        cls.topic = Topic.objects.create(title='Routines', created_by=cls.parent)
+        cls.topic_autre = Topic.objects.create(title='Sommeil', created_by=cls.autre)
+        for i in range(9):
+            Post.objects.create(topic=cls.topic, content=f'r{i}', created_by=cls.autre)
+            Post.objects.create(topic=cls.topic_autre, content=f'p{i}', created_by=cls.parent)
+        Reaction.objects.create(topic=cls.topic_autre, user=cls.parent, reaction_type='like')
+
+    def setUp(self):
+        self.client = Client(HTTP_HOST='localhost')
+
+    def test_suppression_compte(self):
+        self.client.force_login(self.admin)
+        self.client.post(f'/admin-dashboard/users/{self.parent.id}/delete/')
+
+        # Compte masqué et inutilisable tout de suite, données encore présentes
+        compte = User.objects.get(pk=self.parent.pk)
+        self.assertFalse(compte.is_active)
+        self.assertFalse(self.client.login(username='parent_suppr', password='secret'))
+        self.assertNotContains(self.client.get('/admin-dashboard/users/'), f'supprime-{self.parent.pk}')
+        self.assertEqual(Activite.objects.filter(enfant__parent=self.parent).count(), 40)
+
+        self.assertEqual(executer_en_attente(), 1)
+        suppression = SuppressionDifferee.objects.get()
+        self.assertEqual((suppression.etat, suppression.libelle, suppression.progression()), ('terminee', 'parent_suppr', 100))
+        self.assertEqual(suppression.supprimees['authen.Activite'], 40)
+        self.assertFalse(User.objects.filter(pk=self.parent.pk).exists())
+        self.assertFalse(Post.objects.filter(created_by=self.parent).exists())
+        self.assertFalse(Topic._base_manager.filter(pk=self.topic.pk).exists())
+        # Données des autres utilisateurs intactes (hors réponses dans le sujet supprimé)
+        self.assertTrue(Topic.objects.filter(pk=self.topic_autre.pk).exists())
+        self.assertEqual(Post.objects.filter(created_by=self.autre).count(), 0)
+        self.assertEqual(SuppressionDifferee.objects.get().demandee_par, self.admin)
+
+    def test_suppression_enfant(self):
+        self.client.force_login(self.parent)
+        enfant = self.enfants[0]
+        self.client.post(f'/supprimer-enfant/{enfant.id}/')
+
+        self.assertEqual(list(Enfant.objects.filter(parent=self.parent)), [self.enfants[1]])
+        self.assertEqual(self.client.post(f'/supprimer-enfant/{enfant.id}/').status_code, 404)
+
+        executer_en_attente()
+        self.assertFalse(Enfant._base_manager.filter(pk=enfant.pk).exists())
+        self.assertEqual(Activite.objects.filter(enfant__parent=self.parent).count(), 20)
+        self.assertEqual(SuppressionDifferee.objects.get().demandee_par, self.parent)
+
+
+@override_settings(ACTIONS_GROUPEES_LOT=5, ACTIONS_GROUPEES_PAUSE=0)
+class ActionsGroupeesTests(TestCase):
+    """Une requête ensembliste par lot, arrière-plan au-delà d'un lot"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin_actions', password='secret')
+        cls.educateurs = []
+        for i in range(12):
+            educateur = User.objects.create_user(f'educ_{i}', is_active=False)
+            UserProfile.objects.create(user=educateur, user_type='educator')
+            cls.educateurs.append(educateur)
+        parent = User.objects.create_user('parent_actions', is_active=False)
+        UserProfile.objects.create(user=parent, user_type='parent')
+        topic = Topic.objects.create(title='Routines', created_by=parent)
+        cls.posts = [Post.objects.create(topic=topic, content=f'p{i}', created_by=parent) for i in range(4)]
+
+    def setUp(self):
+        self.client = Client(HTTP_HOST='localhost')
+        self.client.force_login(self.admin)
+
+    def test_tout_le_filtre_en_arriere_plan(self):
+        response = self.client.post('/admin-dashboard/actions/lancer/', {
+            'action': 'approuver_educateurs', 'retour': 'admin_users_list', 'tout': '1', 'status': 'inactive',
+        })
+        self.assertRedirects(response, '/admin-dashboard/actions/', fetch_redirect_response=False)
+        tache = ActionGroupee.objects.get()
+        # Le parent inactif fait partie du filtre mais n'est pas approuvé
+        self.assertEqual((tache.etat, tache.total), ('attente', 13))
+
+        # Prise en charge, puis par lot (3) : savepoint, sélection, UPDATE, INSERT des notifications, progression, release
+        with self.assertNumQueries(3 + 3 * 6 + 2):
+            self.assertEqual(actions_groupees.executer_en_attente(), 1)
+        tache.refresh_from_db()
+        self.assertEqual((tache.etat, tache.traitees, tache.modifiees, tache.progression()), ('terminee', 13, 12, 100))
+        self.assertEqual(User.objects.filter(profile__user_type='educator', is_active=True).count(), 12)
+        self.assertEqual(Notification.objects.filter(user__in=self.educateurs).count(), 12)
+        self.assertContains(self.client.get('/admin-dashboard/actions/'), '13 / 13')
+
+    def test_petite_selection_et_admin_django(self):
+        ids = [post.id for post in self.posts[:3]]
+        self.client.post('/admin-dashboard/actions/lancer/', {
+            'action': 'supprimer_messages', 'retour': 'admin_forum_moderation', 'ids': ids,
+        })
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertFalse(ActionGroupee.objects.exists())
+
+        self.client.post('/admin/authen/userprofile/', {
+            'action': 'approve_educators',
+            '_selected_action': [educateur.profile.id for educateur in self.educateurs[:2]],
+        })
+        self.assertEqual(User.objects.filter(is_active=True, profile__user_type='educator').count(), 2)
+
+
+@override_settings(ACTIONS_GROUPEES_LOT=5, ACTIONS_GROUPEES_PAUSE=0, SUPPRESSIONS_PAUSE=0)
+class RepriseTachesTests(TransactionTestCase):
+    """Tâches laissées par un redémarrage : reprises par les threads démarrés dans le worker (post_fork)"""
+
+    def test_taches_interrompues_reprises(self):
+        parent = User.objects.create_user('parent_reprise')
+        enfant = Enfant.objects.create(parent=parent, prenom='Léo', nom='Martin', date_naissance=date(2018, 5, 4))
+        Activite.objects.bulk_create(Activite(enfant=enfant, jeu='memory', duree_minutes=i) for i in range(5))
+        Enfant.objects.filter(pk=enfant.pk).update(suppression_demandee=True)
+        suppression = SuppressionDifferee.objects.create(modele='authen.enfant', objet_id=enfant.pk, libelle='Léo')
+
+        educateurs = [User.objects.create_user(f'educ_reprise_{i}', is_active=False) for i in range(8)]
+        ids = [educateur.pk for educateur in educateurs]
+        tache = ActionGroupee.objects.create(action='activer_utilisateurs', libelle='Activer', ids=ids, total=len(ids))
+        # Worker arrêté au milieu du premier lot : en_cours, plus mis à jour depuis longtemps
+        ActionGroupee.objects.filter(pk=tache.pk).update(
+            etat='en_cours', traitees=5, modifiees=5, mis_a_jour=timezone.now() - timedelta(hours=1),
+        )
+        User.objects.filter(pk__in=ids[:5]).update(is_active=True)
+
+        # Threads propres au test : ceux des modules ne démarrent jamais pendant la suite.
+        # Base de test en mémoire (cache partagé) : verrous de table sans attente, une tâche à la fois
+        verrou, finies = threading.Lock(), []
+        modules = (suppressions, actions_groupees)
+
+        def seule(executer):
+            finie = threading.Event()
+            finies.append(finie)
+
+            def lancer():
+                with verrou:
+                    executer()
+                finie.set()
+            return lancer
+
+        fils = [Travailleur(f'{module.__name__}-test', seule(module.executer_en_attente)) for module in modules]
+        with mock.patch.object(modules[0], 'travailleur', fils[0]), mock.patch.object(modules[1], 'travailleur', fils[1]):
+            reprendre_taches()
+            self.assertTrue(all(finie.wait(10) for finie in finies))
+
+        etats = {SuppressionDifferee.objects.get(pk=suppression.pk).etat, ActionGroupee.objects.get(pk=tache.pk).etat}
+        self.assertEqual(etats, {'terminee'})
+        self.assertFalse(Enfant._base_manager.filter(pk=enfant.pk).exists())
+        self.assertFalse(Activite.objects.filter(enfant_id=enfant.pk).exists())
+        tache.refresh_from_db()
+        self.assertEqual((tache.traitees, tache.modifiees), (8, 8))
+        self.assertEqual(User.objects.filter(pk__in=ids, is_active=True).count(), 8)
+
+
+class LimitationTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.client = Client(HTTP_HOST='localhost')
+
+    def test_rafale_puis_429_sans_requete(self):
+        self.assertIn('forum:add_reaction', get_limites())
+        for _ in range(10):
+            self.assertEqual(self.client.post('/login/', {'username': 'x', 'password': 'y'}).status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.post('/login/', {'username': 'x', 'password': 'y'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '3')
+        # GET non limité, autre IP : seau séparé
+        self.assertEqual(self.client.get('/login/').status_code, 200)
+        self.assertEqual(self.client.post('/login/', {}, REMOTE_ADDR='10.0.0.2').status_code, 200)
+
+    def test_seau_par_compte(self):
+        parent = User.objects.create_user('parent_limite', password='x')
+        topic = Topic.objects.create(title='Sommeil', created_by=parent)
+        self.client.force_login(parent)
+        url = f'/forum/{topic.id}/react/'
+        codes = [self.client.post(url, {'reaction_type': 'love'}).status_code for _ in range(21)]
+        self.assertNotIn(429, codes[:20])
+        response = self.client.post(url, {'reaction_type': 'love'}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertFalse(response.json()['success'])
+
+    def test_mesures_sans_limitation(self):
+        # Plus de connexions que la rafale du login : la mesure ne doit pas recevoir de 429
+        sortie = StringIO()
+        call_command('mesurer_sessions', connexions=15, requetes=2, backends=['db'], json=True, stdout=sortie)
+        self.assertEqual(json.loads(sortie.getvalue())['backends'][0]['backend'], 'db')
+
+
+class PreferencesTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.parent = User.objects.create_user('parent_preferences', password='x')
+        UserProfile.objects.create(user=self.parent, user_type='parent')
+        self.client = Client(HTTP_HOST='localhost')
+        self.client.force_login(self.parent)
+
+    def modifier(self, **valeurs):
+        return self.client.post('/api/update-preferences/', json.dumps(valeurs), content_type='application/json')
+
+    def test_champs_modifies_seulement_et_version(self):
+        # Aucune préférence enregistrée : défauts du modèle, rien n'est créé par la lecture
+        self.assertContains(self.client.get('/jeux/labyrinthe/'), 'data-theme="clair"')
+        self.assertFalse(UserPreferences.objects.exists())
+
+        self.modifier(theme='sombre', volume='faible')
+        preferences = UserPreferences.objects.get(user=self.parent)
+        self.assertEqual((preferences.theme, preferences.volume, preferences.version), ('sombre', 'faible', 1))
+
+        with CaptureQueriesContext(connection) as requetes:
+            self.modifier(theme='sombre', sons_jeux=False)
+        mise_a_jour = [r['sql'] for r in requetes if r['sql'].startswith('UPDATE "authen_userpreferences"')]
+        self.assertEqual(len(mise_a_jour), 1)
+        self.assertNotIn('"theme"', mise_a_jour[0])
+        self.assertIn('"sons_jeux"', mise_a_jour[0])
+
+        self.assertEqual(UserPreferences.objects.get(user=self.parent).version, 2)
+
+        # Nouvelle version lue dans le cache, sans requête sur les préférences
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get('/jeux/labyrinthe/')
+        self.assertContains(response, 'data-sons-jeux="0"')
+        self.assertFalse([r for r in requetes if 'authen_userpreferences' in r['sql']])
+
+
+@override_settings(PAGES_PRECALCULEES_ACTIF=True)
+class PagesPrecalculeesTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.parent = User.objects.create_user('parent_pages', password='x')
+        self.client = Client(HTTP_HOST='localhost', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.client.force_login(self.parent)
+
+    def test_rendue_une_fois_servie_compressee(self):
+        premiere = self.client.get('/jeux/memory/')
+        self.assertEqual((premiere['X-Page-Precalculee'], premiere['Content-Encoding']), ('miss', 'gzip'))
+        html = gzip.decompress(premiere.content).decode()
+        self.assertIn('data-theme="clair"', html)
+
+        with self.assertTemplateNotUsed('authen/jeux/moteur.html'):
+            seconde = self.client.get('/jeux/memory/')
+        self.assertEqual(seconde['X-Page-Precalculee'], 'hit')
+        self.assertEqual(gzip.decompress(seconde.content).decode(), html)
+        self.assertIn('private', seconde['Cache-Control'])
+        self.assertEqual(self.client.get('/jeux/memory/', HTTP_IF_NONE_MATCH=seconde['ETag']).status_code, 304)
+
+        # Sans gzip accepté (absent ou q=0) : page non compressée ; autre variante d'affichage : autre rendu
+        self.assertFalse(Client(HTTP_HOST='localhost').get('/').has_header('Content-Encoding'))
+        refus = Client(HTTP_HOST='localhost', HTTP_ACCEPT_ENCODING='gzip;q=0, br;q=0')
+        refus.force_login(self.parent)
+        self.assertFalse(refus.get('/jeux/memory/').has_header('Content-Encoding'))
+        self.client.post('/api/update-preferences/', json.dumps({'theme': 'sombre'}), content_type='application/json')
+        response = self.client.get('/jeux/memory/')
+        self.assertEqual(response['X-Page-Precalculee'], 'miss')
+        self.assertIn('data-theme="sombre"', gzip.decompress(response.content).decode())
+
+
+@override_settings(PAGES_PRECALCULEES_ACTIF=False)
+class JeuxPacksTests(TestCase):
+    def setUp(self):
+        self.parent = User.objects.create_user('parent_jeux', password='x')
+        self.client = Client(HTTP_HOST='localhost')
+        self.client.force_login(self.parent)
+
+    def test_packs_valides(self):
+        moteurs = {'memory': 'cartes', 'compter': 'collections', 'quiz': 'questions'}
+        for jeu in jeux_packs.lister_packs():
+            donnees = jeux_packs.charger_pack(jeu)['donnees']
+            self.assertIn(moteurs[donnees['moteur']], donnees, jeu)
+            self.assertTrue({'titre', 'fond', 'accent'} <= set(donnees['page']), jeu)
+            # Images résolues en URL statiques
+            for carte in donnees.get('cartes', []):
+                if 'image' in carte:
+                    self.assertTrue(carte['image'].startswith(settings.STATIC_URL), jeu)
+
+    def test_page_coquille_et_pack_versionne(self):
+        page = self.client.get('/jeux/compter-10/')
+        self.assertTemplateUsed(page, 'authen/jeux/moteur.html')
+        url = jeux_packs.url_pack('compter-10')
+        self.assertContains(page, f'data-pack="{url}"')
+        self.assertNotContains(page, 'emojiCollections')
+
+        # Public : même contenu pour tous, sans session
+        pack = Client(HTTP_HOST='localhost').get(url)
+        self.assertEqual(pack.status_code, 200)
+        self.assertEqual(json.loads(pack.content)['maximum'], 10)
+        self.assertIn('immutable', pack['Cache-Control'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=pack['ETag']).status_code, 304)
+
+        # Ancienne version : contenu courant, à revalider
+        ancien = self.client.get('/api/jeux/compter-10/pack.json?v=ancienne')
+        self.assertEqual(ancien['ETag'], pack['ETag'])
+        self.assertIn('no-cache', ancien['Cache-Control'])
+
+        compresse = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(json.loads(gzip.decompress(compresse.content)), json.loads(pack.content))
+        self.assertNotEqual(compresse['ETag'], pack['ETag'])
+        self.assertEqual(self.client.get('/api/jeux/inconnu/pack.json').status_code, 404)
+
+    def test_pages_de_jeux_suivies(self):
+        jeux = dict(Activite.JEUX_CHOICES)
+        for nom in ('jeu_memory', 'jeu_compter_3', 'jeu_couleurs', 'jeu_emotions', 'jeu_compter_10', 'jeu_memory_fruits',
+                    'jeu_jours_semaine', 'animaux_jeu', 'jeu_fruits', 'jeu_memory_couleurs', 'jeu_saisons',
+                    'jeu_puzzle', 'labyrinthe'):
+            with self.subTest(page=nom):
+                page = self.client.get(reverse(nom)).content.decode()
+                self.assertIn(settings.STATIC_URL + 'js/auto_tracker.js', page)
+                self.assertIn(re.search(r'<meta name="jeu" content="([a-z_0-9]+)">', page)[1], jeux)
+
+
+@override_settings(PAGES_PRECALCULEES_ACTIF=False)
+class HorsLigneTests(TestCase):
+    """Manifest de précache et service worker des jeux"""
+
+    def setUp(self):
+        self.dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dossier.cleanup)
+        hors_ligne._lire_manifest.cache_clear()
+        self.addCleanup(hors_ligne._lire_manifest.cache_clear)
+
+    def test_manifest_et_service_worker(self):
+        with override_settings(PRECACHE_MANIFEST=f'{self.dossier.name}/precache.json'), \
+                mock.patch.object(hors_ligne.logger, 'warning') as avertissement, \
+                self.assertNumQueries(0):
+            call_command('generer_precache', stdout=StringIO())
+            manifest = hors_ligne.charger_manifest()
+            response = Client(HTTP_HOST='localhost').get('/service-worker.js')
+            self.assertEqual(hors_ligne.generer_manifest(), manifest)
+        # Seuls avertissements : sons et images cités par les jeux mais absents de l'arbre
+        for appel in avertissement.call_args_list:
+            self.assertTrue(appel.args[0].startswith('Statique introuvable'), appel)
+
+        entrees = {e['url']: e['revision'] for e in manifest['entrees']}
+        # Page : révision du contenu ; pack versionné et statiques : l'URL suffit
+        self.assertTrue(entrees['/jeux/memory/'])
+        self.assertIn(jeux_packs.url_pack('memory'), entrees)
+        self.assertIn(settings.STATIC_URL + 'js/hors_ligne.js', entrees)
+        self.assertIn(settings.STATIC_URL + 'js/jeux/moteur.js', entrees)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Service-Worker-Allowed'], '/')
+        self.assertContains(response, f"const VERSION = '{manifest['version']}';")
+        self.assertContains(response, jeux_packs.url_pack('memory'))
+        self.assertIn(settings.STATIC_URL + 'js/auto_tracker.js', entrees)
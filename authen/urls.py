@@ -1,22 +1,19 @@
 from django.urls import path
-from . import views
-from .admin_views import (
-    admin_dashboard,
-    admin_users_list,
-    admin_user_detail,
-    admin_approve_educator,
-    admin_deactivate_user,
-    admin_delete_user,
-    admin_enfants_list,
-    admin_forum_moderation,
-    admin_delete_topic,
-    admin_delete_post,
-    admin_subscriptions,
-    admin_statistics,
-)
+from . import views, admin_views
+from comautis.limitation import Limite
+
+# Limites de débit (comautis/limitation.py) : 429 avant la vue, POST seulement
+LIMITES = {
+    'login': Limite('20/min', rafale=10, par='ip'),             # essais de mots de passe
+    'register': Limite('20/h', rafale=10, par='ip'),            # une classe entière derrière la même IP
+    'changer_mot_de_passe': Limite('5/min', rafale=5),
+    'start_activity': Limite('60/min', rafale=30),              # un enfant qui enchaîne les jeux
+    'end_activity': Limite('60/min', rafale=30),
+}
 
 urlpatterns = [
     path('', views.index, name='index'),           # accueil
+    path('service-worker.js', views.service_worker, name='service_worker'),  # jeux hors ligne
     path('register/', views.register, name='register'),
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
@@ -48,6 +45,7 @@ urlpatterns = [
     path('enfant/<int:enfant_id>/dessiner/', views.dessiner_view, name='dessiner'),
     path('enfant/<int:enfant_id>/videos/', views.videos_view, name='videos'),
     path('enfant/<int:enfant_id>/histoires/', views.histoires_view, name='histoires'),
+    path('miniatures/<str:taille>/<path:nom>', views.miniature, name='miniature'),
     path('ressources/', views.ressources, name='ressources'),
     path('parametres/', views.parametres, name='parametres'),
     path('progression/', views.progression, name='progression'),
@@ -57,28 +55,38 @@ urlpatterns = [
     path('notifications/', views.notifications_list, name='notifications'),
     path('notifications/<int:notification_id>/read/', views.mark_notification_read, name='mark_notification_read'),
     # ========== ADMIN DASHBOARD ==========
-    path('admin-dashboard/', admin_dashboard, name='admin_dashboard'),
+    path('admin-dashboard/', admin_views.admin_dashboard, name='admin_dashboard'),
     
     # Gestion utilisateurs
-    path('admin-dashboard/users/', admin_users_list, name='admin_users_list'),
-    path('admin-dashboard/users/<int:user_id>/', admin_user_detail, name='admin_user_detail'),
-    path('admin-dashboard/users/<int:user_id>/approve/', admin_approve_educator, name='admin_approve_educator'),
-    path('admin-dashboard/users/<int:user_id>/deactivate/', admin_deactivate_user, name='admin_deactivate_user'),
-    path('admin-dashboard/users/<int:user_id>/delete/', admin_delete_user, name='admin_delete_user'),
+    path('admin-dashboard/users/', admin_views.admin_users_list, name='admin_users_list'),
+    path('admin-dashboard/users/<int:user_id>/', admin_views.admin_user_detail, name='admin_user_detail'),
+    path('admin-dashboard/users/<int:user_id>/approve/', admin_views.admin_approve_educator, name='admin_approve_educator'),
+    path('admin-dashboard/users/<int:user_id>/deactivate/', admin_views.admin_deactivate_user, name='admin_deactivate_user'),
+    path('admin-dashboard/users/<int:user_id>/delete/', admin_views.admin_delete_user, name='admin_delete_user'),
     
     # Gestion enfants
-    path('admin-dashboard/enfants/', admin_enfants_list, name='admin_enfants_list'),
+    path('admin-dashboard/enfants/', admin_views.admin_enfants_list, name='admin_enfants_list'),
     
     # Modération forum
-    path('admin-dashboard/forum/', admin_forum_moderation, name='admin_forum_moderation'),
-    path('admin-dashboard/forum/topic/<int:topic_id>/delete/', admin_delete_topic, name='admin_delete_topic'),
-    path('admin-dashboard/forum/post/<int:post_id>/delete/', admin_delete_post, name='admin_delete_post'),
+    path('admin-dashboard/forum/', admin_views.admin_forum_moderation, name='admin_forum_moderation'),
+    path('admin-dashboard/forum/topic/<int:topic_id>/delete/', admin_views.admin_delete_topic, name='admin_delete_topic'),
+    path('admin-dashboard/forum/post/<int:post_id>/delete/', admin_views.admin_delete_post, name='admin_delete_post'),
     
     # Abonnements
-    path('admin-dashboard/subscriptions/', admin_subscriptions, name='admin_subscriptions'),
+    path('admin-dashboard/subscriptions/', admin_views.admin_subscriptions, name='admin_subscriptions'),
     
     # Statistiques
-    path('admin-dashboard/statistics/', admin_statistics, name='admin_statistics'),
+    path('admin-dashboard/statistics/', admin_views.admin_statistics, name='admin_statistics'),
+    
+    # Profils de requêtes (?_profil=1)
+    path('admin-dashboard/profils/', admin_views.admin_profils, name='admin_profils'),
+    path('admin-dashboard/profils/<str:profil_id>/', admin_views.admin_profil_piles, name='admin_profil_piles'),
+    
+    # Requêtes SQL lentes
+    path('admin-dashboard/requetes-lentes/', admin_views.admin_requetes_lentes, name='admin_requetes_lentes'),
+    path('admin-dashboard/suppressions/', admin_views.admin_suppressions, name='admin_suppressions'),
+    path('admin-dashboard/actions/', admin_views.admin_actions_groupees, name='admin_actions_groupees'),
+    path('admin-dashboard/actions/lancer/', admin_views.admin_action_groupee, name='admin_action_groupee'),
 
     path('api/modifier-profil/', views.modifier_profil, name='modifier_profil'),
     path('api/changer-mot-de-passe/', views.changer_mot_de_passe, name='changer_mot_de_passe'),
@@ -86,6 +94,10 @@ urlpatterns = [
     path('api/supprimer-enfant/<int:enfant_id>/', views.supprimer_enfant, name='supprimer_enfant'),
     path('api/update-preferences/', views.update_preferences, name='update_preferences'),
     path('api/supprimer-compte/', views.supprimer_compte, name='supprimer_compte'),
+    # Suivi des activités (auto_tracker.js)
+    path('api/start-activity/', views.start_activity, name='start_activity'),
+    path('api/end-activity/', views.end_activity, name='end_activity'),
+    path('api/jeux/<slug:jeu>/pack.json', views.pack_jeu, name='pack_jeu'),
 ]
 
 
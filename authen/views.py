@@ -4,11 +4,20 @@ from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from .forms import RegisterForm
-from .models import UserProfile, Enfant, Badge, UserBadge, Notification
+from .hors_ligne import reponse_service_worker
+from .jeux_packs import contexte_jeu, reponse_pack
+from .models import UserProfile, Enfant, Badge, UserBadge, Notification, Activite
+from .preferences import CHAMPS as CHAMPS_PREFERENCES, enregistrer as enregistrer_preferences, variante_affichage
+from .suppressions import demander_suppression
+from .tampon_activites import enregistrer_debut, enregistrer_fin, lire_horodatage
 from datetime import datetime
+from comautis.fraicheur import conditionnel, etat_espace_parent
+from comautis.pages_precalculees import page_precalculee
+from comautis.replique import lecture_replique
 from django.urls import path
 from . import views
 
+@page_precalculee()
 def index(request):
     return render(request, 'authen/index.html')
 
@@ -121,6 +130,8 @@ def logout_view(request):
 
 
 @login_required
+@lecture_replique
+@conditionnel(etat_espace_parent)
 def dashboard(request):
     # ✅ REDIRECTION AUTOMATIQUE POUR LES ADMINS
     if request.user.is_staff or request.user.is_superuser:
@@ -138,20 +149,19 @@ def dashboard(request):
     unread_notifications = Notification.objects.filter(user=request.user, is_read=False).count()
     
     # ✅ NOUVEAU : Récupérer les enfants avec leurs stats
-    enfants = Enfant.objects.filter(parent=request.user)
+    enfants = list(Enfant.objects.filter(parent=request.user).pour_liste())
     
-    # Calculer les stats pour chaque enfant
-    from .activity_tracker import get_enfant_stats, get_activites_par_jour
+    # Calculer les stats de tous les enfants (requêtes groupées, pas une série par enfant)
+    from .activity_tracker import get_stats_enfants, get_activites_par_jour_enfants
+    stats_enfants = get_stats_enfants(enfants)
+    activites_7jours = get_activites_par_jour_enfants(enfants, jours=7)
     enfants_avec_stats = []
     
     for enfant in enfants:
-        stats = get_enfant_stats(enfant)
-        activites_7jours = get_activites_par_jour(enfant, jours=7)
-        
         enfants_avec_stats.append({
             'enfant': enfant,
-            'stats': stats,
-            'graphique_data': activites_7jours,
+            'stats': stats_enfants[enfant.id],
+            'graphique_data': activites_7jours[enfant.id],
         })
     
     # Rediriger vers le bon dashboard selon le type
@@ -192,6 +202,18 @@ def profil_famille(request):
 @login_required
 def ajouter_enfant(request):
     if request.method == 'POST':
+        # Photo (optionnelle) réduite et sans métadonnées, vérifiée avant de créer l'enfant
+        photo = None
+        if request.FILES.get('photo'):
+            from .photos_manager import preparer_photo
+            try:
+                photo = preparer_photo(request.FILES['photo'])
+            except OSError:
+                return render(request, 'authen/ajouter_enfant.html', {
+                    'saisie': request.POST,
+                    'erreur_photo': "L'image n'a pas pu être lue",
+                })
+        
         # Récupérer les données du formulaire
         prenom = request.POST.get('prenom')
         nom = request.POST.get('nom')
@@ -203,7 +225,7 @@ def ajouter_enfant(request):
         activites_preferees = request.POST.get('activites_preferees', '')
         
         # Créer l'enfant
-        Enfant.objects.create(
+        enfant = Enfant(
             parent=request.user,
             prenom=prenom,
             nom=nom,
@@ -215,6 +237,11 @@ def ajouter_enfant(request):
             activites_preferees=activites_preferees
         )
         
+        if photo is not None:
+            enfant.photo.save(photo.name, photo, save=False)
+        
+        enfant.save()
+        
         return redirect('profil_famille')
     
     return render(request, 'authen/ajouter_enfant.html')
@@ -225,6 +252,18 @@ def modifier_enfant(request, enfant_id):
     enfant = get_object_or_404(Enfant, id=enfant_id, parent=request.user)
     
     if request.method == 'POST':
+        # Photo vérifiée avant toute modification de l'enfant
+        photo = None
+        if request.FILES.get('photo'):
+            from .photos_manager import preparer_photo
+            try:
+                photo = preparer_photo(request.FILES['photo'])
+            except OSError:
+                return render(request, 'authen/modifier_enfant.html', {
+                    'enfant': enfant,
+                    'erreur_photo': "L'image n'a pas pu être lue",
+                })
+        
         # Mettre à jour les informations
         enfant.prenom = request.POST.get('prenom')
         enfant.nom = request.POST.get('nom')
@@ -234,6 +273,10 @@ def modifier_enfant(request, enfant_id):
         enfant.besoins_specifiques = request.POST.get('besoins_specifiques', '')
         enfant.couleur_preferee = request.POST.get('couleur_preferee', '')
         enfant.activites_preferees = request.POST.get('activites_preferees', '')
+        
+        if photo is not None:
+            enfant.photo.save(photo.name, photo, save=False)
+        
         enfant.save()
         
         return redirect('profil_famille')
@@ -250,7 +293,7 @@ def supprimer_enfant(request, enfant_id):
     enfant = get_object_or_404(Enfant, id=enfant_id, parent=request.user)
     
     if request.method == 'POST':
-        enfant.delete()
+        demander_suppression(enfant, demandee_par=request.user)
         return redirect('profil_famille')
     
     context = {
@@ -264,7 +307,7 @@ def supprimer_enfant(request, enfant_id):
 def selection_enfant(request):
     """Page de sélection de l'enfant qui veut jouer"""
     # Récupérer tous les enfants de l'utilisateur
-    enfants = Enfant.objects.filter(parent=request.user)
+    enfants = Enfant.objects.filter(parent=request.user).pour_liste()
     
     context = {
         'enfants': enfants,
@@ -316,76 +359,100 @@ def users_list(request):
 
 
 @login_required
+@page_precalculee(variante_affichage)
 def liste_jeux(request):
     """Page listant tous les jeux disponibles"""
     return render(request, 'authen/jeux/liste_jeux.html')
 
 
 @login_required
+@page_precalculee(variante_affichage)
 def jeu_memory(request):
     """Jeu Memory"""
-    return render(request, 'authen/jeux/memory.html')
+    return render(request, 'authen/jeux/moteur.html', contexte_jeu('memory'))
 
 
 @login_required
+@page_precalculee(variante_affichage)
 def jeu_compter_3(request):
     """Jeu pour apprendre à compter jusqu'à 3"""
-    return render(request, 'authen/jeux/compter_3.html')
+    return render(request, 'authen/jeux/moteur.html', contexte_jeu('compter-3'))
 
 
 @login_required
+@page_precalculee(variante_affichage)
 def jeu_couleurs(request):
     """Jeu pour apprendre les couleurs"""
     return render(request, 'authen/jeux/couleurs.html')
 
 @login_required
+@page_precalculee(variante_affichage)
 def jeu_emotions(request):
     """Jeu pour apprendre les émotions"""
     return render(request, 'authen/jeux/emotions.html')
 
 @login_required
+@page_precalculee(variante_affichage)
 def jeu_compter_10(request):
     """Jeu pour apprendre à compter jusqu'à 10"""
-    return render(request, 'authen/jeux/compter_10.html')
+    return render(request, 'authen/jeux/moteur.html', contexte_jeu('compter-10'))
 
 @login_required
+@page_precalculee(variante_affichage)
 def jeu_memory_fruits(request):
     """Jeu Memory Fruits"""
-    return render(request, 'authen/jeux/memory_fruits.html')
+    return render(request, 'authen/jeux/moteur.html', contexte_jeu('memory-fruits'))
 
 @login_required
+@page_precalculee(variante_affichage)
 def jeu_jours_semaine(request):
     """Jeu Jours de la Semaine"""
     return render(request, 'authen/jeux/jours_semaine.html')
 
 @login_required
+@page_precalculee(variante_affichage)
 def animaux_jeu(request):
     """Jeu pour apprendre les cris des animaux"""
     # Pas besoin d'enfant_id ici
     return render(request, 'authen/jeux/animaux_jeu.html')
 
 @login_required
+@page_precalculee(variante_affichage)
 def jeu_fruits(request):
     """Jeu pour apprendre les fruits"""
-    return render(request, 'authen/jeux/fruits.html')
+    return render(request, 'authen/jeux/moteur.html', contexte_jeu('fruits'))
 
 @login_required
+@page_precalculee(variante_affichage)
 def jeu_memory_couleurs(request):
     """Jeu Memory Couleurs"""
-    return render(request, 'authen/jeux/memory_couleurs.html')
+    return render(request, 'authen/jeux/moteur.html', contexte_jeu('memory-couleurs'))
 
 @login_required
+@page_precalculee(variante_affichage)
 def jeu_saisons(request):
     """Jeu pour apprendre les saisons"""
-    return render(request, 'authen/jeux/saisons.html')
+    return render(request, 'authen/jeux/moteur.html', contexte_jeu('saisons'))
 
 @login_required
+@page_precalculee(variante_affichage)
 def jeu_puzzle(request):
     """Jeu Puzzle"""
     return render(request, 'authen/jeux/puzzle.html')
 
 
+def pack_jeu(request, jeu):
+    """Contenu JSON d'un jeu à moteur partagé (versionné, ETag, public comme les statiques)"""
+    return reponse_pack(request, jeu)
+
+
+def service_worker(request):
+    """Service worker des jeux hors ligne, servi à la racine pour couvrir toutes les pages"""
+    return reponse_service_worker(request)
+
+
 @login_required
+@page_precalculee(variante_affichage)
 def page_sons(request):
     """Page des sons"""
     return render(request, 'authen/sons.html')
@@ -414,7 +481,38 @@ def histoires_view(request, enfant_id):
     context = {'enfant': enfant}
     return render(request, 'authen/histoires.html', context)
 
+@login_required
+def miniature(request, taille, nom):
+    """Sert la miniature d'une photo, générée au premier appel puis gardée sur disque"""
+    from django.core.files.storage import default_storage
+    from django.http import FileResponse, Http404
+    from .photos_manager import chemin_miniature, generer_miniature, get_miniatures
+    
+    if taille not in get_miniatures() or '..' in nom:
+        raise Http404
+    
+    # Seulement les photos de la famille connectée : les noms des anciens uploads se devinent
+    if not (Enfant.objects.filter(parent=request.user, photo=nom).exists()
+            or UserProfile.objects.filter(user=request.user, photo=nom).exists()):
+        raise Http404
+    
+    # Miniature déjà en cache : on l'envoie sans jamais décoder l'original
+    chemin = chemin_miniature(nom, taille)
+    if not default_storage.exists(chemin):
+        if not default_storage.exists(nom):
+            raise Http404
+        try:
+            chemin = generer_miniature(nom, taille)
+        except OSError:  # fichier illisible ou qui n'est pas une image
+            raise Http404
+    
+    response = FileResponse(default_storage.open(chemin, 'rb'), content_type='image/jpeg')
+    # Nom dérivé du contenu de l'original : l'URL change quand la photo change
+    response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
+
 # Vue pour la page Ressources
+@page_precalculee()
 def ressources(request):
     return render(request, 'authen/ressources.html', {
         'user': request.user
@@ -422,13 +520,14 @@ def ressources(request):
 
 def parametres(request):
     # Récupérer les enfants de l'utilisateur connecté
-    enfants = Enfant.objects.filter(parent=request.user)
+    enfants = Enfant.objects.filter(parent=request.user).pour_liste()
     
     return render(request, 'authen/parametres.html', {
         'user': request.user,
         'enfants': enfants
     })
 
+@page_precalculee(variante_affichage)
 def labyrinthe_jeu(request):
     return render(request, 'authen/jeux/labyrinthe.html')
 
@@ -487,27 +586,28 @@ def mark_notification_read(request, notification_id):
     
 
 @login_required
+@lecture_replique
+@conditionnel(etat_espace_parent)
 def progression(request):
     """Page de suivi de progression des enfants"""
     # Récupérer tous les enfants de l'utilisateur
-    enfants = Enfant.objects.filter(parent=request.user)
+    enfants = list(Enfant.objects.filter(parent=request.user).pour_liste())
     
-    # Calculer les stats pour chaque enfant
-    from .activity_tracker import get_enfant_stats, get_activites_par_jour
+    # Calculer les stats de tous les enfants (requêtes groupées, pas une série par enfant)
+    from .activity_tracker import get_stats_enfants, get_activites_par_jour_enfants
     import json
     
+    stats_enfants = get_stats_enfants(enfants)
+    activites_7jours = get_activites_par_jour_enfants(enfants, jours=7)
     enfants_avec_stats = []
     
     for enfant in enfants:
-        stats = get_enfant_stats(enfant)
-        activites_7jours = get_activites_par_jour(enfant, jours=7)
-        
         # Convertir les données pour le graphique en JSON
-        graphique_json = json.dumps(activites_7jours, default=str)
+        graphique_json = json.dumps(activites_7jours[enfant.id], default=str)
         
         enfants_avec_stats.append({
             'enfant': enfant,
-            'stats': stats,
+            'stats': stats_enfants[enfant.id],
             'graphique_data': graphique_json,
         })
     
@@ -527,11 +627,12 @@ from django.utils import timezone
 import json
 
 @login_required
+@lecture_replique
 def progression_view(request):
     """Vue pour afficher la progression de tous les enfants"""
     
     # Récupérer tous les enfants du parent connecté
-    enfants = request.user.enfants.all()  # Ajuste selon ton modèle
+    enfants = request.user.enfants.pour_liste()  # Ajuste selon ton modèle
     
     enfants_avec_stats = []
     
@@ -710,6 +811,7 @@ from django.contrib import messages
 from django.contrib.auth import update_session_auth_hash
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
+from django.views.decorators.csrf import csrf_exempt
 import json
 
 # ===========================
@@ -720,14 +822,12 @@ def parametres_view(request):
     """Page principale des paramètres"""
     
     # Récupérer les enfants du parent
-    enfants = request.user.enfants.all()  # Ajuste selon ton modèle
-    
-    # Récupérer ou créer les préférences utilisateur
-    preferences, created = UserPreferences.objects.get_or_create(user=request.user)
+    enfants = request.user.enfants.pour_liste()  # Ajuste selon ton modèle
     
+    # Préférences (cache, voir authen/preferences.py) : valeurs par défaut tant que rien n'est enregistré
     context = {
         'enfants': enfants,
-        'preferences': preferences,
+        'preferences': request.preferences,
     }
     
     return render(request, 'parametres.html', context)
@@ -851,15 +951,24 @@ def upload_photo_profil(request):
             'message': 'Le fichier doit être une image'
         })
     
-    # Sauvegarder la photo
-    user = request.user
-    user.photo_profil = photo  # Assure-toi d'avoir ce champ dans ton modèle User
-    user.save()
+    # Réduire la photo et supprimer ses métadonnées avant de la sauvegarder
+    from .photos_manager import preparer_photo, url_miniature
+    try:
+        photo_preparee = preparer_photo(photo)
+    except OSError:
+        return JsonResponse({
+            'success': False,
+            'message': "L'image n'a pas pu être lue"
+        })
+    
+    profile, created = UserProfile.objects.get_or_create(user=request.user)
+    profile.photo.save(photo_preparee.name, photo_preparee, save=False)
+    profile.save(update_fields=['photo', 'updated_at'])
     
     return JsonResponse({
         'success': True,
         'message': 'Photo de profil mise à jour !',
-        'photo_url': user.photo_profil.url if user.photo_profil else None
+        'photo_url': url_miniature(profile.photo, 'grande')
     })
 
 
@@ -874,7 +983,7 @@ def supprimer_enfant(request, enfant_id):
     enfant = get_object_or_404(Enfant, id=enfant_id, parent=request.user)
     
     prenom = enfant.prenom
-    enfant.delete()
+    demander_suppression(enfant, demandee_par=request.user)
     
     return JsonResponse({
         'success': True,
@@ -891,55 +1000,9 @@ def update_preferences(request):
     """Mettre à jour toutes les préférences"""
     
     data = json.loads(request.body)
-    preferences, created = UserPreferences.objects.get_or_create(user=request.user)
-    
-    # Notifications
-    if 'notifications_email' in data:
-        preferences.notifications_email = data['notifications_email']
     
-    if 'rappels_routine' in data:
-        preferences.rappels_routine = data['rappels_routine']
-    
-    if 'alertes_forum' in data:
-        preferences.alertes_forum = data['alertes_forum']
-    
-    if 'newsletter' in data:
-        preferences.newsletter = data['newsletter']
-    
-    # Affichage
-    if 'theme' in data:
-        preferences.theme = data['theme']
-    
-    if 'taille_police' in data:
-        preferences.taille_police = data['taille_police']
-    
-    if 'langue' in data:
-        preferences.langue = data['langue']
-    
-    if 'contraste_eleve' in data:
-        preferences.contraste_eleve = data['contraste_eleve']
-    
-    # Sons
-    if 'sons_jeux' in data:
-        preferences.sons_jeux = data['sons_jeux']
-    
-    if 'musique_fond' in data:
-        preferences.musique_fond = data['musique_fond']
-    
-    if 'volume' in data:
-        preferences.volume = data['volume']
-    
-    if 'lecture_vocale' in data:
-        preferences.lecture_vocale = data['lecture_vocale']
-    
-    # Confidentialité
-    if 'visibilite_profil' in data:
-        preferences.visibilite_profil = data['visibilite_profil']
-    
-    if 'partage_donnees' in data:
-        preferences.partage_donnees = data['partage_donnees']
-    
-    preferences.save()
+    # Seuls les champs modifiés sont écrits (UPDATE ... SET champ, version), cache remplacé
+    enregistrer_preferences(request.user, {champ: data[champ] for champ in CHAMPS_PREFERENCES if champ in data})
     
     return JsonResponse({
         'success': True,
@@ -965,9 +1028,10 @@ def supprimer_compte(request):
             'message': 'Mot de passe incorrect'
         })
     
-    # Supprimer le compte
+    # Compte désactivé tout de suite, données supprimées en arrière-plan
     user = request.user
-    user.delete()
+    logout(request)
+    demander_suppression(user)
     
     return JsonResponse({
         'success': True,
@@ -977,79 +1041,52 @@ def supprimer_compte(request):
 
 
 # ===========================
-# MODÈLE USER PREFERENCES
+# SUIVI DES ACTIVITÉS (auto_tracker.js)
 # ===========================
-from django.db import models
-from django.contrib.auth.models import User
-
-class UserPreferences(models.Model):
-    """Modèle pour stocker les préférences utilisateur"""
-    
-    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='preferences')
-    
-    # Notifications
-    notifications_email = models.BooleanField(default=True)
-    rappels_routine = models.BooleanField(default=True)
-    alertes_forum = models.BooleanField(default=False)
-    newsletter = models.BooleanField(default=True)
-    
-    # Affichage
-    THEME_CHOICES = [
-        ('clair', 'Mode clair'),
-        ('sombre', 'Mode sombre'),
-        ('auto', 'Automatique'),
-    ]
-    theme = models.CharField(max_length=10, choices=THEME_CHOICES, default='clair')
-    
-    TAILLE_CHOICES = [
-        ('petite', 'Petite'),
-        ('normale', 'Normale'),
-        ('grande', 'Grande'),
-        ('tres_grande', 'Très grande'),
-    ]
-    taille_police = models.CharField(max_length=15, choices=TAILLE_CHOICES, default='normale')
-    
-    LANGUE_CHOICES = [
-        ('fr', 'Français'),
-        ('en', 'English'),
-        ('es', 'Español'),
-    ]
-    langue = models.CharField(max_length=5, choices=LANGUE_CHOICES, default='fr')
-    
-    contraste_eleve = models.BooleanField(default=False)
-    
-    # Sons
-    sons_jeux = models.BooleanField(default=True)
-    musique_fond = models.BooleanField(default=False)
-    
-    VOLUME_CHOICES = [
-        ('silencieux', 'Silencieux'),
-        ('faible', 'Faible'),
-        ('moyen', 'Moyen'),
-        ('fort', 'Fort'),
-    ]
-    volume = models.CharField(max_length=15, choices=VOLUME_CHOICES, default='moyen')
-    
-    lecture_vocale = models.BooleanField(default=False)
-    
-    # Confidentialité
-    VISIBILITE_CHOICES = [
-        ('tous', 'Tous les membres'),
-        ('amis', 'Amis uniquement'),
-        ('prive', 'Privé'),
-    ]
-    visibilite_profil = models.CharField(max_length=10, choices=VISIBILITE_CHOICES, default='tous')
-    
-    partage_donnees = models.BooleanField(default=True)
-    
-    created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
-    
-    def __str__(self):
-        return f"Préférences de {self.user.username}"
-    
-    class Meta:
-        verbose_name = "Préférence utilisateur"
-        verbose_name_plural = "Préférences utilisateur"
+@login_required
+@require_POST
+def start_activity(request):
+    """Début d'une session de jeu, écrit par lots (tampon_activites)"""
+    
+    try:
+        data = json.loads(request.body)
+        enfant_id = int(data.get('enfant_id'))
+        jeu = data.get('jeu')
+        debut = lire_horodatage(data.get('debut'))  # session jouée hors ligne, rejouée
+    except (ValueError, TypeError, AttributeError, OverflowError):
+        return JsonResponse({'success': False, 'message': 'Requête invalide'}, status=400)
+    
+    if jeu not in dict(Activite.JEUX_CHOICES):
+        return JsonResponse({'success': False, 'message': 'Jeu inconnu'}, status=400)
+    
+    if not Enfant.objects.filter(id=enfant_id, parent=request.user).exists():
+        return JsonResponse({'success': False, 'message': 'Enfant introuvable'}, status=404)
+    
+    return JsonResponse({
+        'success': True,
+        'activite_id': enregistrer_debut(request.user, enfant_id, jeu, debut),
+    })
 
 
+# sendBeacon ne peut pas envoyer d'en-tête CSRF : le jeton signé (activite_id)
+# lie la fin à l'utilisateur et à la session de jeu
+@csrf_exempt
+@login_required
+@require_POST
+def end_activity(request):
+    """Fin d'une session de jeu (JSON ou text/plain envoyé par sendBeacon)"""
+    
+    try:
+        data = json.loads(request.body)
+        jeton = data['activite_id']
+        score = data.get('score')
+        score = None if score is None else max(0, min(100, int(score)))
+        reussi = bool(data.get('reussi', True))
+        fin = lire_horodatage(data.get('fin'))
+    except (ValueError, TypeError, KeyError, AttributeError, OverflowError):
+        return JsonResponse({'success': False, 'message': 'Requête invalide'}, status=400)
+    
+    if not enregistrer_fin(request.user, jeton, score, reussi, fin):
+        return JsonResponse({'success': False, 'message': 'Session de jeu inconnue ou expirée'}, status=400)
+    
+    return JsonResponse({'success': True})
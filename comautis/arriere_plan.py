@@ -0,0 +1,47 @@
+"""
+Thread d'arrière-plan par process pour les tâches enregistrées en base.
+
+Travailleur(nom, tache) : la tâche (ex : suppressions.executer_en_attente) lit
+elle-même en base ce qui reste à faire ; le thread la lance à chaque réveil
+(reveiller(), typiquement dans transaction.on_commit) et toutes les `intervalle`
+secondes pour reprendre le travail d'un worker arrêté.
+Démarré au premier réveil, jamais dans le master gunicorn avant le fork :
+post_fork le réveille dans chaque worker (demarrage.reprendre_taches).
+"""
+import logging
+import threading
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class Travailleur:
+
+    def __init__(self, nom, tache, intervalle=600):
+        self.nom = nom
+        self.tache = tache
+        self.intervalle = intervalle
+        self._verrou = threading.Lock()
+        self._reveil = threading.Event()
+        self._thread = None
+
+    def reveiller(self):
+        if self._thread is None:
+            with self._verrou:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self.boucle, daemon=True, name=self.nom)
+                    self._thread.start()
+        self._reveil.set()
+
+    def boucle(self):
+        while True:
+            self._reveil.wait(self.intervalle() if callable(self.intervalle) else self.intervalle)
+            self._reveil.clear()
+            close_old_connections()
+            try:
+                self.tache()
+            except Exception:
+                logger.exception("Erreur du thread %s", self.nom)
+            finally:
+                close_old_connections()
@@ -0,0 +1,128 @@
+"""
+Réglages SQLite pour les installations mono-serveur (db.sqlite3).
+
+- configurer_connexion() : branché sur connection_created, applique les PRAGMA
+  de settings.SQLITE_PRAGMAS (WAL, busy_timeout...) à chaque nouvelle connexion.
+- ecriture_exclusive() / EcrivainUniqueMiddleware : file d'attente d'écriture
+  optionnelle (SQLITE_ECRIVAIN_UNIQUE). Les requêtes qui écrivent passent une
+  par une, tous process gunicorn confondus ; les lectures restent parallèles.
+"""
+import re
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+try:
+    import fcntl
+except ImportError:  # Windows : la file d'attente reste limitée au process courant
+    fcntl = None
+
+PRAGMAS_PAR_DEFAUT = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,
+    'synchronous': 'NORMAL',
+    'mmap_size': 134217728,
+    'cache_size': -20000,
+}
+
+# Nom de PRAGMA et valeur simple (mot-clé ou entier) : rien d'autre n'est interpolé
+PRAGMA_VALIDE = re.compile(r'^-?\w+$')
+
+METHODES_SANS_ECRITURE = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+def get_pragmas():
+    return getattr(settings, 'SQLITE_PRAGMAS', PRAGMAS_PAR_DEFAUT)
+
+
+def appliquer_pragmas(curseur, pragmas):
+    """Exécute les PRAGMA sur un curseur (Django ou sqlite3 brut)"""
+    for nom, valeur in pragmas.items():
+        if not (PRAGMA_VALIDE.match(nom) and PRAGMA_VALIDE.match(str(valeur))):
+            raise ValueError(f"PRAGMA SQLite invalide : {nom} = {valeur}")
+        curseur.execute(f'PRAGMA {nom} = {valeur}')
+
+
+def configurer_connexion(sender, connection, **kwargs):
+    """Récepteur de connection_created"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as curseur:
+        appliquer_pragmas(curseur, get_pragmas())
+
+
+# ========== FILE D'ATTENTE D'ÉCRITURE ==========
+
+_verrous_threads = {}
+_verrous_threads_lock = threading.Lock()
+_etat = threading.local()
+
+
+def _verrou_thread(chemin):
+    with _verrous_threads_lock:
+        return _verrous_threads.setdefault(chemin, threading.Lock())
+
+
+@contextmanager
+def verrou_fichier(chemin):
+    """
+    Verrou exclusif entre threads (Lock) et entre process (flock sur un fichier)
+    Le fichier est rouvert à chaque fois : un descripteur hérité du master
+    gunicorn partagerait son verrou avec tous les workers
+    """
+    with _verrou_thread(chemin):
+        with open(chemin, 'a+b') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def ecrivain_unique_actif(using='default'):
+    connexion = connections[using]
+    return (
+        getattr(settings, 'SQLITE_ECRIVAIN_UNIQUE', False)
+        and connexion.vendor == 'sqlite'
+        and not connexion.is_in_memory_db()
+    )
+
+
+@contextmanager
+def ecriture_exclusive(using='default'):
+    """
+    Attend son tour dans la file d'écriture (sans effet si le mode est désactivé)
+    Utilisable aussi comme décorateur : @ecriture_exclusive()
+    """
+    if getattr(_etat, 'dans_file', False) or not ecrivain_unique_actif(using):
+        # Déjà dans la file (appel imbriqué) ou mode désactivé
+        yield
+        return
+
+    chemin = f"{connections[using].settings_dict['NAME']}.ecriture.lock"
+    with verrou_fichier(chemin):
+        _etat.dans_file = True
+        try:
+            yield
+        finally:
+            _etat.dans_file = False
+
+
+class EcrivainUniqueMiddleware:
+    """Place les requêtes POST/PUT/PATCH/DELETE dans la file d'écriture"""
+
+    def __init__(self, get_response):
+        if not ecrivain_unique_actif():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method in METHODES_SANS_ECRITURE:
+            return self.get_response(request)
+        with ecriture_exclusive():
+            return self.get_response(request)
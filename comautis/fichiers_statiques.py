@@ -0,0 +1,251 @@
+"""
+Service des fichiers statiques directement par l'application WSGI.
+
+Render (plan gratuit) lance seulement gunicorn, sans serveur web devant :
+- collectstatic produit des noms hachés + des variantes .gz / .br
+- le middleware sert la meilleure variante avec des en-têtes de cache longs,
+  gère les requêtes Range (histoires MP3) et laisse gunicorn utiliser sendfile.
+"""
+import gzip
+import mimetypes
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+
+try:
+    import brotli
+except ImportError:  # brotli est optionnel : seul gzip sera généré
+    brotli = None
+
+# Extensions qui gagnent à être compressées (les médias sont déjà compressés)
+EXTENSIONS_COMPRESSIBLES = (
+    '.css', '.js', '.json', '.svg', '.html', '.txt', '.xml', '.map', '.ico',
+)
+
+# Nom haché par ManifestStaticFilesStorage ou par nos commandes : nom.<12 hex>.ext
+NOM_HACHE = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+# Types absents de certaines tables mimetypes système
+mimetypes.add_type('audio/ogg', '.opus')
+mimetypes.add_type('image/webp', '.webp')
+
+CACHE_IMMUABLE = 'public, max-age=31536000, immutable'
+CACHE_COURT = 'public, max-age=60'
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def encodages_acceptes(en_tete, proposes):
+    """Encodages de `proposes` (ordre conservé) acceptés par Accept-Encoding : q > 0, nommés ou via *"""
+    qualites = {}
+    for element in en_tete.split(','):
+        nom, _, parametres = element.partition(';')
+        nom = nom.strip().lower()
+        if not nom:
+            continue
+        qualite = 1.0
+        for parametre in parametres.split(';'):
+            cle, _, valeur = parametre.partition('=')
+            if cle.strip().lower() == 'q':
+                try:
+                    qualite = float(valeur)
+                except ValueError:
+                    qualite = 0.0
+        qualites[nom] = qualite
+    return [encodage for encodage in proposes if qualites.get(encodage, qualites.get('*', 0)) > 0]
+
+
+def compresser_fichier(chemin):
+    """Écrit chemin.gz et chemin.br (si brotli est installé) quand c'est rentable"""
+    with open(chemin, 'rb') as f:
+        contenu = f.read()
+    if not contenu:
+        return
+
+    variantes = [('.gz', lambda c: gzip.compress(c, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variantes.append(('.br', lambda c: brotli.compress(c, quality=11)))
+
+    for suffixe, compresser in variantes:
+        compresse = compresser(contenu)
+        # Inutile de garder une variante qui économise moins de 5 %
+        if len(compresse) < len(contenu) * 0.95:
+            with open(chemin + suffixe, 'wb') as f:
+                f.write(compresse)
+
+
+class StockageStatiqueCompresse(ManifestStaticFilesStorage):
+    """Noms hachés (manifest) + variantes gzip/brotli générées au collectstatic"""
+
+    # Un fichier absent du manifest garde son nom d'origine au lieu de lever une erreur
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # Fichier absent de STATIC_ROOT (collectstatic pas encore lancé)
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+
+        noms = set(paths) | set(self.hashed_files.values())
+        for nom in noms:
+            if nom.lower().endswith(EXTENSIONS_COMPRESSIBLES) and self.exists(nom):
+                compresser_fichier(self.path(nom))
+
+
+class LecteurPartiel:
+    """
+    Limite la lecture d'un fichier à une plage d'octets (requêtes Range)
+    fileno() et tell() restent exposés pour que gunicorn puisse utiliser sendfile
+    """
+
+    def __init__(self, fichier, debut, longueur):
+        self.fichier = fichier
+        self.restant = longueur
+        fichier.seek(debut)
+
+    def read(self, taille=-1):
+        if self.restant <= 0:
+            return b''
+        if taille is None or taille < 0 or taille > self.restant:
+            taille = self.restant
+        donnees = self.fichier.read(taille)
+        self.restant -= len(donnees)
+        return donnees
+
+    def fileno(self):
+        return self.fichier.fileno()
+
+    def tell(self):
+        return self.fichier.tell()
+
+    def seekable(self):
+        return False
+
+    def close(self):
+        self.fichier.close()
+
+
+class ServeurStatiqueMiddleware:
+    """Sert STATIC_URL depuis STATIC_ROOT avant le reste de la pile Django"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefixe = settings.STATIC_URL
+        self.racine = str(settings.STATIC_ROOT)
+        # None : hors DEBUG seulement (en développement, les finders servent les sources à jour)
+        actif = getattr(settings, 'STATIQUES_SERVIS_PAR_APP', None)
+        self.actif = not settings.DEBUG if actif is None else actif
+
+    def __call__(self, request):
+        if self.actif and request.path.startswith(self.prefixe) and request.method in ('GET', 'HEAD'):
+            response = self.servir(request, request.path[len(self.prefixe):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def servir(self, request, nom):
+        try:
+            chemin = safe_join(self.racine, nom)
+        except Exception:
+            return None
+        if not os.path.isfile(chemin):
+            return None
+
+        content_type, _ = mimetypes.guess_type(chemin)
+        content_type = content_type or 'application/octet-stream'
+        plage = request.META.get('HTTP_RANGE')
+
+        # Variante précompressée (jamais pour une requête Range : octets de l'original)
+        encodage = None
+        chemin_servi = chemin
+        if not plage:
+            accepte = encodages_acceptes(request.META.get('HTTP_ACCEPT_ENCODING', ''), ('br', 'gzip'))
+            for suffixe, nom_encodage in (('.br', 'br'), ('.gz', 'gzip')):
+                if nom_encodage in accepte and os.path.isfile(chemin + suffixe):
+                    chemin_servi = chemin + suffixe
+                    encodage = nom_encodage
+                    break
+
+        stat = os.stat(chemin_servi)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{"-" + encodage if encodage else ""}"'
+
+        if self.non_modifie(request, etag, stat.st_mtime):
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            self.en_tetes_cache(response, nom)
+            return response
+
+        fichier = open(chemin_servi, 'rb')
+        taille = stat.st_size
+
+        if plage:
+            debut, fin = self.lire_plage(plage, taille)
+            if debut is None:
+                fichier.close()
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{taille}'
+                return response
+            longueur = fin - debut + 1
+            response = FileResponse(LecteurPartiel(fichier, debut, longueur), content_type=content_type, status=206)
+            response['Content-Range'] = f'bytes {debut}-{fin}/{taille}'
+            response['Content-Length'] = str(longueur)
+        else:
+            response = FileResponse(fichier, content_type=content_type)
+            response['Content-Length'] = str(taille)
+
+        if encodage:
+            response['Content-Encoding'] = encodage
+        if os.path.isfile(chemin + '.gz') or os.path.isfile(chemin + '.br'):
+            response['Vary'] = 'Accept-Encoding'
+        response['Accept-Ranges'] = 'bytes'
+        response['ETag'] = etag
+        response['Last-Modified'] = formatdate(stat.st_mtime, usegmt=True)
+        self.en_tetes_cache(response, nom)
+        return response
+
+    def en_tetes_cache(self, response, nom):
+        response['Cache-Control'] = CACHE_IMMUABLE if NOM_HACHE.search(nom) else CACHE_COURT
+
+    @staticmethod
+    def non_modifie(request, etag, mtime):
+        si_aucun = request.META.get('HTTP_IF_NONE_MATCH')
+        if si_aucun is not None:
+            return etag in [e.strip() for e in si_aucun.split(',')] or si_aucun.strip() == '*'
+        si_modifie = request.META.get('HTTP_IF_MODIFIED_SINCE')
+        if si_modifie:
+            try:
+                return int(mtime) <= parsedate_to_datetime(si_modifie).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    @staticmethod
+    def lire_plage(plage, taille):
+        """Retourne (début, fin) inclusifs, ou (None, None) si la plage est invalide"""
+        match = RANGE.match(plage.strip())
+        if not match or taille == 0:
+            return None, None
+        debut, fin = match.groups()
+        if debut == '':
+            # bytes=-500 : les 500 derniers octets
+            if fin == '' or int(fin) == 0:
+                return None, None
+            debut = max(0, taille - int(fin))
+            fin = taille - 1
+        else:
+            debut = int(debut)
+            fin = taille - 1 if fin == '' else min(int(fin), taille - 1)
+        if debut > fin or debut >= taille:
+            return None, None
+        return debut, fin
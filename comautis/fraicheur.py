@@ -0,0 +1,152 @@
+"""
+GET conditionnels (ETag / Last-Modified) pour les pages coûteuses à construire.
+
+@conditionnel(validateur) : avant d'exécuter la vue, le validateur lit en une
+requête ce dont dépend la page (dernière activité des enfants, dernier message
+du sujet, version des notifications...). Si le navigateur a déjà cette version
+(If-None-Match), la réponse est un 304 sans calcul de statistiques ni rendu.
+
+L'ETag couvre aussi l'utilisateur, son jeton CSRF, la date du jour (statistiques
+« aujourd'hui », séries) et la version des gabarits. Pas d'ETag (vue exécutée
+normalement) hors GET/HEAD ou quand des messages flash attendent d'être affichés.
+"""
+import hashlib
+from datetime import datetime, time, timezone as dt_timezone
+from functools import lru_cache, wraps
+
+from django.conf import settings
+from django.db.models import Count, F, Func, Max, OuterRef, Subquery
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+METHODES_CONDITIONNELLES = ('GET', 'HEAD')
+
+
+@lru_cache(maxsize=1)
+def version_gabarits():
+    """Date de modification du gabarit le plus récent (un déploiement change l'ETag)"""
+    dates = [chemin.stat().st_mtime for chemin in settings.BASE_DIR.glob('*/templates/**/*.html')]
+    return datetime.fromtimestamp(max(dates, default=0), tz=dt_timezone.utc)
+
+
+def sous_agregat(queryset, fonction, champ):
+    """Sous-requête scalaire FONCTION(champ) sur queryset (sans GROUP BY)"""
+    return Subquery(queryset.order_by().annotate(valeur=Func(F(champ), function=fonction)).values('valeur')[:1])
+
+
+# ========== VALIDATEURS ==========
+# (valeurs qui changent quand la page change, date de dernière modification) ou None
+
+def etat_espace_parent(request):
+    """dashboard, progression : profil, enfants, activités et notifications du parent"""
+    from django.contrib.auth.models import User
+
+    from authen.models import Activite, Enfant, Notification, UserProfile
+
+    if request.user.is_staff or request.user.is_superuser:
+        return None  # redirigés vers le tableau de bord admin
+
+    activites = Activite.objects.filter(enfant__parent=OuterRef('pk'))
+    enfants = Enfant.objects.filter(parent=OuterRef('pk'))
+    notifications = Notification.objects.filter(user=OuterRef('pk'))
+    etat = User.objects.filter(pk=request.user.pk).annotate(
+        profil_modifie=sous_agregat(UserProfile.objects.filter(user=OuterRef('pk')), 'MAX', 'updated_at'),
+        nombre_enfants=sous_agregat(enfants, 'COUNT', 'id'),
+        enfant_modifie=sous_agregat(enfants, 'MAX', 'updated_at'),
+        nombre_activites=sous_agregat(activites, 'COUNT', 'id'),
+        activite_creee=sous_agregat(activites, 'MAX', 'created_at'),
+        activite_terminee=sous_agregat(activites, 'MAX', 'date_fin'),
+        minutes=sous_agregat(activites, 'SUM', 'duree_minutes'),
+        notifications_non_lues=sous_agregat(notifications.filter(is_read=False), 'COUNT', 'id'),
+        derniere_notification=sous_agregat(notifications, 'MAX', 'id'),
+    ).values(
+        'profil_modifie', 'nombre_enfants', 'enfant_modifie', 'nombre_activites', 'activite_creee',
+        'activite_terminee', 'minutes', 'notifications_non_lues', 'derniere_notification',
+    ).first()
+    if etat is None:
+        return None
+    return etat, [etat['profil_modifie'], etat['enfant_modifie'], etat['activite_creee'], etat['activite_terminee']]
+
+
+def etat_liste_sujets(request):
+    """forum:topic_list : sujets (nombre, dernier créé)"""
+    from forum.models import Topic
+
+    etat = Topic.objects.aggregate(sujets=Count('id'), dernier_sujet=Max('id'), dernier_cree=Max('created_at'))
+    return etat, [etat['dernier_cree']]
+
+
+def etat_sujet(request, topic_id):
+    """forum:topic_detail : le sujet et ses messages (nombre, dernier posté)"""
+    from forum.models import Topic
+
+    etat = Topic.objects.filter(pk=topic_id).values('title', 'icon', 'category').annotate(
+        messages=Count('post'), dernier_message=Max('post__id'), dernier_poste=Max('post__created_at'),
+    ).order_by('pk').first()
+    if etat is None:
+        return None  # 404 rendu par la vue
+    return etat, [etat['dernier_poste']]
+
+
+# ========== DÉCORATEUR ==========
+
+def messages_en_attente(request):
+    stockage = getattr(request, '_messages', None)
+    return stockage is not None and len(stockage) > 0
+
+
+def calculer(request, vue, valeurs, dates):
+    """(ETag, Last-Modified) à partir de l'état lu par le validateur"""
+    aujourd_hui = timezone.localdate()
+    user = request.user
+    commun = [
+        vue, user.pk, user.get_username(), getattr(user, 'first_name', ''), getattr(user, 'last_name', ''),
+        # Le jeton CSRF des formulaires change à la connexion
+        hashlib.sha1(request.META.get('CSRF_COOKIE', '').encode()).hexdigest()[:8],
+        aujourd_hui.isoformat(), version_gabarits().isoformat(),
+    ]
+    brut = repr((commun, sorted(valeurs.items())))
+    etag = f'"{hashlib.sha1(brut.encode()).hexdigest()[:20]}"'
+
+    # Les statistiques du jour changent à minuit ; le navigateur envoie aussi If-None-Match,
+    # prioritaire sur If-Modified-Since (suppressions)
+    debut_du_jour = timezone.make_aware(datetime.combine(aujourd_hui, time.min))
+    derniere = max([d for d in dates if d is not None] + [debut_du_jour, version_gabarits()])
+    return etag, derniere
+
+
+def conditionnel(validateur):
+    """Réponse 304 si la page n'a pas changé depuis la version du navigateur"""
+
+    def etat(vue, request, *args, **kwargs):
+        # Calculé une fois : condition() appelle les fonctions Last-Modified puis ETag
+        if not hasattr(request, '_fraicheur'):
+            request._fraicheur = None
+            if request.method in METHODES_CONDITIONNELLES and not messages_en_attente(request):
+                resultat = validateur(request, *args, **kwargs)
+                if resultat is not None:
+                    request._fraicheur = calculer(request, vue.__name__, *resultat)
+        return request._fraicheur
+
+    def decorateur(vue):
+        def etag(request, *args, **kwargs):
+            valeurs = etat(vue, request, *args, **kwargs)
+            return valeurs and valeurs[0]
+
+        def derniere_modification(request, *args, **kwargs):
+            valeurs = etat(vue, request, *args, **kwargs)
+            return valeurs and valeurs[1]
+
+        vue_conditionnelle = condition(etag_func=etag, last_modified_func=derniere_modification)(vue)
+
+        @wraps(vue)
+        def enveloppe(request, *args, **kwargs):
+            response = vue_conditionnelle(request, *args, **kwargs)
+            if response.has_header('ETag'):
+                # Page propre à l'utilisateur, toujours revalidée (pas de fraîcheur heuristique)
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return enveloppe
+    return decorateur
+
@@ -0,0 +1,82 @@
+"""
+Outils communs aux journaux de diagnostic (requêtes lentes, mémoire, profils).
+
+- journal_tournant() : logger dédié qui écrit un message par ligne (JSON Lines)
+  dans un fichier tournant, créé au premier enregistrement. Le fichier est
+  partagé par les workers gunicorn (JournalPartage) : chacun écrit en ajout et
+  rouvre le fichier quand un autre l'a fait tourner, aucune ligne n'est perdue.
+- fichier_projet() : repère les fichiers du projet dans une pile d'appels,
+  hors Django et bibliothèques installées.
+"""
+import logging
+import os
+import threading
+from logging.handlers import WatchedFileHandler
+from pathlib import Path
+
+from django.conf import settings
+
+from comautis.base_sqlite import verrou_fichier
+
+_BASE_DIR = str(settings.BASE_DIR)
+_verrou = threading.Lock()
+
+
+def fichier_projet(fichier):
+    """Chemin relatif à BASE_DIR d'un fichier du projet, None pour les autres"""
+    if fichier.startswith(_BASE_DIR) and 'site-packages' not in fichier:
+        return fichier[len(_BASE_DIR) + 1:]
+    return None
+
+
+class JournalPartage(WatchedFileHandler):
+    """
+    Fichier tournant partagé entre process : RotatingFileHandler ferait tourner
+    le fichier dans chaque worker, qui continuerait d'écrire dans son ancien
+    descripteur (lignes perdues ou archives écrasées). Ici le premier process qui
+    voit la taille dépassée fait tourner les fichiers sous verrou (flock) ; les
+    autres, comme lui, rouvrent le chemin à leur écriture suivante.
+    """
+
+    def __init__(self, chemin, taille_max, archives):
+        super().__init__(chemin, encoding='utf-8')
+        self.taille_max = taille_max
+        self.archives = archives
+
+    def emit(self, record):
+        super().emit(record)
+        if self.taille_max and self.stream and os.fstat(self.stream.fileno()).st_size >= self.taille_max:
+            self.faire_tourner()
+
+    def faire_tourner(self):
+        with verrou_fichier(f'{self.baseFilename}.lock'):
+            try:
+                # Un autre process l'a peut-être fait tourner entre-temps
+                if os.stat(self.baseFilename).st_size < self.taille_max:
+                    return
+            except FileNotFoundError:
+                return
+            if not self.archives:
+                os.remove(self.baseFilename)
+                return
+            for numero in range(self.archives - 1, 0, -1):
+                source = f'{self.baseFilename}.{numero}'
+                if os.path.exists(source):
+                    os.replace(source, f'{self.baseFilename}.{numero + 1}')
+            os.replace(self.baseFilename, f'{self.baseFilename}.1')
+
+
+def journal_tournant(nom, chemin, taille_max=5 * 1024 * 1024, archives=3):
+    """Logger `nom` écrivant dans le fichier tournant `chemin` (handler posé une seule fois par process)"""
+    journal = logging.getLogger(nom)
+    if not journal.handlers:
+        with _verrou:
+            if not journal.handlers:
+                chemin = Path(chemin)
+                chemin.parent.mkdir(parents=True, exist_ok=True)
+                handler = JournalPartage(chemin, taille_max, archives)
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                journal.addHandler(handler)
+                journal.setLevel(logging.INFO)
+                journal.propagate = False
+    return journal
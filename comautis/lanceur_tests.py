@@ -0,0 +1,52 @@
+"""
+Lanceur de la suite de tests (TEST_RUNNER)
+
+Réglages communs à tous les tests, posés une fois pour toute la suite :
+- cache en mémoire du process au lieu du cache fichier BASE_DIR/.cache
+- journal des requêtes lentes coupé ; journaux, profils, archives et médias
+  dans un dossier temporaire (rien n'est écrit dans journaux/ ni media/)
+- manifest de précache minimal : le service worker ne le recalcule pas et ne lit
+  pas celui de STATIC_ROOT
+- hachage de mot de passe rapide
+
+Une classe de test qui a besoin d'autre chose le précise avec override_settings.
+"""
+import json
+import tempfile
+from pathlib import Path
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+def reglages_tests(dossier):
+    """Réglages de test, fichiers sous dossier"""
+    dossier = Path(dossier)
+    return {
+        'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        'PASSWORD_HASHERS': ['django.contrib.auth.hashers.MD5PasswordHasher'],
+        'REQUETES_LENTES_ACTIF': False,
+        'REQUETES_LENTES_JOURNAL': dossier / 'journaux' / 'requetes_lentes.jsonl',
+        'MEMOIRE_JOURNAL': dossier / 'journaux' / 'memoire.jsonl',
+        'PROFILAGE_DOSSIER': dossier / 'profils',
+        'ACTIVITES_ARCHIVES_DOSSIER': dossier / 'archives' / 'activites',
+        'MEDIA_ROOT': dossier / 'media',
+        'PRECACHE_MANIFEST': dossier / 'precache.json',
+    }
+
+
+class LanceurTests(DiscoverRunner):
+    """DiscoverRunner avec les réglages de reglages_tests() dans un dossier temporaire"""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._dossier = tempfile.TemporaryDirectory(prefix='comautis-tests-')
+        reglages = reglages_tests(self._dossier.name)
+        reglages['PRECACHE_MANIFEST'].write_text(json.dumps({'version': 'tests', 'entrees': []}), encoding='utf-8')
+        self._reglages = override_settings(**reglages)
+        self._reglages.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._reglages.disable()
+        self._dossier.cleanup()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,143 @@
+"""
+Limitation de débit par route (seaux à jetons dans le cache configuré).
+
+Chaque urls.py déclare ses limites à côté de ses routes :
+
+    LIMITES = {
+        'add_reaction': [Limite('30/min', rafale=10), Limite('120/min', par='ip')],
+    }
+
+LimitationMiddleware les lit dans tous les URLconf inclus (préfixées par leur
+namespace) et, avant la vue, consomme un jeton par limite : au-delà, réponse 429
+avec Retry-After, sans requête SQL (l'utilisateur est lu dans la session, pas
+en base).
+
+Seau à jetons en formulation GCRA : une seule valeur par clé (l'heure à laquelle
+le seau sera de nouveau plein), lue et écrite dans le cache. Sans verrou entre
+workers : deux requêtes simultanées peuvent consommer le même jeton, la limite
+reste approximative à quelques requêtes près.
+"""
+import logging
+import math
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse, JsonResponse
+from django.urls import URLResolver, get_resolver
+
+logger = logging.getLogger(__name__)
+
+PERIODES = {'s': 1, 'min': 60, 'h': 3600, 'j': 86400}
+
+# Refus depuis le démarrage du process, par route
+refus = Counter()
+
+
+class Limite:
+    """
+    debit : 'nombre/période' (s, min, h, j), rafale : jetons disponibles d'un coup (défaut : nombre)
+    par : 'utilisateur' (compte connecté, sinon IP) ou 'ip'
+    """
+
+    def __init__(self, debit, rafale=None, par='utilisateur', methodes=('POST',)):
+        nombre, periode = debit.split('/')
+        self.debit = debit
+        self.intervalle = PERIODES[periode] / int(nombre)  # secondes par jeton
+        self.rafale = rafale or int(nombre)
+        self.par = par
+        self.methodes = methodes
+
+    def __repr__(self):
+        return f"Limite({self.debit!r}, rafale={self.rafale}, par={self.par!r})"
+
+    def cle(self, request, vue):
+        utilisateur = self.par == 'utilisateur' and request.session.get(SESSION_KEY)
+        client = f'u{utilisateur}' if utilisateur else f'ip{adresse_ip(request)}'
+        return f'limite:{vue}:{self.debit}:{client}'
+
+    def consommer(self, cache, cle, maintenant):
+        """Secondes à attendre avant le prochain jeton (0 : requête acceptée, jeton consommé)"""
+        plein_a = max(cache.get(cle) or maintenant, maintenant)
+        nouveau = plein_a + self.intervalle
+        attente = nouveau - maintenant - self.rafale * self.intervalle
+        if attente > 0:
+            return attente
+        cache.set(cle, nouveau, timeout=math.ceil(nouveau - maintenant) + 1)
+        return 0
+
+
+def adresse_ip(request):
+    # Derrière un proxy : LIMITATION_EN_TETE_IP = 'HTTP_X_FORWARDED_FOR' (première adresse)
+    valeur = request.META.get(getattr(settings, 'LIMITATION_EN_TETE_IP', 'REMOTE_ADDR'), '')
+    return valeur.split(',')[0].strip() or request.META.get('REMOTE_ADDR', '')
+
+
+# ========== LIMITES DÉCLARÉES ==========
+
+_limites = None
+
+
+def collecter(resolver, namespace=''):
+    limites = {}
+    for nom, regles in getattr(resolver.urlconf_module, 'LIMITES', {}).items():
+        limites[f'{namespace}{nom}'] = regles if isinstance(regles, (list, tuple)) else [regles]
+    for motif in resolver.url_patterns:
+        if isinstance(motif, URLResolver):
+            sous_namespace = f'{namespace}{motif.namespace}:' if motif.namespace else namespace
+            limites.update(collecter(motif, sous_namespace))
+    return limites
+
+
+def get_limites():
+    """{view_name: [Limite]} de tous les URLconf, lu une fois"""
+    global _limites
+    if _limites is None:
+        _limites = collecter(get_resolver())
+    return _limites
+
+
+# ========== MIDDLEWARE ==========
+
+def trop_de_requetes(request, attente):
+    secondes = math.ceil(attente)
+    message = f"Trop de requêtes, réessayez dans {secondes} s."
+    if 'application/json' in request.headers.get('Accept', '') or request.content_type == 'application/json':
+        response = JsonResponse({'success': False, 'message': message}, status=429)
+    else:
+        response = HttpResponse(message, status=429, content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = str(secondes)
+    return response
+
+
+class LimitationMiddleware:
+    """429 avant la vue quand une limite de la route est dépassée"""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'LIMITATION_ACTIF', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, vue, args, kwargs):
+        nom = request.resolver_match.view_name
+        limites = get_limites().get(nom)
+        if not limites:
+            return None
+
+        cache = caches[getattr(settings, 'LIMITATION_CACHE', 'default')]
+        maintenant = time.time()
+        for limite in limites:
+            if request.method not in limite.methodes:
+                continue
+            attente = limite.consommer(cache, limite.cle(request, nom), maintenant)
+            if attente:
+                refus[nom] += 1
+                logger.info("429 %s (%r)", nom, limite)
+                return trop_de_requetes(request, attente)
+        return None
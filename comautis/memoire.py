@@ -0,0 +1,200 @@
+"""
+Pic de mémoire Python par requête et par vue (tracemalloc).
+
+- Mesure : trace les allocations d'un bloc de code, relève le pic et, si le pic
+  dépasse MEMOIRE_SEUIL_MO, les lignes du projet qui tenaient le plus de mémoire
+  au moment du pic (instantané pris par un thread de surveillance).
+- MemoireMiddleware : mesure une proportion MEMOIRE_ECHANTILLON des requêtes,
+  ajoute l'en-tête X-Pic-Memoire et journalise en JSON (MEMOIRE_JOURNAL) celles
+  qui dépassent le seuil.
+- mesurer_vues --memoire : pic par vue enregistré dans l'historique, à côté des latences.
+
+tracemalloc est global au process : les chiffres sont exacts avec des workers
+synchrones (gunicorn par défaut), approximatifs sur un serveur à threads.
+"""
+import json
+import random
+import threading
+import tracemalloc
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+
+from comautis.journaux import fichier_projet, journal_tournant
+
+# Une seule mesure à la fois : tracemalloc.start/stop est global au process
+_verrou_mesure = threading.Lock()
+
+
+def get_seuil_octets():
+    return getattr(settings, 'MEMOIRE_SEUIL_MO', 20) * 1024 * 1024
+
+
+# ========== SITES D'ALLOCATION ==========
+
+def site(traceback):
+    """'chemin:ligne' de la frame du projet la plus récente, sinon de la plus ancienne relevée"""
+    for frame in reversed(traceback):
+        fichier = fichier_projet(frame.filename) if frame.filename != __file__ else None
+        if fichier:
+            return f"{fichier}:{frame.lineno}"
+    frame = traceback[0]
+    fichier = frame.filename.split('site-packages/', 1)[-1]
+    return f"{fichier}:{frame.lineno}"
+
+
+def sites_principaux(instantane, limite=10):
+    """[{'site', 'ko', 'blocs'}] des lignes qui tiennent le plus de mémoire dans l'instantané"""
+    tailles, blocs = Counter(), Counter()
+    for stat in instantane.statistics('traceback'):
+        cle = site(stat.traceback)
+        tailles[cle] += stat.size
+        blocs[cle] += stat.count
+    return [
+        {'site': cle, 'ko': round(taille / 1024, 1), 'blocs': blocs[cle]}
+        for cle, taille in tailles.most_common(limite)
+    ]
+
+
+class Surveillant(threading.Thread):
+    """Relève la mémoire tracée et garde un instantané pris au plus près du pic"""
+
+    def __init__(self, intervalle, seuil):
+        super().__init__(daemon=True, name='memoire')
+        self.intervalle = intervalle
+        self.seuil = seuil
+        self.instantane = None
+        self.taille_instantane = 0
+        self.arret = threading.Event()
+
+    def run(self):
+        while not self.arret.wait(self.intervalle):
+            courante = tracemalloc.get_traced_memory()[0]
+            # Nouvel instantané seulement si la mémoire a nettement monté (un instantané coûte cher)
+            if courante >= self.seuil and courante > self.taille_instantane * 1.2:
+                self.instantane = tracemalloc.take_snapshot()
+                self.taille_instantane = courante
+
+    def arreter(self):
+        self.arret.set()
+        self.join()
+
+
+# ========== MESURE ==========
+
+class Mesure:
+    """
+    with Mesure() as mesure: ...  puis mesure.pic_ko et mesure.sites
+    Ne trace que les allocations faites dans le bloc (tracemalloc redémarré).
+    mesure.active est False si une autre mesure est en cours ou tracemalloc déjà utilisé.
+    """
+
+    def __init__(self, seuil=None, sites=True):
+        self.seuil = get_seuil_octets() if seuil is None else seuil
+        self.avec_sites = sites
+        self.active = False
+        self.pic_ko = None
+        self.sites = []
+        self.surveillant = None
+
+    def __enter__(self):
+        if tracemalloc.is_tracing() or not _verrou_mesure.acquire(blocking=False):
+            return self
+        self.active = True
+        tracemalloc.start(getattr(settings, 'MEMOIRE_PROFONDEUR', 25))
+        if self.avec_sites:
+            self.surveillant = Surveillant(getattr(settings, 'MEMOIRE_INTERVALLE_MS', 10) / 1000, self.seuil)
+            self.surveillant.start()
+        return self
+
+    def __exit__(self, *exc):
+        if not self.active:
+            return False
+        try:
+            if self.surveillant:
+                self.surveillant.arreter()
+            pic = tracemalloc.get_traced_memory()[1]
+            self.pic_ko = round(pic / 1024, 1)
+            if self.surveillant and self.surveillant.instantane is not None and pic >= self.seuil:
+                self.sites = sites_principaux(self.surveillant.instantane)
+        finally:
+            tracemalloc.stop()
+            _verrou_mesure.release()
+        return False
+
+
+# ========== PAR VUE ==========
+
+# Pics relevés par ce process, par vue
+_par_vue = {}
+_par_vue_lock = threading.Lock()
+
+
+def noter(vue, pic_ko):
+    with _par_vue_lock:
+        stats = _par_vue.setdefault(vue, {'nombre': 0, 'total_ko': 0.0, 'max_ko': 0.0})
+        stats['nombre'] += 1
+        stats['total_ko'] += pic_ko
+        stats['max_ko'] = max(stats['max_ko'], pic_ko)
+
+
+def statistiques():
+    """{vue: {'nombre', 'moyenne_ko', 'max_ko'}} depuis le démarrage du process, du plus gros pic au plus petit"""
+    with _par_vue_lock:
+        copie = {vue: dict(stats) for vue, stats in _par_vue.items()}
+    return {
+        vue: {'nombre': s['nombre'], 'moyenne_ko': round(s['total_ko'] / s['nombre'], 1), 'max_ko': s['max_ko']}
+        for vue, s in sorted(copie.items(), key=lambda item: item[1]['max_ko'], reverse=True)
+    }
+
+
+# ========== JOURNAL ==========
+
+def get_journal():
+    """Logger dédié, fichier tournant créé au premier enregistrement"""
+    return journal_tournant(
+        'comautis.memoire',
+        getattr(settings, 'MEMOIRE_JOURNAL', settings.BASE_DIR / 'journaux' / 'memoire.jsonl'),
+    )
+
+
+# ========== MIDDLEWARE ==========
+
+class MemoireMiddleware:
+    """
+    Pic mémoire d'une partie des requêtes (MEMOIRE_ECHANTILLON entre 0 et 1)
+    Pic par vue en mémoire du process : statistiques()
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'MEMOIRE_ACTIF', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.echantillon = getattr(settings, 'MEMOIRE_ECHANTILLON', 1.0)
+
+    def __call__(self, request):
+        if random.random() >= self.echantillon:
+            return self.get_response(request)
+
+        with Mesure() as mesure:
+            response = self.get_response(request)
+        if not mesure.active:
+            return response
+
+        vue = getattr(request, 'resolver_match', None)
+        vue = vue.view_name if vue else request.path
+        noter(vue, mesure.pic_ko)
+        response['X-Pic-Memoire'] = f'{mesure.pic_ko} Ko'
+        if mesure.sites:
+            get_journal().info(json.dumps({
+                'date': timezone.now().isoformat(),
+                'vue': vue,
+                'chemin': request.get_full_path(),
+                'statut': response.status_code,
+                'pic_ko': mesure.pic_ko,
+                'sites': mesure.sites,
+            }, ensure_ascii=False))
+        return response
+
@@ -0,0 +1,118 @@
+"""
+Pages sans données propres à l'utilisateur (jeux, sons, ressources, accueil).
+
+@page_precalculee(variante) : la page est rendue une seule fois par déploiement,
+langue et variante (préférences d'affichage par exemple), puis gardée dans le
+cache sous forme précompressée (gzip, et brotli s'il est installé). Les requêtes
+suivantes n'exécutent ni la vue ni le gabarit : la meilleure variante acceptée
+par le navigateur est servie telle quelle, avec un ETag (304 sans lire le cache).
+
+Déploiement = gabarits, manifest des statiques (noms hachés) et fichiers de
+PAGES_PRECALCULEES_DEPENDANCES (manifests des images et des sons) : une nouvelle
+version change la clé, les anciennes pages expirent avec le cache.
+Désactivé par défaut avec DEBUG (gabarits modifiés pendant le développement).
+"""
+import gzip
+import hashlib
+from functools import lru_cache, wraps
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils import translation
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+
+from .fichiers_statiques import encodages_acceptes
+from .fraicheur import METHODES_CONDITIONNELLES, version_gabarits
+
+try:
+    import brotli
+except ImportError:  # brotli est optionnel : gzip seulement
+    brotli = None
+
+# Ordre de préférence des encodages servis
+ENCODAGES = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def est_actif():
+    actif = getattr(settings, 'PAGES_PRECALCULEES_ACTIF', None)
+    return not settings.DEBUG if actif is None else actif
+
+
+def get_cache():
+    return caches[getattr(settings, 'PAGES_PRECALCULEES_CACHE', 'default')]
+
+
+@lru_cache(maxsize=1)
+def version_deploiement():
+    """Empreinte des gabarits, des statiques et des manifests d'images et de sons"""
+    fichiers = [Path(settings.STATIC_ROOT) / 'staticfiles.json', *getattr(settings, 'PAGES_PRECALCULEES_DEPENDANCES', ())]
+    dates = [Path(f).stat().st_mtime_ns if Path(f).exists() else 0 for f in fichiers]
+    return hashlib.sha1(repr((version_gabarits().isoformat(), dates)).encode()).hexdigest()[:12]
+
+
+def compresser(contenu):
+    variantes = {'identite': contenu, 'gzip': gzip.compress(contenu, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variantes['br'] = brotli.compress(contenu, quality=11)
+    return variantes
+
+
+def choisir_encodage(request):
+    acceptes = encodages_acceptes(request.META.get('HTTP_ACCEPT_ENCODING', ''), ENCODAGES)
+    return acceptes[0] if acceptes else 'identite'
+
+
+def en_tetes(response, etag, encodage):
+    response['ETag'] = etag
+    if encodage != 'identite':
+        response['Content-Encoding'] = encodage
+    # Pages derrière login_required et variantes par utilisateur : jamais dans un cache partagé
+    patch_cache_control(response, private=True, max_age=getattr(settings, 'PAGES_PRECALCULEES_MAX_AGE', 300))
+    patch_vary_headers(response, ('Accept-Encoding', 'Cookie'))
+    return response
+
+
+def page_precalculee(variante=None):
+    """Vue GET rendue une fois par déploiement, langue et variante(request), servie précompressée"""
+
+    def decorateur(vue):
+        @wraps(vue)
+        def enveloppe(request, *args, **kwargs):
+            if request.method not in METHODES_CONDITIONNELLES or not est_actif():
+                return vue(request, *args, **kwargs)
+
+            cle = ':'.join(map(str, (
+                'page', vue.__module__, vue.__name__, version_deploiement(), translation.get_language(),
+                variante(request) if variante else '', *args, *sorted(kwargs.items()),
+            )))
+            encodage = choisir_encodage(request)
+            etag = f'"{hashlib.sha1(cle.encode()).hexdigest()[:20]}-{encodage}"'
+            if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+                return en_tetes(HttpResponseNotModified(), etag, encodage)
+
+            # Une entrée par encodage : un hit ne lit que les octets servis
+            cache = get_cache()
+            page = cache.get(f'{cle}:{encodage}')
+            statut = 'hit'
+            if page is None:
+                response = vue(request, *args, **kwargs)
+                # Seule une page 200 complète, sans cookie posé par la vue, est partagée
+                if response.status_code != 200 or response.streaming or response.cookies:
+                    return response
+                variantes = {
+                    f'{cle}:{nom}': (response['Content-Type'], contenu)
+                    for nom, contenu in compresser(response.content).items()
+                }
+                cache.set_many(variantes, getattr(settings, 'PAGES_PRECALCULEES_DUREE', 7 * 24 * 3600))
+                page = variantes[f'{cle}:{encodage}']
+                statut = 'miss'
+
+            content_type, contenu = page
+            response = HttpResponse(contenu, content_type=content_type)
+            response['X-Page-Precalculee'] = statut
+            return en_tetes(response, etag, encodage)
+        return enveloppe
+    return decorateur
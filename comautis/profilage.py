@@ -0,0 +1,222 @@
+"""
+Profilage à la demande d'une requête, réservé au staff.
+
+Un membre du staff ajoute ?_profil=1 à l'URL (ou l'en-tête X-Profil: 1) :
+un thread échantillonne la pile Python de la requête toutes les
+PROFILAGE_INTERVALLE_MS et enregistre dans PROFILAGE_DOSSIER :
+- <id>.collapsed : piles repliées (format flamegraph.pl, ouvrable dans speedscope.app)
+- <id>.json : résumé (durée, temps ORM / templates / code applicatif, fonctions chaudes)
+
+Sans le paramètre, le middleware ne fait que deux tests sur request.META.
+Les profils récents sont listés sur /admin-dashboard/profils/.
+"""
+import json
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+
+from comautis.journaux import fichier_projet
+
+PARAMETRE = '_profil'
+ENTETE = 'HTTP_X_PROFIL'
+
+# Valeurs du paramètre ou de l'en-tête qui déclenchent le profil (?_profil=0 : rien)
+VALEURS_ACTIVES = ('1', 'true', 'oui', 'on')
+
+# Identifiant de profil : horodatage + suffixe aléatoire (rien d'autre dans un nom de fichier)
+ID_VALIDE = re.compile(r'^\d{8}-\d{6}-[0-9a-f]{6}$')
+
+CATEGORIES = {
+    'orm': 'ORM (SQL)',
+    'template': 'Templates',
+    'vue': 'Code applicatif',
+    'autre': 'Django / autre',
+}
+
+
+def get_dossier():
+    return Path(getattr(settings, 'PROFILAGE_DOSSIER', settings.BASE_DIR / 'profils'))
+
+
+def demande(request):
+    """Le profil est-il demandé (en-tête X-Profil prioritaire sur ?_profil) ?"""
+    valeur = request.META.get(ENTETE, request.GET.get(PARAMETRE, ''))
+    return valeur.strip().lower() in VALEURS_ACTIVES
+
+
+# ========== ÉCHANTILLONNAGE ==========
+
+def categorie(fichier):
+    """Catégorie d'une frame d'après son fichier (None : bibliothèque standard, tiers...)"""
+    if '/django/db/' in fichier:
+        return 'orm'
+    if '/django/template/' in fichier:
+        return 'template'
+    if fichier_projet(fichier):
+        return 'vue'
+    return None
+
+
+def nom_frame(frame):
+    code = frame.f_code
+    fichier = code.co_filename
+    relatif = fichier_projet(fichier)
+    if relatif:
+        fichier = relatif
+    elif 'site-packages/' in fichier:
+        fichier = fichier.split('site-packages/', 1)[1]
+    else:
+        fichier = Path(fichier).name
+    # Ni ';' ni espace : séparateurs du format replié
+    return f"{code.co_name}({fichier}:{code.co_firstlineno})".replace(';', ',').replace(' ', '_')
+
+
+class Echantillonneur(threading.Thread):
+    """Thread qui relève la pile d'un autre thread à intervalle fixe"""
+
+    def __init__(self, thread_id, intervalle):
+        super().__init__(daemon=True, name='profilage')
+        self.thread_id = thread_id
+        self.intervalle = intervalle
+        self.piles = Counter()
+        self.categories = Counter()
+        self.chaudes = Counter()
+        self.arret = threading.Event()
+
+    def run(self):
+        while not self.arret.wait(self.intervalle):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.relever(frame)
+
+    def relever(self, frame):
+        pile, cat = [], None
+        while frame is not None:
+            if frame.f_code.co_filename == __file__:
+                break  # le middleware et au-dessus : hors de la requête profilée
+            if cat is None:
+                cat = categorie(frame.f_code.co_filename)
+            pile.append(nom_frame(frame))
+            frame = frame.f_back
+        if not pile:
+            return
+        self.piles[';'.join(reversed(pile))] += 1
+        self.categories[cat or 'autre'] += 1
+        self.chaudes[pile[0]] += 1
+
+    def arreter(self):
+        self.arret.set()
+        self.join()
+
+
+# ========== STOCKAGE ==========
+
+def enregistrer(echantillonneur, request, response, duree):
+    dossier = get_dossier()
+    dossier.mkdir(parents=True, exist_ok=True)
+    profil_id = f"{timezone.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+    total = sum(echantillonneur.piles.values())
+
+    with open(dossier / f'{profil_id}.collapsed', 'w', encoding='utf-8') as f:
+        for pile, nombre in echantillonneur.piles.most_common():
+            f.write(f'{pile} {nombre}\n')
+
+    resume = {
+        'id': profil_id,
+        'date': timezone.now().isoformat(),
+        'methode': request.method,
+        'chemin': request.get_full_path(),
+        'utilisateur': request.user.get_username(),
+        'statut': response.status_code,
+        'duree_ms': round(duree * 1000, 1),
+        'intervalle_ms': round(echantillonneur.intervalle * 1000, 1),
+        'echantillons': total,
+        'categories': {
+            cle: {
+                'libelle': libelle,
+                'echantillons': echantillonneur.categories[cle],
+                'pourcentage': round(echantillonneur.categories[cle] * 100 / max(total, 1), 1),
+            }
+            for cle, libelle in CATEGORIES.items()
+        },
+        'fonctions_chaudes': [
+            {'fonction': nom, 'echantillons': nombre} for nom, nombre in echantillonneur.chaudes.most_common(10)
+        ],
+    }
+    with open(dossier / f'{profil_id}.json', 'w', encoding='utf-8') as f:
+        json.dump(resume, f, ensure_ascii=False, indent=2)
+
+    purger(dossier, getattr(settings, 'PROFILAGE_CONSERVES', 50))
+    return profil_id
+
+
+def purger(dossier, conserves):
+    """Ne garde que les `conserves` profils les plus récents"""
+    for resume in sorted(dossier.glob('*.json'), reverse=True)[conserves:]:
+        resume.unlink(missing_ok=True)
+        resume.with_suffix('.collapsed').unlink(missing_ok=True)
+
+
+def lister_profils(limite=50):
+    """Résumés des profils, du plus récent au plus ancien"""
+    dossier = get_dossier()
+    if not dossier.is_dir():
+        return []
+    profils = []
+    for chemin in sorted(dossier.glob('*.json'), reverse=True)[:limite]:
+        try:
+            with open(chemin, encoding='utf-8') as f:
+                profils.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return profils
+
+
+def chemin_piles(profil_id):
+    """Fichier .collapsed d'un profil (None si l'identifiant est invalide ou inconnu)"""
+    if not ID_VALIDE.match(profil_id):
+        return None
+    chemin = get_dossier() / f'{profil_id}.collapsed'
+    return chemin if chemin.is_file() else None
+
+
+# ========== MIDDLEWARE ==========
+
+class ProfilageMiddleware:
+    """
+    Profile la requête si un membre du staff le demande (?_profil=1 ou X-Profil: 1)
+    À placer après AuthenticationMiddleware
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILAGE_ACTIF', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.intervalle = getattr(settings, 'PROFILAGE_INTERVALLE_MS', 5) / 1000
+
+    def __call__(self, request):
+        # Chemin normal : deux recherches, aucun coût ajouté à la requête
+        if ENTETE not in request.META and PARAMETRE not in request.META.get('QUERY_STRING', ''):
+            return self.get_response(request)
+        if not request.user.is_staff or not demande(request):
+            return self.get_response(request)
+
+        echantillonneur = Echantillonneur(threading.get_ident(), self.intervalle)
+        debut = time.perf_counter()
+        echantillonneur.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            echantillonneur.arreter()
+        duree = time.perf_counter() - debut
+
+        response['X-Profil'] = enregistrer(echantillonneur, request, response, duree)
+        return response
@@ -0,0 +1,26 @@
+"""
+Colonnes chargées par les pages de liste.
+
+Un modèle déclare ses champs texte longs (saisie libre, jamais affichés dans une
+liste) dans CHAMPS_LONGS et utilise ListeQuerySet :
+
+    objects = ListeQuerySet.as_manager()
+    Enfant.objects.select_related('parent').pour_liste()
+
+pour_liste() les diffère (defer) : ni lus par SQLite, ni transférés, ni gardés
+en mémoire pour chaque ligne. Un champ différé reste accessible, au prix d'une
+requête par objet : à réserver aux pages qui ne l'affichent pas (la fiche ou le
+formulaire de l'objet garde le queryset complet).
+"""
+from django.db import models
+
+
+class ListeQuerySet(models.QuerySet):
+
+    def pour_liste(self, *relations):
+        """Sans les CHAMPS_LONGS du modèle ni ceux des relations select_related nommées"""
+        champs = list(getattr(self.model, 'CHAMPS_LONGS', ()))
+        for relation in relations:
+            modele = self.model._meta.get_field(relation).related_model
+            champs += [f'{relation}__{champ}' for champ in getattr(modele, 'CHAMPS_LONGS', ())]
+        return self.defer(*champs) if champs else self
@@ -0,0 +1,100 @@
+"""
+Réplique en lecture pour les pages d'analyse (DATABASE_REPLICA_URL).
+
+- @lecture_replique : les lectures ORM de la vue ou de la fonction décorée
+  partent sur l'alias 'replica' ; tout le reste reste sur la base principale.
+- Lecture de ses propres écritures : dès qu'une écriture passe par le routeur,
+  la suite de la requête lit la base principale, et le navigateur reçoit un
+  cookie qui l'y garde REPLICA_COLLANT_SECONDES (le temps que la réplique rattrape).
+- En local : une seconde base SQLite tenue à jour par la commande repliquer_sqlite.
+"""
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+ALIAS_PRINCIPAL = 'default'
+ALIAS_REPLIQUE = 'replica'
+
+COOKIE_COLLANT = 'bdd_principale'
+METHODES_SANS_ECRITURE = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+_lecture_replique = ContextVar('lecture_replique', default=False)
+_ecriture_effectuee = ContextVar('ecriture_effectuee', default=False)
+_collant = ContextVar('collant', default=False)
+
+
+def replique_disponible():
+    return ALIAS_REPLIQUE in settings.DATABASES
+
+
+def get_duree_collante():
+    return getattr(settings, 'REPLICA_COLLANT_SECONDES', 15)
+
+
+def lecture_replique(fonction):
+    """Décorateur : lectures sur la réplique pendant l'appel"""
+    @wraps(fonction)
+    def enveloppe(*args, **kwargs):
+        jeton = _lecture_replique.set(True)
+        try:
+            return fonction(*args, **kwargs)
+        finally:
+            _lecture_replique.reset(jeton)
+    return enveloppe
+
+
+class RouteurReplique:
+    """Routeur Django (DATABASE_ROUTERS) : écritures sur la principale, lectures désignées sur la réplique"""
+
+    def db_for_read(self, model, **hints):
+        if (
+            _lecture_replique.get()
+            and not _ecriture_effectuee.get()
+            and not _collant.get()
+            and replique_disponible()
+        ):
+            return ALIAS_REPLIQUE
+        return ALIAS_PRINCIPAL
+
+    def db_for_write(self, model, **hints):
+        # Les lectures suivantes de cette requête doivent voir cette écriture
+        _ecriture_effectuee.set(True)
+        return ALIAS_PRINCIPAL
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Mêmes données des deux côtés
+        if {obj1._state.db, obj2._state.db} <= {ALIAS_PRINCIPAL, ALIAS_REPLIQUE}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplique reçoit le schéma par réplication, jamais par migrate
+        if db == ALIAS_REPLIQUE:
+            return False
+        return None
+
+
+class LectureRepliqueMiddleware:
+    """Remet l'état du routeur à zéro à chaque requête et pose le cookie après une écriture"""
+
+    def __init__(self, get_response):
+        if not replique_disponible():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # Le thread du worker sert plusieurs requêtes : repartir d'un état propre
+        _ecriture_effectuee.set(False)
+        _collant.set(COOKIE_COLLANT in request.COOKIES)
+        try:
+            response = self.get_response(request)
+            if _ecriture_effectuee.get() or request.method not in METHODES_SANS_ECRITURE:
+                response.set_cookie(
+                    COOKIE_COLLANT, '1', max_age=get_duree_collante(), httponly=True, samesite='Lax',
+                )
+            return response
+        finally:
+            _ecriture_effectuee.set(False)
+            _collant.set(False)
@@ -0,0 +1,224 @@
+"""
+Journal des requêtes SQL lentes, avec leur plan d'exécution.
+
+- JournalRequetesLentes : execute_wrapper posé sur chaque connexion (signal
+  connection_created, voir authen/apps.py). Toute requête qui dépasse
+  REQUETES_LENTES_SEUIL_MS est écrite en JSON dans REQUETES_LENTES_JOURNAL
+  (fichier tournant) : SQL normalisé, empreinte, durée, vue, ligne de code
+  appelante et plan EXPLAIN (capturé une fois par empreinte et par process).
+- RequetesLentesMiddleware : indique au journal la vue en cours.
+- agreger() : regroupe le journal par empreinte pour /admin-dashboard/requetes-lentes/.
+"""
+import hashlib
+import json
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import nullcontext
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from comautis.journaux import fichier_projet, journal_tournant
+
+# Seules les lectures sont passées à EXPLAIN
+LECTURE = re.compile(r'\s*(SELECT|WITH)\b', re.IGNORECASE)
+
+_vue_courante = ContextVar('vue_courante', default=None)
+_explication = ContextVar('explication', default=False)
+
+# Empreintes dont le plan a déjà été capturé par ce process
+_plans_captures = set()
+
+
+def actif():
+    return getattr(settings, 'REQUETES_LENTES_ACTIF', True)
+
+
+def get_seuil_ms():
+    return getattr(settings, 'REQUETES_LENTES_SEUIL_MS', 100)
+
+
+def get_chemin_journal():
+    return Path(getattr(settings, 'REQUETES_LENTES_JOURNAL', settings.BASE_DIR / 'journaux' / 'requetes_lentes.jsonl'))
+
+
+# ========== NORMALISATION ==========
+
+def normaliser(sql):
+    """SQL sans valeurs : deux requêtes de même forme ont le même texte"""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'%s|\b\d+(?:\.\d+)?\b', '?', sql)
+    sql = re.sub(r'\(\s*\?(?:\s*,\s*\?)*\s*\)', '(...)', sql)  # IN (?, ?, ?) et VALUES (?, ?)
+    sql = re.sub(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+', '(...)', sql)  # VALUES (...), (...)
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+def empreinte(sql_normalise):
+    return hashlib.sha1(sql_normalise.encode('utf-8')).hexdigest()[:12]
+
+
+def appelant():
+    """Première frame du code du projet (hors Django et bibliothèques) : 'chemin:ligne fonction'"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        fichier = fichier_projet(frame.f_code.co_filename) if frame.f_code.co_filename != __file__ else None
+        if fichier:
+            return f"{fichier}:{frame.f_lineno} {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+# ========== PLAN D'EXÉCUTION ==========
+
+def expliquer(connexion, sql, params):
+    """Lignes de EXPLAIN (EXPLAIN QUERY PLAN sous SQLite), None si indisponible"""
+    jeton = _explication.set(True)
+    try:
+        # Dans une transaction : savepoint, un EXPLAIN en échec ne l'annule pas.
+        # Hors transaction : pas de BEGIN (sous SQLite, il prendrait le verrou d'écriture)
+        contexte = transaction.atomic(using=connexion.alias) if connexion.in_atomic_block else nullcontext()
+        with contexte, connexion.cursor() as curseur:
+            curseur.execute(f'{connexion.ops.explain_query_prefix()} {sql}', params)
+            return [' '.join(str(colonne) for colonne in ligne) for ligne in curseur.fetchall()]
+    except DatabaseError:
+        return None
+    finally:
+        _explication.reset(jeton)
+
+
+def balayage_complet(plan):
+    """Le plan parcourt-il une table entière (SCAN sans index, Seq Scan) ?"""
+    for ligne in plan or []:
+        if 'Seq Scan' in ligne or (re.search(r'\bSCAN\b', ligne) and 'INDEX' not in ligne):
+            return True
+    return False
+
+
+# ========== JOURNAL ==========
+
+def get_journal():
+    """Logger dédié, fichier tournant créé au premier enregistrement"""
+    return journal_tournant(
+        'comautis.requetes_lentes', get_chemin_journal(),
+        taille_max=getattr(settings, 'REQUETES_LENTES_TAILLE_MAX', 5 * 1024 * 1024),
+        archives=getattr(settings, 'REQUETES_LENTES_ARCHIVES', 3),
+    )
+
+
+def noter(connexion, sql, params, many, duree_ms):
+    sql_normalise = normaliser(sql)
+    cle = empreinte(sql_normalise)
+    entree = {
+        'date': timezone.now().isoformat(),
+        'empreinte': cle,
+        'sql': sql_normalise,
+        'duree_ms': round(duree_ms, 1),
+        'alias': connexion.alias,
+        'vue': _vue_courante.get(),
+        'appelant': appelant(),
+        'plan': None,
+    }
+    if not many and cle not in _plans_captures and LECTURE.match(sql):
+        _plans_captures.add(cle)
+        entree['plan'] = expliquer(connexion, sql, params)
+    get_journal().info(json.dumps(entree, ensure_ascii=False))
+
+
+class JournalRequetesLentes:
+    """execute_wrapper : chronomètre chaque requête, journalise celles au-dessus du seuil"""
+
+    def __call__(self, execute, sql, params, many, context):
+        if _explication.get() or not actif():
+            return execute(sql, params, many, context)
+        debut = time.perf_counter()
+        resultat = execute(sql, params, many, context)
+        duree_ms = (time.perf_counter() - debut) * 1000
+        if duree_ms >= get_seuil_ms():
+            noter(context['connection'], sql, params, many, duree_ms)
+        return resultat
+
+
+journal_requetes_lentes = JournalRequetesLentes()
+
+
+def installer_journal(sender, connection, **kwargs):
+    """Récepteur de connection_created"""
+    if journal_requetes_lentes not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, journal_requetes_lentes)
+
+
+# ========== LECTURE ==========
+
+def lire_entrees():
+    """Entrées du journal et de ses archives (.1, .2...), des plus anciennes aux plus récentes"""
+    chemin = get_chemin_journal()
+    archives = getattr(settings, 'REQUETES_LENTES_ARCHIVES', 3)
+    for numero in range(archives, -1, -1):
+        fichier = chemin.with_name(f'{chemin.name}.{numero}') if numero else chemin
+        if not fichier.is_file():
+            continue
+        with open(fichier, encoding='utf-8') as f:
+            for ligne in f:
+                try:
+                    yield json.loads(ligne)
+                except ValueError:
+                    continue
+
+
+def agreger(limite=20):
+    """Top `limite` des empreintes par temps cumulé"""
+    groupes = {}
+    for entree in lire_entrees():
+        groupe = groupes.setdefault(entree['empreinte'], {
+            'empreinte': entree['empreinte'],
+            'sql': entree['sql'],
+            'nombre': 0,
+            'total_ms': 0.0,
+            'max_ms': 0.0,
+            'vues': Counter(),
+            'appelant': None,
+            'plan': None,
+        })
+        groupe['nombre'] += 1
+        groupe['total_ms'] += entree['duree_ms']
+        groupe['max_ms'] = max(groupe['max_ms'], entree['duree_ms'])
+        groupe['derniere'] = entree['date']
+        groupe['vues'][entree.get('vue') or 'hors requête'] += 1
+        groupe['appelant'] = entree.get('appelant') or groupe['appelant']
+        groupe['plan'] = entree.get('plan') or groupe['plan']
+
+    top = sorted(groupes.values(), key=lambda g: g['total_ms'], reverse=True)[:limite]
+    for groupe in top:
+        groupe['total_ms'] = round(groupe['total_ms'], 1)
+        groupe['moyenne_ms'] = round(groupe['total_ms'] / groupe['nombre'], 1)
+        groupe['vues'] = groupe['vues'].most_common(3)
+        groupe['balayage'] = balayage_complet(groupe['plan'])
+        groupe['sans_limite'] = groupe['sql'].startswith('SELECT') and ' LIMIT ' not in groupe['sql']
+    return top
+
+
+# ========== MIDDLEWARE ==========
+
+class RequetesLentesMiddleware:
+    """Associe les requêtes SQL lentes à la vue qui les a déclenchées"""
+
+    def __init__(self, get_response):
+        if not actif():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        jeton = _vue_courante.set(request.path)
+        try:
+            return self.get_response(request)
+        finally:
+            _vue_courante.reset(jeton)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _vue_courante.set(f"{view_func.__module__}.{getattr(view_func, '__name__', type(view_func).__name__)}")
@@ -0,0 +1,322 @@
+"""
+Une requête type par URL nommée de authen, forum et paiement.
+
+Utilisé par la commande mesurer_vues (latences, historique JSON) et par les
+tests de budget de requêtes : chaque scénario dit qui appelle la vue, avec
+quelle méthode et quelles données.
+"""
+import json
+from contextlib import nullcontext
+from importlib import import_module
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.urls import reverse
+
+# URLconf mesurées et préfixe sous lequel comautis/urls.py les inclut
+URLCONFS = {
+    'authen.urls': '',
+    'forum.urls': '/forum',
+    'paiement.urls': '/paiement',
+}
+
+# utilisateur : None (anonyme), 'parent' ou 'admin'
+# reconnecter : la vue déconnecte ou supprime l'utilisateur, il faut le reconnecter après
+# ignorer : raison pour laquelle la vue n'est pas mesurable en l'état
+# statut : erreur attendue quand le scénario envoie volontairement une requête refusée
+SCENARIO_PAR_DEFAUT = {
+    'utilisateur': 'parent',
+    'methode': 'get',
+    'donnees': None,
+    'json': False,
+    'reconnecter': False,
+    'ignorer': None,
+    'statut': None,
+}
+
+SCENARIOS = {
+    # Pages publiques
+    'index': {'utilisateur': None},
+    'register': {'utilisateur': None},
+    'login': {'utilisateur': None},
+    'forum:topic_list': {'utilisateur': None},
+    'forum:topic_detail': {'utilisateur': None},
+    'paiement:levels': {'utilisateur': None},
+    'pack_jeu': {'utilisateur': None},
+    'service_worker': {'utilisateur': None},
+
+    'logout': {'reconnecter': True},
+    'supprimer_enfant': {'methode': 'post'},
+    'miniature': {'ignorer': "nécessite une photo uploadée sur disque"},
+    'mark_notification_read': {},
+
+    # API JSON (paramètres)
+    'modifier_profil': {'methode': 'post', 'json': True, 'donnees': {'first_name': 'Camille'}},
+    'changer_mot_de_passe': {
+        'methode': 'post', 'json': True,
+        'donnees': {'ancien_mdp': 'incorrect', 'nouveau_mdp': 'x', 'confirmer_mdp': 'x'},
+    },
+    'upload_photo_profil': {'methode': 'post'},
+    'update_preferences': {'methode': 'post', 'json': True, 'donnees': {'theme': 'sombre', 'volume': 'faible'}},
+    'supprimer_compte': {'methode': 'post', 'json': True, 'donnees': {'mot_de_passe': 'incorrect'}},
+
+    # Suivi des activités : requêtes refusées (enfant d'un autre parent, jeton invalide),
+    # les écritures passent par le tampon (authen.tests.TamponActivitesTests)
+    'start_activity': {'methode': 'post', 'json': True, 'donnees': {'enfant_id': 0, 'jeu': 'memory'}, 'statut': 404},
+    'end_activity': {
+        'methode': 'post', 'json': True, 'donnees': {'activite_id': 'invalide', 'score': 75}, 'statut': 400,
+    },
+
+    # Forum
+    'forum:add_reaction': {'methode': 'post', 'donnees': {'reaction_type': 'love'}},
+
+    # Paiement
+    'paiement:process_payment': {
+        'methode': 'post',
+        'donnees': {
+            'payment_method': 'card', 'card_number': '4111111111111111',
+            'expiry': '12/99', 'cvv': '123', 'card_name': 'Camille Martin',
+        },
+    },
+    'paiement:cancel_subscription': {'methode': 'post'},
+    'paiement:confirm_level_change': {'methode': 'post'},
+
+    # Profil absent (identifiant fictif) : 404 après la vérification des droits
+    'admin_profil_piles': {'utilisateur': 'admin', 'statut': 404},
+
+    # Action groupée sur une sélection fixe (exécutée dans la requête, un seul lot)
+    'admin_action_groupee': {
+        'utilisateur': 'admin', 'methode': 'post',
+        'donnees': {'action': 'activer_utilisateurs', 'retour': 'admin_users_list', 'ids': ['1', '2', '3']},
+    },
+}
+
+# Toutes les vues du tableau de bord admin
+ADMIN = {'utilisateur': 'admin'}
+
+# Budget de requêtes SQL par vue (session et utilisateur compris), vérifié par
+# authen.tests.BudgetRequetesTests sur une petite puis une grande base : le nombre
+# de requêtes ne doit pas dépendre du volume de données.
+# Toute nouvelle URL nommée doit avoir son budget ici.
+BUDGETS_REQUETES = {
+    # Pages publiques et jeux
+    'index': 0,
+    'register': 0,
+    'login': 0,
+    'logout': 3,
+    'labyrinthe': 0,
+    'ressources': 0,
+    'liste_jeux': 1,
+    'jeu_memory': 1,
+    'jeu_compter_3': 1,
+    'jeu_couleurs': 1,
+    'jeu_emotions': 1,
+    'jeu_compter_10': 1,
+    'jeu_memory_fruits': 1,
+    'jeu_jours_semaine': 1,
+    'animaux_jeu': 1,
+    'jeu_fruits': 1,
+    'jeu_memory_couleurs': 1,
+    'jeu_saisons': 1,
+    'jeu_puzzle': 1,
+    'pack_jeu': 0,  # contenu des jeux à moteur partagé, sans session
+    'service_worker': 0,  # manifest de précache lu une fois par process
+    'page_sons': 1,
+    'pictogrammes': 1,
+    'dessiner': 1,
+    'videos': 1,
+    'histoires': 1,
+
+    # Espace parent
+    # + résumés des mois archivés (archiver_activites)
+    'dashboard': 10,
+    'progression': 8,
+    'profil_famille': 4,
+    'ajouter_enfant': 1,
+    'modifier_enfant': 2,
+    'supprimer_enfant': 6,  # masquage + SuppressionDifferee (données effacées en arrière-plan)
+    'selection_enfant': 2,
+    'dashboard_enfant': 2,
+    'users_list': 3,
+    'parametres': 2,
+    'user_profile': 5,
+    'notifications': 3,
+    'mark_notification_read': 3,
+
+    # API JSON (paramètres)
+    'modifier_profil': 2,
+    'changer_mot_de_passe': 1,
+    'upload_photo_profil': 1,
+    'update_preferences': 6,
+    'supprimer_compte': 1,
+    'start_activity': 2,
+    'end_activity': 1,
+
+    # Tableau de bord admin
+    'admin_dashboard': 12,
+    'admin_users_list': 2,
+    'admin_user_detail': 7,
+    'admin_approve_educator': 5,  # via actions_groupees : transaction du lot
+    'admin_deactivate_user': 5,
+    'admin_delete_user': 6,  # masquage + SuppressionDifferee, quel que soit le volume du compte
+    'admin_enfants_list': 2,
+    'admin_forum_moderation': 3,
+    'admin_delete_topic': 6,
+    'admin_delete_post': 3,
+    'admin_subscriptions': 3,
+    'admin_statistics': 4,
+    'admin_profils': 2,
+    'admin_profil_piles': 2,
+    'admin_requetes_lentes': 2,
+    'admin_suppressions': 3,
+    'admin_actions_groupees': 3,
+    'admin_action_groupee': 6,
+
+    # Forum
+    # Validateur ETag compris (comautis.fraicheur) : une requête de plus, un 304 n'en coûte que celle-là
+    'forum:topic_list': 3,
+    'forum:topic_detail': 3,
+    # Pire cas : le créateur du sujet gagne des badges (3 comptages + 2 bulk_create)
+    'forum:add_reaction': 15,
+
+    # Paiement
+    'paiement:levels': 1,
+    'paiement:subscribe': 3,
+    'paiement:process_payment': 3,
+    'paiement:my_subscriptions': 3,
+    'paiement:cancel_subscription': 3,
+    'paiement:change_level': 3,
+    'paiement:confirm_level_change': 4,
+}
+
+
+def get_scenario(nom):
+    scenario = dict(SCENARIO_PAR_DEFAUT)
+    if nom.startswith('admin_'):
+        scenario.update(ADMIN)
+    scenario.update(SCENARIOS.get(nom, {}))
+    return scenario
+
+
+def lister_vues():
+    """
+    [(nom, (module, pattern))] de chaque URL nommée des URLconf
+    Premier pattern si le nom est dupliqué (c'est lui que Django résout)
+    """
+    vues = {}
+    for module in URLCONFS:
+        urlconf = import_module(module)
+        espace = f"{urlconf.app_name}:" if getattr(urlconf, 'app_name', None) else ''
+        for pattern in urlconf.urlpatterns:
+            if pattern.name:
+                vues.setdefault(espace + pattern.name, (module, pattern))
+    return list(vues.items())
+
+
+# ========== DONNÉES DES SCÉNARIOS ==========
+
+def preparer_contexte(parent):
+    """
+    Valeurs des paramètres d'URL (enfant_id, topic_id...) tirées des données existantes
+    Crée ce qui manque (enfant, sujet, abonnement...) : à appeler dans une transaction annulée
+    """
+    from datetime import date
+
+    from authen.models import Enfant, Notification
+    from forum.models import Post, Topic
+    from paiement.models import Level, Subscription
+
+    enfant = Enfant.objects.filter(parent=parent).first() or Enfant.objects.create(
+        parent=parent, prenom='Léo', nom='Martin', date_naissance=date(2018, 5, 4),
+    )
+    topic = Topic.objects.order_by('-id').first() or Topic.objects.create(
+        title='Routines du soir', created_by=parent, category='sommeil',
+    )
+    post = Post.objects.filter(topic=topic).first() or Post.objects.create(
+        topic=topic, content='Merci pour vos conseils', created_by=parent,
+    )
+    notification = Notification.objects.filter(user=parent).first() or Notification.objects.create(
+        user=parent, notification_type='comment', message='Nouvelle réponse', link='/forum/',
+    )
+    niveaux = list(Level.objects.order_by('price')[:2])
+    while len(niveaux) < 2:
+        niveaux.append(Level.objects.create(name=f'Niveau {len(niveaux) + 1}', price=len(niveaux) * 5))
+    abonnement = Subscription.objects.filter(parent=parent, active=True).first() or Subscription.objects.create(
+        parent=parent, level=niveaux[0], active=True,
+    )
+    cible = User.objects.filter(is_staff=False).exclude(id=parent.id).first() or parent
+
+    return {
+        'enfant_id': enfant.id,
+        'topic_id': topic.id,
+        'post_id': post.id,
+        'notification_id': notification.id,
+        'user_id': cible.id,
+        'username': parent.username,
+        'level_id': niveaux[0].id,
+        'new_level_id': niveaux[1].id,
+        'subscription_id': abonnement.id,
+        'current_subscription_id': abonnement.id,
+        'taille': 'carte',
+        'nom': 'inexistant.jpg',
+        'jeu': 'memory',
+        'profil_id': '00000000-000000-000000',
+    }
+
+
+def statut_attendu(scenario, statut):
+    """Réponse 2xx/3xx, ou l'erreur que le scénario provoque volontairement"""
+    return statut < 400 or statut == scenario['statut']
+
+
+def construire_url(vue, contexte):
+    """
+    URL d'une vue de lister_vues(), résolue dans son propre URLconf :
+    reverse('login') global tomberait sur django.contrib.auth.urls (/accounts/)
+    """
+    module, pattern = vue
+    kwargs = {cle: contexte[cle] for cle in pattern.pattern.converters}
+    return URLCONFS[module] + reverse(pattern.name, urlconf=module, kwargs=kwargs)
+
+
+def executer(client, scenario, url, annuler=True, compteur=None):
+    """
+    Exécute la requête du scénario
+    annuler=True : ses écritures sont annulées (savepoint)
+    compteur : execute_wrapper posé autour de la seule requête (savepoint exclu)
+    """
+    methode = getattr(client, scenario['methode'])
+    kwargs = {}
+    if scenario['donnees'] is not None:
+        if scenario['json']:
+            kwargs = {'data': json.dumps(scenario['donnees']), 'content_type': 'application/json'}
+        else:
+            kwargs = {'data': scenario['donnees']}
+
+    compter = connection.execute_wrapper(compteur) if compteur else nullcontext()
+    if not annuler:
+        with compter:
+            return methode(url, **kwargs)
+    with transaction.atomic():
+        with compter:
+            response = methode(url, **kwargs)
+        transaction.set_rollback(True)
+    return response
+
+
+class CompteurRequetes:
+    """
+    execute_wrapper qui compte les requêtes SQL (toutes / django_session)
+    CaptureQueriesContext ne convient pas sur plusieurs requêtes HTTP :
+    request_started vide connection.queries
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.session = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        if 'django_session' in sql:
+            self.session += 1
+        return execute(sql, params, many, context)
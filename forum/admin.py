@@ -1,11 +1,27 @@
 from django.contrib import admin
 from django.utils.html import format_html
+from authen.admin import action_groupee
 from .models import Topic, Post
 
-class TopicAdmin(admin.ModelAdmin):
+
+class SansSuppressionDjangoMixin:
+    """Remplace delete_selected (collecteur de cascade en mémoire) par les actions groupées"""
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+
+class TopicAdmin(SansSuppressionDjangoMixin, admin.ModelAdmin):
     list_display = ('title', 'created_by', 'icon_img', 'created_at')
     search_fields = ('title', 'created_by__username')
     list_filter = ('icon', 'created_at')
+    actions = ['supprimer_sujets']
+
+    def supprimer_sujets(self, request, queryset):
+        action_groupee(self, request, 'supprimer_sujets', queryset.values_list('pk', flat=True))
+    supprimer_sujets.short_description = "🗑️ Supprimer les topics sélectionnés"
 
     def icon_img(self, obj):
         if obj.icon:
@@ -15,10 +31,15 @@ class TopicAdmin(admin.ModelAdmin):
         return "-"
     icon_img.short_description = 'Icône'
 
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(SansSuppressionDjangoMixin, admin.ModelAdmin):
     list_display = ('topic', 'created_by', 'created_at')
     search_fields = ('topic__title', 'created_by__username')
     list_filter = ('created_at',)
+    actions = ['supprimer_messages']
+
+    def supprimer_messages(self, request, queryset):
+        action_groupee(self, request, 'supprimer_messages', queryset.values_list('pk', flat=True))
+    supprimer_messages.short_description = "🗑️ Supprimer les commentaires sélectionnés"
 
 admin.site.register(Topic, TopicAdmin)
 admin.site.register(Post, PostAdmin)
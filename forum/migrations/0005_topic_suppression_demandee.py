@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0004_alter_topic_options_topic_category'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='topic',
+            name='suppression_demandee',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
@@ -2,8 +2,20 @@ from django.db import models
 from django.contrib.auth.models import User
 import random
 
+from django.db.models.functions import Left
+
+from comautis.projections import ListeQuerySet
+
 ICON_CHOICES = ['book', 'love', 'chat', 'star', 'autumn', 'pencil']
 
+
+class SujetsVisiblesManager(models.Manager):
+    """Manager par défaut : sujets en cours de suppression (authen/suppressions.py) masqués"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(suppression_demandee=False)
+
+
 class Topic(models.Model):
     CATEGORY_CHOICES = [
         ('ecole', '🏫 École et Scolarité'),
@@ -20,6 +32,9 @@ class Topic(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     icon = models.CharField(max_length=20, blank=True, null=True)
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES, default='libre')
+    suppression_demandee = models.BooleanField(default=False, editable=False)
+
+    objects = SujetsVisiblesManager()
 
     def save(self, *args, **kwargs):
         if not self.icon:
@@ -33,12 +48,23 @@ class Topic(models.Model):
         ordering = ['-created_at']
 
 
+class PostQuerySet(ListeQuerySet):
+
+    def pour_liste(self, *relations, longueur=600):
+        """Message différé, ses `longueur` premiers caractères dans post.apercu (aperçus tronqués)"""
+        return super().pour_liste(*relations).annotate(apercu=Left('content', longueur))
+
+
 class Post(models.Model):
     topic = models.ForeignKey(Topic, on_delete=models.CASCADE)
     content = models.TextField()
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    CHAMPS_LONGS = ('content',)
+
+    objects = PostQuerySet.as_manager()
+
     def __str__(self):
         return f'{self.created_by} - {self.content[:30]}'
 
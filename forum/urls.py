@@ -1,8 +1,16 @@
 from django.urls import path
 from . import views
+from comautis.limitation import Limite
 
 app_name = 'forum'  # <== Très important pour le namespace
 
+# Limites de débit (comautis/limitation.py), par compte : les GET ne sont pas limités
+LIMITES = {
+    'topic_list': Limite('10/h', rafale=3),        # POST : nouveau sujet
+    'topic_detail': Limite('30/min', rafale=10),   # POST : nouveau message
+    'add_reaction': [Limite('60/min', rafale=20), Limite('300/min', par='ip')],
+}
+
 urlpatterns = [
     path('', views.topic_list, name='topic_list'),
     path('<int:topic_id>/', views.topic_detail, name='topic_detail'),
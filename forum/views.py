@@ -5,24 +5,26 @@ from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 from authen.badge_manager import check_and_award_badges, create_notification
 from django.db.models import Count
+from comautis.fraicheur import conditionnel, etat_liste_sujets, etat_sujet
 
+@conditionnel(etat_liste_sujets)
 def topic_list(request):
     # Récupérer le filtre de catégorie (salon)
     selected_category = request.GET.get('category', None)
     
+    # select_related : l'auteur de chaque sujet est lu dans la même requête
+    topics = Topic.objects.select_related('created_by').order_by('-created_at')
     if selected_category:
-        topics = Topic.objects.filter(category=selected_category).order_by('-created_at')
-    else:
-        topics = Topic.objects.all().order_by('-created_at')
+        topics = topics.filter(category=selected_category)
     
-    # Compter les topics par catégorie - NOUVELLE MÉTHODE
+    # Compter les topics par catégorie - une seule requête GROUP BY
+    counts = dict(Topic.objects.values_list('category').annotate(count=Count('id')).order_by())
     category_counts = []
     for choice, label in Topic.CATEGORY_CHOICES:
-        count = Topic.objects.filter(category=choice).count()
         category_counts.append({
             'choice': choice,
             'label': label,
-            'count': count
+            'count': counts.get(choice, 0)
         })
     
     if request.method == 'POST':
@@ -49,9 +51,10 @@ def topic_list(request):
     return render(request, 'forum/topic_list.html', context)
 
 
+@conditionnel(etat_sujet)
 def topic_detail(request, topic_id):
-    topic = get_object_or_404(Topic, id=topic_id)
-    posts = Post.objects.filter(topic=topic).order_by('created_at')
+    topic = get_object_or_404(Topic.objects.select_related('created_by'), id=topic_id)
+    posts = Post.objects.filter(topic=topic).select_related('created_by').order_by('created_at')
 
     if request.method == 'POST':
         form = PostForm(request.POST)
@@ -83,7 +86,7 @@ def topic_detail(request, topic_id):
 @login_required
 def add_reaction(request, topic_id):
     if request.method == 'POST':
-        topic = Topic.objects.get(id=topic_id)
+        topic = Topic.objects.select_related('created_by').get(id=topic_id)
         reaction_type = request.POST.get('reaction_type')
         
         # Vérifier si l'utilisateur a déjà réagi avec ce type
@@ -113,11 +116,11 @@ def add_reaction(request, topic_id):
                     f'/forum/{topic.id}/'
                 )
         
-        # Compter toutes les réactions par type
+        # Compter toutes les réactions par type - une seule requête GROUP BY
+        counts = dict(topic.reactions.values_list('reaction_type').annotate(count=Count('id')).order_by())
         reaction_counts = {}
         for choice, emoji in Reaction.REACTION_CHOICES:
-            count = topic.reactions.filter(reaction_type=choice).count()
-            reaction_counts[choice] = count
+            reaction_counts[choice] = counts.get(choice, 0)
         
         return JsonResponse({
             'action': action,
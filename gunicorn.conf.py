@@ -0,0 +1,34 @@
+"""
+Configuration gunicorn, chargée automatiquement depuis la racine du projet
+(startCommand Render : gunicorn comautis.wsgi:application).
+
+Le port (PORT) et le nombre de workers (WEB_CONCURRENCY) viennent de
+l'environnement Render, comme avant.
+"""
+import gc
+
+# Le master importe l'application une seule fois avant de forker les workers
+preload_app = True
+
+
+def when_ready(server):
+    """Master : tout importer et compiler avant la création des workers"""
+    from comautis.demarrage import prechauffer
+
+    nb_templates = prechauffer()
+    server.log.info("Préchauffage terminé (%d templates compilés)", nb_templates)
+
+    # Les objets existants ne seront plus parcourus par le GC : leurs pages
+    # mémoire restent partagées (copy-on-write) entre master et workers
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """Worker : ne jamais réutiliser une connexion base ouverte par le master"""
+    from django.db import connections
+
+    from comautis.demarrage import reprendre_taches
+
+    connections.close_all()
+    # Suppressions différées et actions groupées laissées par un redémarrage
+    reprendre_taches()
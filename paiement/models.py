@@ -1,11 +1,17 @@
 from django.db import models
 from django.contrib.auth.models import User
 
+from comautis.projections import ListeQuerySet
+
 class Level(models.Model):
     name = models.CharField(max_length=100)
     price = models.DecimalField(max_digits=6, decimal_places=2, default=0)
     description = models.TextField(blank=True)
     
+    CHAMPS_LONGS = ('description',)
+    
+    objects = ListeQuerySet.as_manager()
+    
     def __str__(self):
         return f"{self.name} - {self.price}€"
 
@@ -22,6 +28,8 @@ class Subscription(models.Model):
     active = models.BooleanField(default=True)
     simulated_payment_id = models.CharField(max_length=100, blank=True, null=True)
     
+    objects = ListeQuerySet.as_manager()
+    
     def __str__(self):
         return f"{self.parent.username} - {self.level.name} - {'Actif' if self.active else 'Inactif'}"
 
@@ -137,7 +137,7 @@ def my_subscriptions(request):
 def cancel_subscription(request, subscription_id):
     """Annuler un abonnement"""
     subscription = get_object_or_404(
-        Subscription, 
+        Subscription.objects.select_related('level'), 
         id=subscription_id, 
         parent=request.user,
         active=True
@@ -157,14 +157,14 @@ def cancel_subscription(request, subscription_id):
 def change_level(request, current_subscription_id):
     """Changer de niveau d'abonnement"""
     current_subscription = get_object_or_404(
-        Subscription, 
+        Subscription.objects.select_related('level'), 
         id=current_subscription_id, 
         parent=request.user,
         active=True
     )
     
     # Récupérer tous les autres niveaux disponibles
-    available_levels = Level.objects.exclude(id=current_subscription.level.id)
+    available_levels = Level.objects.exclude(id=current_subscription.level_id)
     
     return render(request, 'paiement/change_level.html', {
         'current_subscription': current_subscription,